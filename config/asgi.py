@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Serve the hot read endpoints with their async views (BLOG_ASYNC_READS)
+os.environ.setdefault('BLOG_ASYNC_READS', '1')
 
 application = get_asgi_application()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'configapp.middleware.QueryProfilingMiddleware',
+    'configapp.middleware.PrimaryStickinessMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,13 +79,56 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Async views for the hot read endpoints (configapp.urls); config/asgi.py
+# turns this on, WSGI keeps the sync views
+BLOG_ASYNC_READS = os.environ.get('BLOG_ASYNC_READS') == '1'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections open between requests, check them before reuse.
+        # Not under ASGI: each request's sync_to_async thread would keep its own
+        'CONN_MAX_AGE': 0 if BLOG_ASYNC_READS else 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Take the write lock when the transaction starts (BEGIN IMMEDIATE)
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 5,
+        },
     }
 }
 
+# Read replicas: reads go to BLOG_DATABASE_REPLICAS, writes to 'default'
+# (configapp.routers). Locally, point BLOG_REPLICA_DB at a second SQLite file
+# and keep it in sync with `manage.py sync_replica --interval 2`.
+DATABASE_ROUTERS = ['configapp.routers.PrimaryReplicaRouter']
+BLOG_DATABASE_REPLICAS = []
+if os.environ.get('BLOG_REPLICA_DB'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['BLOG_REPLICA_DB'],
+        'OPTIONS': {'timeout': 5},
+        'TEST': {'MIRROR': 'default'},
+    }
+    BLOG_DATABASE_REPLICAS = ['replica']
+# Seconds a user keeps reading from the primary after a write
+BLOG_REPLICA_STICKY_SECONDS = 10
+
+# Applied to every new SQLite connection (configapp.dbtuning.apply_pragmas)
+BLOG_SQLITE_PRAGMAS = {
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -20000,       # ~20 MB page cache
+    'mmap_size': 134217728,     # 128 MB memory-mapped reads
+    'temp_store': 'MEMORY',
+}
+# The journal mode is stored in the database file, so it is only switched
+# when asked for (BLOG_SQLITE_JOURNAL_MODE=WAL on the server), not by every
+# manage.py command run against a checked-out db.sqlite3
+if os.environ.get('BLOG_SQLITE_JOURNAL_MODE'):
+    BLOG_SQLITE_PRAGMAS['journal_mode'] = os.environ['BLOG_SQLITE_JOURNAL_MODE']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -139,7 +185,75 @@ LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/posts/'
 LOGOUT_REDIRECT_URL = '/login/'
 
+TEST_RUNNER = 'configapp.test_runner.BlogTestRunner'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Blog feed
+# Number of posts shown per page on /posts/ (keyset paginated)
+BLOG_FEED_PAGE_SIZE = 12
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'blog-cache',
+    }
+}
+
+# Seconds the cached site statistics (index, admin dashboard) live
+BLOG_STATS_TIMEOUT = 300
+
+# Posts/comments API page size (cursor paginated, ?page_size= up to 100)
+BLOG_API_PAGE_SIZE = 20
+# Most items one bulk import request (/api/posts/bulk/ ...) may carry
+BLOG_IMPORT_MAX_ITEMS = 5000
+
+# Seconds anonymous pages and template fragments stay cached. Entries are
+# invalidated by version bumps on writes, the timeout only bounds memory.
+BLOG_PAGE_CACHE_TIMEOUT = 3600
+
+# Background tasks (configapp.tasks): avatar thumbnails and contact form
+# mails are queued in the database and run by `manage.py run_workers`.
+# True runs them inline after commit instead, e.g. without workers
+BLOG_TASKS_EAGER = os.environ.get('BLOG_TASKS_EAGER') == '1'
+# A task running longer than this is taken to have lost its worker and retried
+BLOG_TASK_LEASE_SECONDS = 600
+
+# Trending posts (configapp.ranking): activity counts half as much after
+# this many hours; scores are updated by a queued batch at most this often
+BLOG_TRENDING_HALF_LIFE_HOURS = 24
+BLOG_RANKING_INTERVAL = 60
+
+# Post view counts (configapp.viewcounts): views are buffered per process and
+# written in one transaction every BLOG_VIEW_FLUSH_SECONDS, or once this many
+# are pending. A crashed process loses at most that many views. Off under
+# `manage.py test` (configapp.test_runner)
+BLOG_VIEW_COUNTING = os.environ.get('BLOG_VIEW_COUNTING', '1') == '1'
+BLOG_VIEW_FLUSH_SECONDS = 10
+BLOG_VIEW_FLUSH_THRESHOLD = 1000
+
+# Where contact form messages go
+BLOG_CONTACT_EMAIL = os.environ.get('BLOG_CONTACT_EMAIL', 'admin@localhost')
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+
+# Live comments (Server-Sent Events, configapp.live). LocalBroker only sees
+# comments written by this process; with several server processes use
+# PollingBroker, which reads new comments from the database per watched post
+BLOG_LIVE_BROKER = 'configapp.live.LocalBroker'
+BLOG_LIVE_POLL_SECONDS = 2
+
+# Per-request query profiling (Server-Timing header, /admin-panel/queries/)
+BLOG_QUERY_PROFILING = False
+# Same statement repeated this many times in one request is reported as N+1
+BLOG_DUPLICATE_QUERY_THRESHOLD = 3
+# Directory for per-process snapshots read by `manage.py query_report`
+BLOG_QUERY_PROFILING_DIR = BASE_DIR / 'var' / 'queries'
+BLOG_QUERY_PROFILING_FLUSH = 30
+
+# Admin changelists estimate the row count of unfiltered tables above this size
+BLOG_EXACT_COUNT_LIMIT = 10000
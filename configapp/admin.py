@@ -1,8 +1,47 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as DefaultUserAdmin
 from django.contrib.auth.models import User
-from .models import UserProfile, Post, Comment
+from .models import UserProfile, Post, Comment, Task
 from django.utils.html import format_html
+from . import moderation, search
+from .avatars import thumbnail_url
+from .pagination import EstimatedCountPaginator
+
+class FastChangeListMixin:
+    """No exact COUNT(*) of the whole table on every changelist page"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def is_changelist(self, request):
+        match = request.resolver_match
+        return match is not None and match.url_name.endswith('_changelist')
+
+class BulkModerationMixin:
+    """Chunked delete actions that skip the per-row collector (see moderation.py)"""
+    bulk_delete = None
+    actions = ('delete_selected_fast', 'delete_by_authors')
+
+    @admin.action(description='Belgilanganlarni tez o\'chirish', permissions=['delete'])
+    def delete_selected_fast(self, request, queryset):
+        deleted = self.bulk_delete(queryset)
+        self.message_user(request, f'{deleted} ta yozuv o\'chirildi.')
+
+    @admin.action(description='Belgilanganlar mualliflarining hamma yozuvlarini o\'chirish', permissions=['delete'])
+    def delete_by_authors(self, request, queryset):
+        # A list, not a subquery: the chunks would re-read the deleted selection
+        authors = list(queryset.values_list('author_id', flat=True).distinct())
+        everything = self.model.objects.filter(author__in=authors)
+        deleted = self.bulk_delete(everything)
+        self.message_user(request, f'{deleted} ta yozuv o\'chirildi.')
+
+class FullTextSearchMixin:
+    """Answer the changelist search box from the full-text index"""
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search.filter_queryset(queryset, search_term, self.search_kind, emails=True), False
 
 # Unregister the default User admin
 admin.site.unregister(User)
@@ -16,7 +55,7 @@ class UserProfileInline(admin.StackedInline):
     extra = 0
 
 @admin.register(User)
-class UserAdmin(DefaultUserAdmin):
+class UserAdmin(FastChangeListMixin, DefaultUserAdmin):
     inlines = (UserProfileInline,)
     list_display = ('username', 'email', 'first_name', 'last_name', 'is_staff', 'is_active', 'date_joined', 'post_count', 'comment_count')
     list_filter = ('is_staff', 'is_superuser', 'is_active', 'date_joined', 'groups')
@@ -25,24 +64,26 @@ class UserAdmin(DefaultUserAdmin):
     date_hierarchy = 'date_joined'
     
     def post_count(self, obj):
-        count = obj.posts.count()
+        count = obj.userprofile.post_count if hasattr(obj, 'userprofile') else 0
         if count > 0:
             return format_html('<span style="color: green; font-weight: bold;">{}</span>', count)
         return count
     post_count.short_description = 'Postlar soni'
+    post_count.admin_order_field = 'userprofile__post_count'
     
     def comment_count(self, obj):
-        count = obj.comment_set.count()
+        count = obj.userprofile.comment_count if hasattr(obj, 'userprofile') else 0
         if count > 0:
             return format_html('<span style="color: blue; font-weight: bold;">{}</span>', count)
         return count
     comment_count.short_description = 'Izohlar soni'
+    comment_count.admin_order_field = 'userprofile__comment_count'
     
     def get_queryset(self, request):
-        return super().get_queryset(request).prefetch_related('posts', 'comment_set')
+        return super().get_queryset(request).select_related('userprofile')
 
 @admin.register(UserProfile)
-class UserProfileAdmin(admin.ModelAdmin):
+class UserProfileAdmin(FastChangeListMixin, admin.ModelAdmin):
     list_display = ('user', 'bio_preview', 'website', 'avatar_preview', 'user_joined_date')
     list_filter = ('user__date_joined', 'user__is_active')
     search_fields = ('user__username', 'user__email', 'bio', 'website')
@@ -57,13 +98,13 @@ class UserProfileAdmin(admin.ModelAdmin):
     
     def avatar_preview(self, obj):
         if obj.avatar:
-            return format_html('<img src="{}" style="width: 40px; height: 40px; border-radius: 50%; object-fit: cover;" />', obj.avatar.url)
+            return format_html('<img src="{}" style="width: 40px; height: 40px; border-radius: 50%; object-fit: cover;" />', thumbnail_url(obj, 40))
         return format_html('<div style="width: 40px; height: 40px; border-radius: 50%; background: #ddd; display: flex; align-items: center; justify-content: center;">👤</div>')
     avatar_preview.short_description = 'Avatar'
     
     def avatar_preview_large(self, obj):
         if obj.avatar:
-            return format_html('<img src="{}" style="width: 150px; height: 150px; border-radius: 10px; object-fit: cover;" />', obj.avatar.url)
+            return format_html('<img src="{}" style="width: 150px; height: 150px; border-radius: 10px; object-fit: cover;" />', thumbnail_url(obj, 150))
         return format_html('<div style="width: 150px; height: 150px; border-radius: 10px; background: #f0f0f0; display: flex; align-items: center; justify-content: center; font-size: 50px;">👤</div>')
     avatar_preview_large.short_description = 'Avatar ko\'rinishi'
     
@@ -75,18 +116,22 @@ class UserProfileAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related('user')
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
-    list_display = ('title_preview', 'author', 'created_at', 'comment_count', 'content_length', 'status')
-    list_filter = ('created_at', 'author', 'author__is_active')
+class PostAdmin(FastChangeListMixin, BulkModerationMixin, FullTextSearchMixin, admin.ModelAdmin):
+    search_kind = 'post'
+    bulk_delete = staticmethod(moderation.delete_posts)
+    list_display = ('title_preview', 'author', 'created_at', 'comment_count', 'view_count', 'content_length', 'status')
+    # No 'author' filter: it lists every user in the sidebar. ?author__id__exact= still works.
+    list_filter = ('created_at', 'author__is_active')
+    raw_id_fields = ('author',)
     search_fields = ('title', 'content', 'author__username', 'author__email')
-    readonly_fields = ('created_at', 'content_preview')
+    readonly_fields = ('created_at', 'view_count', 'content_preview')
     date_hierarchy = 'created_at'
     ordering = ('-created_at',)
     list_per_page = 25
     
     fieldsets = (
         ('Asosiy ma\'lumotlar', {
-            'fields': ('title', 'author', 'created_at')
+            'fields': ('title', 'author', 'created_at', 'view_count')
         }),
         ('Mazmun', {
             'fields': ('content', 'content_preview'),
@@ -99,16 +144,23 @@ class PostAdmin(admin.ModelAdmin):
     title_preview.short_description = 'Sarlavha'
     
     def comment_count(self, obj):
-        count = obj.comments.count()
+        count = obj.comment_count
         color = 'green' if count > 5 else 'blue' if count > 0 else 'gray'
         return format_html('<span style="color: {}; font-weight: bold;">{}</span>', color, count)
     comment_count.short_description = 'Izohlar'
+    comment_count.admin_order_field = 'comment_count'
+    
+    def view_count(self, obj):
+        return obj.view_count
+    view_count.short_description = "Ko'rishlar"
+    view_count.admin_order_field = 'view_count'
     
     def content_length(self, obj):
-        length = len(obj.content)
-        color = 'green' if length > 500 else 'orange' if length > 200 else 'red'
-        return format_html('<span style="color: {};">{} so\'z</span>', color, len(obj.content.split()))
+        words = obj.word_count
+        color = 'green' if words > 80 else 'orange' if words > 30 else 'red'
+        return format_html('<span style="color: {};">{} so\'z</span>', color, words)
     content_length.short_description = 'Mazmun uzunligi'
+    content_length.admin_order_field = 'word_count'
     
     def status(self, obj):
         if obj.author.is_active:
@@ -122,12 +174,19 @@ class PostAdmin(admin.ModelAdmin):
     content_preview.short_description = 'Mazmun ko\'rinishi'
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('author').prefetch_related('comments')
+        queryset = super().get_queryset(request).select_related('author')
+        if self.is_changelist(request):
+            queryset = queryset.defer('content', 'excerpt')
+        return queryset
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(FastChangeListMixin, BulkModerationMixin, FullTextSearchMixin, admin.ModelAdmin):
+    search_kind = 'comment'
+    bulk_delete = staticmethod(moderation.delete_comments)
     list_display = ('content_preview', 'post_link', 'author', 'created_at', 'author_status')
-    list_filter = ('created_at', 'author', 'post', 'author__is_active')
+    # No 'author'/'post' filters: they list every user and post in the sidebar
+    list_filter = ('created_at', 'author__is_active')
+    raw_id_fields = ('post', 'author')
     search_fields = ('content', 'author__username', 'post__title', 'author__email')
     readonly_fields = ('created_at', 'full_content_preview')
     date_hierarchy = 'created_at'
@@ -165,9 +224,24 @@ class CommentAdmin(admin.ModelAdmin):
     full_content_preview.short_description = 'To\'liq izoh'
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('author', 'post')
+        return super().get_queryset(request).select_related('author', 'post').defer(
+            'post__content', 'post__excerpt'
+        )
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'run_after', 'duration_ms', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'dedupe_key')
+    ordering = ('-id',)
+    readonly_fields = [field.name for field in Task._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
 
 # Admin site customization
 admin.site.site_header = "Blog Admin Paneli"
 admin.site.site_title = "Blog Admin"
 admin.site.index_title = "Blog boshqaruv paneli"
+
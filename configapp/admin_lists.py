@@ -0,0 +1,99 @@
+"""
+List pages of the frontend admin panel (``admin-panel/``).
+
+An ``AdminList`` describes one page: the queryset with every relation its
+template touches joined in, the GET filters it accepts and the column it
+pages on. Pages are keyset paginated (``feed.keyset_page``), so a deep page
+costs the same queries as the first one. The header total is exact for
+filtered lists and estimated for big unfiltered tables.
+"""
+from django.contrib.auth.models import User
+from django.shortcuts import render
+from django.utils.http import urlencode
+
+from . import search as search_index
+from .feed import keyset_page
+from .models import Post, Comment
+from .pagination import count_or_estimate
+
+
+class AdminList:
+    template_name = None
+    context_object_name = None
+    order_field = "created_at"
+    page_size = 20
+    search_kind = None
+    # GET parameter -> lookup used with its value
+    filters = {}
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    def filter_queryset(self, request, queryset):
+        """Apply ?search= and the ``filters``; returns the active values too"""
+        values = {}
+        search = request.GET.get("search", "").strip()
+        if search:
+            queryset = search_index.filter_queryset(queryset, search, self.search_kind, emails=True)
+            values["search"] = search
+        for param, lookup in self.filters.items():
+            value = request.GET.get(param, "").strip()
+            if value:
+                queryset = queryset.filter(**{lookup: value})
+                values[param] = value
+        return queryset, values
+
+    def render(self, request):
+        queryset, values = self.filter_queryset(request, self.get_queryset())
+        page = keyset_page(
+            queryset,
+            after=request.GET.get("after"),
+            before=request.GET.get("before"),
+            page_size=self.page_size,
+            field=self.order_field,
+        )
+        total, total_is_estimate = count_or_estimate(queryset)
+        return render(request, self.template_name, {
+            self.context_object_name: page,
+            "page": page,
+            "total": total,
+            "total_is_estimate": total_is_estimate,
+            "search": values.get("search", ""),
+            "filters": values,
+            # Carried over by the pagination links
+            "query": urlencode(values),
+        })
+
+
+class UserList(AdminList):
+    template_name = "admin_frontend/users.html"
+    context_object_name = "users"
+    order_field = "date_joined"
+    page_size = 10
+    search_kind = "user"
+
+    def get_queryset(self):
+        return User.objects.select_related("userprofile")
+
+
+class PostList(AdminList):
+    template_name = "admin_frontend/posts.html"
+    context_object_name = "posts"
+    page_size = 15
+    search_kind = "post"
+    filters = {"author": "author__username__icontains"}
+
+    def get_queryset(self):
+        return Post.objects.select_related("author__userprofile").defer("content")
+
+
+class CommentList(AdminList):
+    template_name = "admin_frontend/comments.html"
+    context_object_name = "comments"
+    search_kind = "comment"
+    filters = {"post": "post__title__icontains"}
+
+    def get_queryset(self):
+        return Comment.objects.select_related("author__userprofile", "post").defer(
+            "post__content", "post__excerpt"
+        )
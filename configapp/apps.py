@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ConfigappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'configapp'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from . import signals  # noqa: F401
+        from .dbtuning import apply_pragmas
+
+        connection_created.connect(apply_pragmas, dispatch_uid="configapp_sqlite_pragmas")
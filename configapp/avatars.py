@@ -0,0 +1,144 @@
+"""
+Avatar processing.
+
+Uploaded avatars are re-encoded without metadata (EXIF, GPS, ...) and cut
+into fixed square thumbnails, each stored as WebP and JPEG under a name
+derived from the hash of the re-encoded original:
+
+    avatars/thumbs/<hash>_<size>.<webp|jpg>
+
+``avatar_hash`` is the hash of the bytes stored for the original, so
+processing a file again stops before re-encoding (lossy) it once more.
+Formats other than JPEG, PNG and WebP are stored as PNG, renamed to match.
+
+The same picture uploaded twice reuses the files already on disk. Work runs
+in a task queue worker (``manage.py run_workers``); templates keep showing
+the original until ``UserProfile.avatar_hash`` is set.
+"""
+import hashlib
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models.signals import post_save
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import UserProfile
+from .tasks import enqueue, task
+
+logger = logging.getLogger(__name__)
+
+SIZES = (40, 80, 150)
+FORMATS = {"webp": "WEBP", "jpg": "JPEG"}
+# Formats originals are stored in, with the extension a converted file gets
+ORIGINAL_FORMATS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp"}
+THUMB_DIR = "avatars/thumbs"
+QUALITY = 82
+
+
+def thumbnail_name(digest, size, ext):
+    return f"{THUMB_DIR}/{digest}_{size}.{ext}"
+
+
+def pick_size(size):
+    """Smallest generated size that still covers ``size`` pixels"""
+    for candidate in SIZES:
+        if candidate >= size:
+            return candidate
+    return SIZES[-1]
+
+
+def thumbnail_url(profile, size, ext="jpg"):
+    """URL of a thumbnail, or of the original while thumbnails are pending"""
+    if not profile or not profile.avatar:
+        return ""
+    if profile.avatar_hash:
+        return default_storage.url(thumbnail_name(profile.avatar_hash, pick_size(size), ext))
+    return profile.avatar.url
+
+
+def _encode(image, fmt, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, quality=QUALITY, optimize=True, **options)
+    return buffer.getvalue()
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:40]
+
+
+def _encode_original(image, source_format, name):
+    """(bytes, name) of the original without metadata, in a kept format"""
+    fmt = (source_format or "JPEG").upper()
+    if fmt not in ORIGINAL_FORMATS:
+        fmt = "PNG"
+        name = os.path.splitext(name)[0] + ORIGINAL_FORMATS[fmt]
+    if fmt == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    return _encode(image, fmt), name
+
+
+@task
+def process(profile_id):
+    """Strip metadata from a profile's avatar and build its thumbnails"""
+    profile = UserProfile.objects.filter(pk=profile_id).first()
+    if profile is None or not profile.avatar:
+        return None
+
+    with profile.avatar.open("rb") as f:
+        data = f.read()
+    # Already the stored output of an earlier run
+    if profile.avatar_hash == _digest(data):
+        return profile.avatar_hash
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        source_format = image.format
+        image = ImageOps.exif_transpose(image)
+    except (UnidentifiedImageError, OSError):
+        logger.warning("Avatar of profile %s is not a readable image", profile_id)
+        return None
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+    # Re-encode the original so it no longer carries EXIF/GPS data
+    original, original_name = _encode_original(image, source_format, profile.avatar.name)
+    digest = _digest(original)
+
+    for size in SIZES:
+        thumb = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        for ext, fmt in FORMATS.items():
+            name = thumbnail_name(digest, size, ext)
+            if default_storage.exists(name):
+                continue
+            if fmt == "JPEG" and thumb.mode != "RGB":
+                thumb = thumb.convert("RGB")
+            default_storage.save(name, ContentFile(_encode(thumb, fmt)))
+
+    # Saved next to the upload, not over it: a new upload may have replaced
+    # the avatar while this ran, and then this result is thrown away
+    old_name = profile.avatar.name
+    new_name = default_storage.save(original_name, ContentFile(original))
+    updated = UserProfile.objects.filter(pk=profile.pk, avatar=old_name).update(
+        avatar=new_name, avatar_hash=digest,
+    )
+    if not updated:
+        default_storage.delete(new_name)
+        logger.info("Avatar of profile %s changed while it was processed", profile_id)
+        return None
+    default_storage.delete(old_name)
+
+    profile.avatar.name, profile.avatar_hash = new_name, digest
+    # What profile.save() would have invalidated (stats, cached pages)
+    post_save.send(
+        UserProfile, instance=profile, created=False, raw=False,
+        using=UserProfile.objects.db, update_fields={"avatar", "avatar_hash"},
+    )
+    return digest
+
+
+def schedule(profile_id):
+    """Queue the avatar for processing; repeated uploads before it runs are processed once"""
+    enqueue(process, dedupe_key=f"avatar:{profile_id}", profile_id=profile_id)
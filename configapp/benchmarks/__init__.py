@@ -0,0 +1,59 @@
+"""
+Benchmark harnesses, one module per subsystem, run by ``manage.py benchmark``
+against a seeded throwaway database:
+
+- ``endpoints``: latency, queries and peak memory of the hot endpoints,
+  with saved baselines to compare against,
+- ``serializers``: the read serializers against their ``.values()`` twins,
+- ``view_counting``: read throughput with view counting off, buffered and
+  written directly, and whether every view reached the database.
+"""
+import multiprocessing
+
+from django.contrib.auth.models import User
+
+from ..models import UserProfile
+from ..seeding import generate
+
+BENCH_PASSWORD = "bench123"
+
+
+def seed(users=50, posts=500, comments_per_post=5, seed=0, batch_size=1000):
+    """Fill the (empty) database with a deterministic synthetic dataset"""
+    generate(
+        users=users,
+        posts=posts,
+        comments=posts * comments_per_post,
+        seed=seed,
+        prefix="user",
+        batch_size=batch_size,
+    )
+    staff = User.objects.create_user("bench_admin", password=BENCH_PASSWORD, is_staff=True)
+    UserProfile.objects.get_or_create(user=staff)
+    return {"users": users, "posts": posts, "comments": posts * comments_per_post}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def in_processes(target, runs):
+    """
+    Call ``target(*args, results)`` in a fresh process per ``args`` in
+    ``runs``, one after the other; returns what each put on ``results``
+    """
+    from django.db import connections
+
+    connections.close_all()
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+    outcomes = []
+    for args in runs:
+        results = context.Queue()
+        process = context.Process(target=target, args=(*args, results))
+        process.start()
+        outcomes.append(results.get())
+        process.join()
+    return outcomes
@@ -0,0 +1,92 @@
+"""
+Hot endpoint benchmark.
+
+Requests each endpoint through the Django test client and reports latency
+percentiles, queries per request and peak Python memory. Results can be
+saved as a JSON baseline and compared on a later run.
+"""
+import statistics
+import time
+import tracemalloc
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from ..models import Post
+from . import BENCH_PASSWORD, percentile
+
+
+def default_endpoints():
+    """(name, url, needs_staff) for every endpoint we track"""
+    post_id = Post.objects.order_by("-created_at").values_list("pk", flat=True).first()
+    return [
+        ("post_list", "/posts/", False),
+        ("post_detail", f"/posts/{post_id}/", False),
+        ("index", "/blog/", False),
+        ("api_post_list", "/api/posts/", False),
+        ("api_comment_list", f"/api/posts/{post_id}/comments/", False),
+        ("admin_dashboard", "/admin-panel/", True),
+        ("admin_users", "/admin-panel/users/", True),
+        ("admin_posts", "/admin-panel/posts/", True),
+        ("admin_comments", "/admin-panel/comments/", True),
+    ]
+
+
+def measure(client, url, iterations=20, warm=False):
+    """Latency, query count and peak memory for one URL"""
+    timings = []
+    for _ in range(iterations):
+        if not warm:
+            cache.clear()
+        started = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f"{url} returned {response.status_code}")
+
+    # One extra instrumented request; tracemalloc would skew the timings
+    if not warm:
+        cache.clear()
+    tracemalloc.start()
+    with CaptureQueriesContext(connection) as queries:
+        client.get(url)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "url": url,
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(percentile(timings, 0.95), 3),
+        "queries": len(queries.captured_queries),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def run(endpoints=None, iterations=20, warm=False):
+    endpoints = endpoints or default_endpoints()
+    anonymous = Client()
+    staff = Client()
+    staff.login(username="bench_admin", password=BENCH_PASSWORD)
+    results = {}
+    for name, url, needs_staff in endpoints:
+        client = staff if needs_staff else anonymous
+        results[name] = measure(client, url, iterations=iterations, warm=warm)
+    return results
+
+
+def compare(results, baseline, tolerance=0.25):
+    """Return human readable regressions against a saved baseline"""
+    problems = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if current["queries"] > before["queries"]:
+            problems.append(f"{name}: queries {before['queries']} -> {current['queries']}")
+        if current["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            problems.append(f"{name}: p95 {before['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current["peak_kb"] > before["peak_kb"] * (1 + tolerance):
+            problems.append(f"{name}: peak memory {before['peak_kb']}KB -> {current['peak_kb']}KB")
+    return problems
@@ -0,0 +1,65 @@
+"""
+Read serializer benchmark: ModelSerializer + JSONRenderer against
+ValuesSerializer + FastJSONRenderer, query included. The two outputs must
+be byte for byte the same.
+"""
+import time
+
+from rest_framework.renderers import JSONRenderer
+
+from ..models import UserProfile, Post, Comment
+from ..renderers import FastJSONRenderer
+from ..serializers import (
+    UserProfileSerializer, PostSerializer, CommentSerializer,
+    UserProfileValuesSerializer, PostValuesSerializer, CommentValuesSerializer,
+)
+
+CASES = {
+    "posts": (
+        lambda: Post.objects.select_related("author").order_by("-created_at", "-id"),
+        PostSerializer, PostValuesSerializer,
+    ),
+    "comments": (
+        lambda: Comment.objects.select_related("author").order_by("-created_at", "-id"),
+        CommentSerializer, CommentValuesSerializer,
+    ),
+    "profiles": (
+        lambda: UserProfile.objects.select_related("user").order_by("pk"),
+        UserProfileSerializer, UserProfileValuesSerializer,
+    ),
+}
+
+
+def _best_of(function, iterations):
+    best = None
+    for _ in range(iterations):
+        started = time.perf_counter()
+        output = function()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output
+
+
+def run(sizes=(1000, 10000), iterations=5):
+    """Best-of timings per case and size; fails if the outputs differ"""
+    results = {}
+    for name, (queryset, serializer_class, values_class) in CASES.items():
+        for size in sizes:
+            rows = min(size, queryset().count())
+            old_ms, old = _best_of(
+                lambda: JSONRenderer().render(serializer_class(queryset()[:size], many=True).data),
+                iterations,
+            )
+            new_ms, new = _best_of(
+                lambda: FastJSONRenderer().render(values_class().many(values_class().values(queryset())[:size])),
+                iterations,
+            )
+            if old != new:
+                raise RuntimeError(f"{name}: fast serializer output differs at {rows} rows")
+            results[f"{name}_{size}"] = {
+                "rows": rows,
+                "serializer_ms": round(old_ms, 2),
+                "values_ms": round(new_ms, 2),
+                "speedup": round(old_ms / new_ms, 2) if new_ms else None,
+            }
+    return results
@@ -0,0 +1,120 @@
+"""
+View counting benchmark.
+
+Drives the post detail pages with many concurrent clients through the WSGI
+handler (a threaded server, called in-process without sockets) with view
+counting off, buffered (``configapp.viewcounts``) and written directly with
+one UPDATE per view, and checks that every view reached the database.
+"""
+import io
+import statistics
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import F, Sum
+
+from .. import viewcounts
+from ..models import Post
+from . import in_processes, percentile
+
+MODES = ("off", "buffered", "direct")
+
+
+def urls(posts=20):
+    ids = Post.objects.order_by("-created_at").values_list("pk", flat=True)[:posts]
+    return [url for pk in ids for url in (f"/posts/{pk}/", f"/api/posts/{pk}/")]
+
+
+def _call_wsgi(app, url):
+    path, _, query = url.partition("?")
+    environ = {
+        "REQUEST_METHOD": "GET", "PATH_INFO": path, "QUERY_STRING": query,
+        "SERVER_NAME": "testserver", "SERVER_PORT": "80", "SERVER_PROTOCOL": "HTTP/1.1",
+        "HTTP_HOST": "testserver", "HTTP_ACCEPT": "application/json",
+        "wsgi.version": (1, 0), "wsgi.url_scheme": "http", "wsgi.input": io.BytesIO(),
+        "wsgi.errors": sys.stderr, "wsgi.multithread": True, "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    status = []
+    body = app(environ, lambda s, headers, exc_info=None: status.append(int(s[:3])))
+    try:
+        for _ in body:
+            pass
+    finally:
+        body.close()
+    return status[0]
+
+
+def _run_wsgi(urls, connections, requests, threads):
+    from django.core.handlers.wsgi import WSGIHandler
+
+    app = WSGIHandler()
+    workers = threading.Semaphore(threads)
+    latencies = []
+    errors = []
+
+    def client(number):
+        for i in range(requests):
+            url = urls[(number + i) % len(urls)]
+            started = time.perf_counter()
+            with workers:
+                status = _call_wsgi(app, url)
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors.append(url)
+
+    for url in urls:
+        _call_wsgi(app, url)
+    clients = [threading.Thread(target=client, args=(n,)) for n in range(connections)]
+    started = time.perf_counter()
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return time.perf_counter() - started, latencies, errors
+
+
+def _count_directly(request, response, pk):
+    if request.method == "GET" and response.status_code in viewcounts.COUNTED_STATUSES:
+        Post.objects.filter(pk=pk).update(view_count=F("view_count") + 1)
+
+
+def _total_views():
+    return Post.objects.aggregate(total=Sum("view_count"))["total"] or 0
+
+
+def _worker(mode, db_name, urls, connections, requests, threads, flush_seconds, results):
+    from django.db import connections as databases
+
+    databases["default"].settings_dict["NAME"] = db_name
+    settings.BLOG_VIEW_COUNTING = mode != "off"
+    settings.BLOG_VIEW_FLUSH_SECONDS = flush_seconds
+    if mode == "direct":
+        viewcounts.count_view = _count_directly
+    before = _total_views()
+    seconds, latencies, errors = _run_wsgi(urls, connections, requests, threads)
+    viewcounts.counter.stop()
+    served = len(latencies) + len(urls) - len(errors)
+    results.put({
+        "mode": mode,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "requests_per_second": round(len(latencies) / seconds, 1) if seconds else 0.0,
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "expected_views": served if mode != "off" else 0,
+        "counted_views": _total_views() - before,
+    })
+
+
+def run(db_name, connections=20, requests=50, threads=8, flush_seconds=1.0):
+    """
+    Read throughput of the post detail endpoints per counting mode, plus
+    how many views each mode wrote (all of them, or it lost some)
+    """
+    pages = urls()
+    return in_processes(_worker, [
+        (mode, db_name, pages, connections, requests, threads, flush_seconds) for mode in MODES
+    ])
@@ -0,0 +1,176 @@
+"""
+Validators for conditional GET (ETag / Last-Modified).
+
+Validators never render the response. Lists and the post page get an
+ETag from the page cache version tokens (``page_cache``), which the
+signals bump on every change they show, deletes included: a cache read,
+whatever the table sizes. They have no Last-Modified, since a timestamp
+cannot tell that a row went away. A single post and the comments of a post
+use indexed lookups on that post; the post's ETag includes ``view_count``,
+which view flushes change without touching ``updated_at``, so it has no
+Last-Modified either. Results are memoized on the request
+because ``condition`` asks for the ETag and Last-Modified separately.
+
+The ``a``-prefixed validators and ``acondition`` are the same for async
+views: they use the async ORM and ``request.auser()``.
+"""
+import datetime
+import hashlib
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from . import page_cache
+from .models import Post, Comment
+
+
+def _memoize(request, key, compute):
+    cache = request.__dict__.setdefault("_blog_validators", {})
+    if key not in cache:
+        cache[key] = compute()
+    return cache[key]
+
+
+def _state(queryset):
+    state = queryset.aggregate(last=Max("updated_at"), total=Count("id"))
+    return state["last"], state["total"]
+
+
+def _digest(request, user, parts):
+    user = user.pk if user.is_authenticated else ""
+    raw = "|".join(str(part) for part in (
+        request.get_full_path(), request.META.get("HTTP_ACCEPT", ""), user, *parts
+    ))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _etag(request, *parts):
+    return _digest(request, request.user, parts)
+
+
+def _readonly(request):
+    return request.method in ("GET", "HEAD")
+
+
+# Template feed: shows comment counts, so any comment changes it
+def feed_etag(request, *args, **kwargs):
+    if _readonly(request):
+        return _etag(request, page_cache.get_version("site"))
+
+
+# /api/posts/: post fields and authors only
+def post_list_etag(request, *args, **kwargs):
+    if _readonly(request):
+        return _etag(request, page_cache.get_version("posts"))
+
+
+# A single post with its comments (template detail page)
+def post_page_etag(request, pk, *args, **kwargs):
+    if not _readonly(request):
+        return None
+    author_id = Post.objects.filter(pk=pk).values_list("author_id", flat=True).first()
+    if author_id is None:
+        return None
+    # post:<pk> follows the post, its comments and the commenters' profiles;
+    # author:<id> the author's profile and the sidebar of their other posts
+    versions = page_cache.get_versions(page_cache.post_key(pk), page_cache.author_key(author_id))
+    return _etag(request, *versions.values())
+
+
+# A single post (/api/posts/<pk>/)
+def post_etag(request, pk, *args, **kwargs):
+    if _readonly(request):
+        state = Post.objects.filter(pk=pk).values_list("updated_at", "view_count").first()
+        return _etag(request, *state) if state else None
+
+
+# Comments of a post (/api/posts/<pk>/comments/)
+def _comments_state(request, pk):
+    return _memoize(request, ("comments", pk), lambda: (
+        _state(Comment.objects.filter(post_id=pk))
+    ))
+
+
+def comments_etag(request, pk, *args, **kwargs):
+    if _readonly(request):
+        return _etag(request, pk, *_comments_state(request, pk))
+
+
+def comments_last_modified(request, pk, *args, **kwargs):
+    if _readonly(request):
+        return _comments_state(request, pk)[0]
+
+
+# Async validators (ASGI read path)
+async def _amemoize(request, key, compute):
+    cache = request.__dict__.setdefault("_blog_validators", {})
+    if key not in cache:
+        cache[key] = await compute()
+    return cache[key]
+
+
+async def _astate(queryset):
+    state = await queryset.aaggregate(last=Max("updated_at"), total=Count("id"))
+    return state["last"], state["total"]
+
+
+async def _aetag(request, *parts):
+    return _digest(request, await request.auser(), parts)
+
+
+async def apost_list_etag(request, *args, **kwargs):
+    if _readonly(request):
+        return await _aetag(request, await page_cache.aget_version("posts"))
+
+
+async def apost_etag(request, pk, *args, **kwargs):
+    if _readonly(request):
+        state = await Post.objects.filter(pk=pk).values_list("updated_at", "view_count").afirst()
+        return await _aetag(request, *state) if state else None
+
+
+async def _acomments_state(request, pk):
+    return await _amemoize(request, ("comments", pk), lambda: (
+        _astate(Comment.objects.filter(post_id=pk))
+    ))
+
+
+async def acomments_etag(request, pk, *args, **kwargs):
+    if _readonly(request):
+        return await _aetag(request, pk, *await _acomments_state(request, pk))
+
+
+async def acomments_last_modified(request, pk, *args, **kwargs):
+    if _readonly(request):
+        return (await _acomments_state(request, pk))[0]
+
+
+def acondition(etag_func=None, last_modified_func=None):
+    """``django.views.decorators.http.condition`` for async views and validators"""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            last_modified = None
+            if last_modified_func:
+                moment = await last_modified_func(request, *args, **kwargs)
+                if moment:
+                    if timezone.is_naive(moment):
+                        moment = timezone.make_aware(moment, datetime.timezone.utc)
+                    last_modified = int(moment.timestamp())
+            etag = await etag_func(request, *args, **kwargs) if etag_func else None
+            etag = quote_etag(etag) if etag is not None else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if request.method in ("GET", "HEAD"):
+                if last_modified and not response.has_header("Last-Modified"):
+                    response.headers["Last-Modified"] = http_date(last_modified)
+                if etag:
+                    response.headers.setdefault("ETag", etag)
+            return response
+        return wrapper
+    return decorator
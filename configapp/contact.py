@@ -0,0 +1,30 @@
+"""Messages from the portfolio contact form, mailed by a task queue worker"""
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.mail import EmailMessage
+from django.core.validators import validate_email
+
+from .tasks import task
+
+NAME_MAX_LENGTH = 100
+
+
+def valid_sender(name, email):
+    """The name and address go into mail headers: one short line, a real address"""
+    if len(name) > NAME_MAX_LENGTH or "\n" in name or "\r" in name:
+        return False
+    try:
+        validate_email(email)
+    except ValidationError:
+        return False
+    return True
+
+
+@task
+def send_message(name, email, message):
+    EmailMessage(
+        subject=f"Saytdan xabar: {name}",
+        body=f"{message}\n\n{name} <{email}>",
+        to=[settings.BLOG_CONTACT_EMAIL],
+        reply_to=[email],
+    ).send()
@@ -0,0 +1,92 @@
+from django.contrib.auth.models import User
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import UserProfile, Post, Comment
+
+
+def _add(field, delta):
+    # Greatest() keeps the counter from going negative if it already drifted
+    return Greatest(F(field) + delta, 0)
+
+
+def adjust_post_comments(post_id, delta):
+    """Atomically add ``delta`` to Post.comment_count"""
+    Post.objects.filter(pk=post_id).update(comment_count=_add("comment_count", delta))
+
+
+def adjust_profile(user_id, posts=0, comments=0):
+    """Atomically add to the post/comment counters of a user's profile"""
+    changes = {}
+    if posts:
+        changes["post_count"] = _add("post_count", posts)
+    if comments:
+        changes["comment_count"] = _add("comment_count", comments)
+    if not changes:
+        return
+    updated = UserProfile.objects.filter(user_id=user_id).update(**changes)
+    # Never for decrements: deleting a user cascades here, and a profile
+    # created now would point at a user row about to go
+    if not updated and posts >= 0 and comments >= 0 and User.objects.filter(pk=user_id).exists():
+        # Profiles are created lazily, so start this one from real counts
+        profile, created = UserProfile.objects.get_or_create(user_id=user_id)
+        recount_profiles(UserProfile.objects.filter(pk=profile.pk))
+
+
+def _chunks(ids, size=500):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _count_subquery(queryset, field, outer="pk"):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef(outer)})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("pk"))
+            .values("total"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def recount_posts(queryset=None):
+    """Rewrite Post.comment_count where it drifted, return number of fixed rows"""
+    queryset = Post.objects.all() if queryset is None else queryset
+    drifted = queryset.annotate(
+        actual=_count_subquery(Comment.objects.all(), "post")
+    ).exclude(comment_count=F("actual"))
+    ids = list(drifted.values_list("pk", flat=True))
+    for chunk in _chunks(ids):
+        Post.objects.filter(pk__in=chunk).update(
+            comment_count=_count_subquery(Comment.objects.all(), "post")
+        )
+    return len(ids)
+
+
+def recount_profiles(queryset=None):
+    """Rewrite UserProfile post/comment counters where they drifted"""
+    queryset = UserProfile.objects.all() if queryset is None else queryset
+    posts = _count_subquery(Post.objects.all(), "author", outer="user_id")
+    comments = _count_subquery(Comment.objects.all(), "author", outer="user_id")
+    drifted = queryset.annotate(
+        actual_posts=posts, actual_comments=comments
+    ).filter(~Q(post_count=F("actual_posts")) | ~Q(comment_count=F("actual_comments")))
+    ids = list(drifted.values_list("pk", flat=True))
+    for chunk in _chunks(ids):
+        UserProfile.objects.filter(pk__in=chunk).update(
+            post_count=posts, comment_count=comments
+        )
+    return len(ids)
+
+
+def create_missing_profiles(batch_size=1000):
+    """Give every user a profile so there is somewhere to keep the counters"""
+    missing = User.objects.filter(userprofile__isnull=True).values_list("pk", flat=True)
+    created = UserProfile.objects.bulk_create(
+        [UserProfile(user_id=pk) for pk in missing.iterator(chunk_size=batch_size)],
+        batch_size=batch_size,
+    )
+    return [profile.user_id for profile in created]
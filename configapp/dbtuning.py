@@ -0,0 +1,132 @@
+"""
+SQLite tuning.
+
+``apply_pragmas`` runs on every new SQLite connection (``connection_created``)
+and applies ``BLOG_SQLITE_PRAGMAS``: synchronous=NORMAL (safe with WAL), a
+bigger page cache, mmap reads and a busy timeout so writers wait for the lock
+instead of failing with "database is locked". The WAL journal, so readers
+never block the writer, is persistent in the database file and only set when
+``journal_mode`` is listed (``BLOG_SQLITE_JOURNAL_MODE``); ``apply_pragmas``
+leaves it alone when the file is already in that mode. Writes start with BEGIN
+IMMEDIATE (``transaction_mode`` in DATABASES OPTIONS), which takes the write
+lock up front and avoids the deadlock-like SQLITE_BUSY of upgrading a read
+transaction.
+
+``stress`` forks writer processes against a scratch database to measure
+write throughput and lock errors (``manage.py sqlite_stress``).
+"""
+import multiprocessing
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+
+DEFAULT_PRAGMAS = {
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -20000,
+    "mmap_size": 134217728,
+    "temp_store": "MEMORY",
+}
+
+# What a stock Django SQLite connection looks like, for comparison runs
+UNTUNED_PRAGMAS = {
+    "synchronous": "FULL",
+    "busy_timeout": 0,
+}
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    pragmas = getattr(settings, "BLOG_SQLITE_PRAGMAS", DEFAULT_PRAGMAS)
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            if name == "journal_mode":
+                cursor.execute("PRAGMA journal_mode")
+                if cursor.fetchone()[0].lower() == str(value).lower():
+                    continue
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def _writer(db_name, tuned, writes, post_ids, user_ids, results):
+    import django
+
+    if not django.apps.apps.ready:
+        django.setup()
+    from django.db import OperationalError, connections, transaction
+    from .models import Comment
+
+    connection = connections["default"]
+    connection.close()
+    connection.settings_dict["NAME"] = db_name
+    if tuned:
+        settings.BLOG_SQLITE_PRAGMAS = DEFAULT_PRAGMAS
+    else:
+        settings.BLOG_SQLITE_PRAGMAS = UNTUNED_PRAGMAS
+        connection.settings_dict["OPTIONS"] = {"timeout": 0}
+
+    done = errors = 0
+    pid = os.getpid()
+    started = time.perf_counter()
+    for i in range(writes):
+        try:
+            with transaction.atomic():
+                Comment.objects.create(
+                    post_id=post_ids[i % len(post_ids)],
+                    author_id=user_ids[(i + pid) % len(user_ids)],
+                    content=f"stress {pid} {i}",
+                )
+            done += 1
+        except OperationalError:
+            errors += 1
+    results.put((done, errors, time.perf_counter() - started))
+    connection.close()
+
+
+def stress(db_name, workers=4, writes=200, tuned=True):
+    """
+    Run ``workers`` processes each creating ``writes`` comments through the
+    ORM (so counters, search triggers and cache signals are included).
+    Needs at least one post and one user in ``db_name``.
+    """
+    from django.db import connections
+    from django.contrib.auth.models import User
+    from .models import Post
+
+    post_ids = list(Post.objects.values_list("pk", flat=True)[:50])
+    user_ids = list(User.objects.values_list("pk", flat=True)[:50])
+    connections.close_all()
+    # The journal mode is stored in the file; switch it once, not per worker
+    raw = sqlite3.connect(db_name, timeout=5)
+    try:
+        raw.execute(f"PRAGMA journal_mode = {'WAL' if tuned else 'DELETE'}")
+    finally:
+        raw.close()
+
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+    results = context.Queue()
+    processes = [
+        context.Process(target=_writer, args=(db_name, tuned, writes, post_ids, user_ids, results))
+        for _ in range(workers)
+    ]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+
+    done = sum(outcome[0] for outcome in outcomes)
+    errors = sum(outcome[1] for outcome in outcomes)
+    return {
+        "mode": "tuned" if tuned else "untuned",
+        "workers": workers,
+        "writes": done,
+        "locked_errors": errors,
+        "seconds": round(elapsed, 3),
+        "writes_per_second": round(done / elapsed, 1) if elapsed else 0.0,
+    }
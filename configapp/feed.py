@@ -0,0 +1,117 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .models import Post
+
+FEED_PAGE_SIZE = 12
+
+
+def get_page_size():
+    return getattr(settings, "BLOG_FEED_PAGE_SIZE", FEED_PAGE_SIZE)
+
+
+def encode_cursor(obj, field="created_at"):
+    """Encode the (field, id) position of a row into an opaque token"""
+    raw = f"{getattr(obj, field).isoformat()}|{obj.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Return (datetime, id) for a cursor token, or None if it is invalid"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        created_at, pk = raw.rsplit("|", 1)
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        return None
+    if created_at is None:
+        return None
+    return created_at, pk
+
+
+class KeysetPage:
+    """One page of a keyset paginated list plus the cursors around it"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def keyset_page(queryset, after=None, before=None, page_size=None, field="created_at"):
+    """
+    Keyset pagination over (field, id), newest first.
+
+    ``after`` walks towards older rows, ``before`` back towards newer ones.
+    Every page costs a single query no matter how deep it is.
+    """
+    page_size = page_size or get_page_size()
+    after_key = decode_cursor(after)
+    before_key = decode_cursor(before)
+
+    if before_key and not after_key:
+        value, pk = before_key
+        qs = queryset.filter(
+            Q(**{f"{field}__gt": value}) | Q(**{field: value, "id__gt": pk})
+        ).order_by(field, "id")
+        rows = list(qs[:page_size + 1])
+        has_more = len(rows) > page_size
+        objects = rows[:page_size][::-1]
+        previous_cursor = encode_cursor(objects[0], field) if has_more and objects else None
+        next_cursor = encode_cursor(objects[-1], field) if objects else None
+        return KeysetPage(objects, next_cursor, previous_cursor)
+
+    qs = queryset.order_by(f"-{field}", "-id")
+    if after_key:
+        value, pk = after_key
+        qs = qs.filter(
+            Q(**{f"{field}__lt": value}) | Q(**{field: value, "id__lt": pk})
+        )
+    rows = list(qs[:page_size + 1])
+    objects = rows[:page_size]
+    next_cursor = encode_cursor(objects[-1], field) if len(rows) > page_size else None
+    previous_cursor = encode_cursor(objects[0], field) if after_key and objects else None
+    return KeysetPage(objects, next_cursor, previous_cursor)
+
+
+def feed_queryset():
+    """Posts with their author joined, newest first"""
+    return (
+        Post.objects.select_related("author")
+        .defer("content")
+        .order_by("-created_at", "-id")
+    )
+
+
+def get_feed_page(after=None, before=None, page_size=None, queryset=None):
+    """One page of the post feed, keyset paginated over (created_at, id)"""
+    qs = feed_queryset() if queryset is None else queryset
+    return keyset_page(qs, after, before, page_size)
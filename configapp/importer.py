@@ -0,0 +1,304 @@
+"""
+Bulk import of posts and comments.
+
+Items are validated with ``PostSerializer``/``CommentSerializer``
+(``many=True``) and inserted with ``bulk_create``, one transaction per
+chunk. The posts comments point at are looked up once per chunk, not once
+per comment. ``bulk_create`` skips ``save()`` and signals, so the derived post
+fields (excerpt, word count, reading time), counters, site stats, page
+cache versions, live comment readers and the trending batch are handled
+here per chunk; the search index fills itself through its insert triggers.
+
+``import_items`` yields one result per item, in input order:
+``{"index": i, "id": pk}`` or ``{"index": i, "errors": {...}}``.
+"""
+import csv
+import gzip
+import json
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.contrib.auth.models import User
+from rest_framework import serializers
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import live, page_cache, ranking, stats
+from .counters import adjust_post_comments, adjust_profile
+from .models import Post, Comment
+from .seeding import bulk_insert
+from .serializers import PostSerializer, CommentSerializer
+
+CHUNK_SIZE = 500
+MAX_ITEMS = 5000
+
+
+def read_json(data):
+    """Items of a JSON array"""
+    items = json.loads(data)
+    if not isinstance(items, list):
+        raise ValueError("Expected a JSON array")
+    return items
+
+
+def read_ndjson(lines):
+    """Items of an NDJSON stream (bytes or str lines), blank lines skipped"""
+    for number, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode()
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError:
+                raise ValueError(f"Line {number} is not valid JSON")
+
+
+def read_csv(text_file):
+    for row in csv.DictReader(text_file):
+        yield {name: (value if value != "" else None) for name, value in row.items()}
+
+
+def _chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Importer:
+    """
+    ``author``: the author of every item (the API user). Without it the
+    item's ``author_id`` or ``author`` (username) is used, as written by
+    ``export``. ``post_id`` does the same for comments.
+    """
+    model = None
+    serializer_class = None
+
+    def __init__(self, author=None, post_id=None, context=None, keep_ids=False,
+                 keep_timestamps=False, chunk_size=CHUNK_SIZE):
+        self.author = author
+        self.post_id = post_id
+        self.context = context or {}
+        self.keep_ids = keep_ids
+        self.keep_timestamps = keep_timestamps
+        self.chunk_size = chunk_size
+
+    def prepare(self, item):
+        """Input item -> serializer data"""
+        return item
+
+    def get_serializer(self, items):
+        return self.serializer_class(data=items, many=True, context=self.context)
+
+    def validate(self, items):
+        """(valid (index, validated_data) pairs, {index: errors})"""
+        serializer = self.get_serializer(items)
+        if serializer.is_valid():
+            return list(enumerate(serializer.validated_data)), {}
+        errors = {
+            index: error for index, error in enumerate(serializer.errors) if error
+        }
+        valid = [index for index in range(len(items)) if index not in errors]
+        serializer = self.get_serializer([items[index] for index in valid])
+        serializer.is_valid(raise_exception=True)
+        return list(zip(valid, serializer.validated_data)), errors
+
+    def _authors(self, items):
+        """username -> id for the usernames referenced by a chunk"""
+        names = {item.get("author") for item in items if isinstance(item, dict)}
+        names.discard(None)
+        return dict(User.objects.filter(username__in=names).values_list("username", "pk"))
+
+    def author_id(self, item, authors):
+        if self.author is not None:
+            return self.author.pk
+        if item.get("author_id"):
+            return int(item["author_id"])
+        return authors.get(item.get("author"))
+
+    def build(self, item, data, authors):
+        """Model instance for one validated item, or an errors dict"""
+        author_id = self.author_id(item, authors)
+        if author_id is None:
+            return {"author": ["Muallif topilmadi"]}
+        obj = self.model(**data, author_id=author_id)
+        if self.keep_ids and item.get("id"):
+            obj.pk = int(item["id"])
+        if self.keep_timestamps:
+            now = timezone.now()
+            for name in ("created_at", "updated_at"):
+                value = item.get(name)
+                moment = parse_datetime(value) if isinstance(value, str) else None
+                setattr(obj, name, moment or now)
+        return obj
+
+    def inserted(self, objects):
+        """Bring counters and caches up to date for a committed chunk"""
+        raise NotImplementedError
+
+    def run_chunk(self, items):
+        prepared = [self.prepare(item) if isinstance(item, dict) else item for item in items]
+        valid, errors = self.validate(prepared)
+        authors = self._authors(prepared) if self.author is None else {}
+        objects = []
+        positions = []
+        for index, data in valid:
+            obj = self.build(prepared[index], data, authors)
+            if isinstance(obj, dict):
+                errors[index] = obj
+            else:
+                objects.append(obj)
+                positions.append(index)
+
+        results = {index: {"errors": error} for index, error in errors.items()}
+        if objects:
+            try:
+                with transaction.atomic():
+                    if self.keep_timestamps:
+                        bulk_insert(self.model, objects)
+                    else:
+                        self.model.objects.bulk_create(objects)
+                    self.inserted(objects)
+            except DatabaseError as e:
+                for index in positions:
+                    results[index] = {"errors": {"non_field_errors": [str(e)]}}
+            else:
+                for index, obj in zip(positions, objects):
+                    results[index] = {"id": obj.pk}
+        return [results[index] for index in range(len(items))]
+
+    def import_items(self, items):
+        offset = 0
+        for chunk in _chunked(items, self.chunk_size):
+            for index, result in enumerate(self.run_chunk(chunk), offset):
+                yield {"index": index, **result}
+            offset += len(chunk)
+
+
+class PostImporter(Importer):
+    model = Post
+    serializer_class = PostSerializer
+
+    def build(self, item, data, authors):
+        obj = super().build(item, data, authors)
+        if isinstance(obj, Post):
+            obj.fill_derived_fields()
+        return obj
+
+    def inserted(self, posts):
+        for author_id, n in Counter(post.author_id for post in posts).items():
+            adjust_profile(author_id, posts=n)
+        stats.bump("total_posts", len(posts))
+        stats.invalidate("recent_posts", "top_contributors")
+        page_cache.bump("site", "posts", *{page_cache.author_key(post.author_id) for post in posts})
+        ranking.schedule()
+
+
+def _int_or_none(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class KnownPostField(serializers.PrimaryKeyRelatedField):
+    """``post`` checked against posts loaded beforehand, {pk: post}"""
+
+    def __init__(self, posts, **kwargs):
+        self.posts = posts
+        super().__init__(queryset=Post.objects.all(), **kwargs)
+
+    def to_internal_value(self, data):
+        pk = _int_or_none(data)
+        if pk is None:
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if pk not in self.posts:
+            self.fail("does_not_exist", pk_value=data)
+        return self.posts[pk]
+
+
+class CommentImporter(Importer):
+    model = Comment
+    serializer_class = CommentSerializer
+
+    def get_serializer(self, items):
+        serializer = super().get_serializer(items)
+        ids = {_int_or_none(item.get("post")) for item in items if isinstance(item, dict)}
+        ids.discard(None)
+        serializer.child.fields["post"] = KnownPostField(Post.objects.only("pk").in_bulk(ids))
+        return serializer
+
+    def prepare(self, item):
+        item = dict(item)
+        if self.post_id is not None:
+            item["post"] = self.post_id
+        elif item.get("post") is None:
+            item["post"] = item.get("post_id")
+        return item
+
+    def inserted(self, comments):
+        for post_id, n in Counter(comment.post_id for comment in comments).items():
+            adjust_post_comments(post_id, n)
+        for author_id, n in Counter(comment.author_id for comment in comments).items():
+            adjust_profile(author_id, comments=n)
+        stats.bump("total_comments", len(comments))
+        stats.invalidate("recent_comments", "recent_posts")
+        page_cache.bump("site", *{page_cache.post_key(comment.post_id) for comment in comments})
+        by_post = defaultdict(list)
+        for comment in comments:
+            by_post[comment.post_id].append(comment.pk)
+        for post_id, ids in by_post.items():
+            live.publish(post_id, ids)
+        ranking.schedule()
+
+
+IMPORTERS = {"posts": PostImporter, "comments": CommentImporter}
+
+
+def summarize(results):
+    """Consume results into {"created", "failed", "results"}"""
+    results = list(results)
+    failed = sum(1 for result in results if "errors" in result)
+    return {"created": len(results) - failed, "failed": failed, "results": results}
+
+
+def request_items(request, limit=None):
+    """
+    Items from a DRF request: NDJSON read line by line, JSON array otherwise.
+    With ``limit``, a request carrying more items is refused before any is
+    imported.
+    """
+    content_type = request.content_type.split(";")[0].strip()
+    if content_type in ("application/x-ndjson", "application/jsonlines"):
+        items = read_ndjson(request._request)
+    elif isinstance(request.data, list):
+        items = request.data
+    else:
+        raise ValueError("JSON massiv yoki NDJSON kutilgan")
+    if limit is None:
+        return items
+    items = list(islice(items, limit + 1))
+    if len(items) > limit:
+        raise ValueError(f"Bir so'rovda ko'pi bilan {limit} ta element yuborish mumkin")
+    return items
+
+
+def file_items(path, fmt=None):
+    """Items of an export file (NDJSON, JSON array or CSV, optionally .gz)"""
+    opener = gzip.open if path.endswith(".gz") else open
+    name = path[:-3] if path.endswith(".gz") else path
+    fmt = fmt or name.rsplit(".", 1)[-1]
+    with opener(path, "rt", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            yield from read_csv(f)
+        elif fmt == "json":
+            yield from read_json(f.read())
+        else:
+            yield from read_ndjson(f)
@@ -0,0 +1,269 @@
+"""
+Live comments over Server-Sent Events.
+
+New comments are published after commit to the broker named by
+``BLOG_LIVE_BROKER``, one channel per post:
+
+- ``LocalBroker`` (default) fans each event out to the readers connected to
+  this process. Comments written by other processes are not seen.
+- ``PollingBroker`` is the stand-in for several processes without a
+  message bus: each process runs one poller per watched post, reading new
+  comments from the database every ``BLOG_LIVE_POLL_SECONDS`` however many
+  readers are connected.
+
+A comment is serialized once per publish, not once per reader. Event ids
+are comment ids: a reader reconnecting with ``Last-Event-ID`` (or
+``?last_event_id=``) first gets the comments it missed from the database.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .models import Comment
+from .renderers import FastJSONRenderer
+from .serializers import CommentValuesSerializer
+
+DEFAULT_BROKER = "configapp.live.LocalBroker"
+# Readers that fall this many publishes behind are disconnected; they
+# reconnect and catch up from the database
+QUEUE_SIZE = 100
+BACKLOG_LIMIT = 200
+HEARTBEAT_SECONDS = 15
+RETRY_MS = 3000
+
+
+def _events(rows):
+    reader = CommentValuesSerializer()
+    renderer = FastJSONRenderer()
+    return [(row["id"], renderer.render(data)) for row, data in zip(rows, reader.many(rows))]
+
+
+def _queryset(post_id, after=None, ids=None):
+    queryset = Comment.objects.filter(post_id=post_id)
+    if after is not None:
+        queryset = queryset.filter(pk__gt=after)
+    if ids is not None:
+        queryset = queryset.filter(pk__in=ids)
+    return CommentValuesSerializer().values(queryset.order_by("id"))[:BACKLOG_LIMIT]
+
+
+def comment_events(post_id, after=None, ids=None):
+    """(id, JSON bytes) of the post's comments, oldest first"""
+    return _events(list(_queryset(post_id, after, ids)))
+
+
+async def acomment_events(post_id, after=None):
+    return _events([row async for row in _queryset(post_id, after)])
+
+
+RETRY = b"retry: %d\n\n" % RETRY_MS
+
+
+def format_event(event_id, data):
+    return b"id: %d\ndata: %s\n\n" % (event_id, data)
+
+
+class Subscription:
+    """One reader's queue, bound to the event loop it was opened on"""
+
+    def __init__(self, broker, post_id):
+        self.broker = broker
+        self.post_id = post_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+
+    async def __aenter__(self):
+        self.broker.add(self)
+        await self.broker.ready(self)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.broker.remove(self)
+
+    def put(self, events):
+        """Called on the subscription's loop; ``None`` ends the stream"""
+        try:
+            self.queue.put_nowait(events)
+        except asyncio.QueueFull:
+            self.broker.remove(self)
+            self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def get(self, timeout):
+        """The next list of events, ``[]`` on timeout, ``None`` when dropped"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return []
+
+
+class LocalBroker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = defaultdict(set)
+
+    def subscribe(self, post_id):
+        return Subscription(self, post_id)
+
+    def add(self, subscription):
+        with self.lock:
+            self.subscribers[subscription.post_id].add(subscription)
+
+    def remove(self, subscription):
+        with self.lock:
+            subscribers = self.subscribers.get(subscription.post_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscribers[subscription.post_id]
+
+    async def ready(self, subscription):
+        """Returns once events published from now on reach ``subscription``"""
+
+    def listening(self, post_id):
+        with self.lock:
+            return list(self.subscribers.get(post_id, ()))
+
+    def deliver(self, post_id, events):
+        """Fan ``events`` out; safe to call from any thread"""
+        by_loop = defaultdict(list)
+        for subscription in self.listening(post_id):
+            by_loop[subscription.loop].append(subscription)
+        # One hop per event loop, not per reader
+        for loop, subscriptions in by_loop.items():
+            loop.call_soon_threadsafe(_put_all, subscriptions, events)
+
+    def publish(self, post_id, comment_ids):
+        if self.listening(post_id):
+            self.deliver(post_id, comment_events(post_id, ids=comment_ids))
+
+
+def _put_all(subscriptions, events):
+    for subscription in subscriptions:
+        subscription.put(events)
+
+
+class PollingBroker(LocalBroker):
+    """Reads new comments from the database, so writes from any process show up"""
+
+    def __init__(self):
+        super().__init__()
+        self.pollers = {}
+
+    def add(self, subscription):
+        super().add(subscription)
+        with self.lock:
+            key = (subscription.post_id, subscription.loop)
+            if key not in self.pollers:
+                started = asyncio.Event()
+                task = subscription.loop.create_task(self.poll(*key, started))
+                self.pollers[key] = (task, started)
+
+    async def ready(self, subscription):
+        # The poller must have read its starting point before the reader
+        # reads its backlog, or a comment in between would be lost
+        with self.lock:
+            poller = self.pollers.get((subscription.post_id, subscription.loop))
+        if poller is not None:
+            await poller[1].wait()
+
+    async def poll(self, post_id, loop, started):
+        interval = getattr(settings, "BLOG_LIVE_POLL_SECONDS", 2)
+        try:
+            last_id = await Comment.objects.filter(post_id=post_id).order_by("-id").values_list(
+                "pk", flat=True
+            ).afirst()
+            started.set()
+            while True:
+                await asyncio.sleep(interval)
+                with self.lock:
+                    readers = [s for s in self.subscribers.get(post_id, ()) if s.loop is loop]
+                    if not readers:
+                        del self.pollers[(post_id, loop)]
+                        return
+                events = await acomment_events(post_id, after=last_id)
+                if events:
+                    last_id = events[-1][0]
+                    _put_all(readers, events)
+        except BaseException:
+            with self.lock:
+                self.pollers.pop((post_id, loop), None)
+            started.set()
+            raise
+
+    def publish(self, post_id, comment_ids):
+        # The pollers pick the new rows up from the database
+        pass
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(getattr(settings, "BLOG_LIVE_BROKER", DEFAULT_BROKER))()
+        return _broker
+
+
+def publish(post_id, comment_ids):
+    """Push new comments to live readers once the transaction commits"""
+    comment_ids = list(comment_ids)
+    transaction.on_commit(lambda: broker().publish(post_id, comment_ids))
+
+
+def parse_last_event_id(request):
+    value = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+async def missed_events(post_id, last_id):
+    """Pages of the comments after ``last_id`` (none without one)"""
+    while last_id is not None:
+        page = await acomment_events(post_id, after=last_id)
+        if page:
+            yield page
+        if len(page) < BACKLOG_LIMIT:
+            return
+        last_id = page[-1][0]
+
+
+async def replay(post_id, last_id):
+    """The missed comments as one SSE body, for servers that cannot hold a stream"""
+    chunks = [RETRY]
+    async for page in missed_events(post_id, last_id):
+        chunks.extend(format_event(event_id, data) for event_id, data in page)
+    return b"".join(chunks)
+
+
+async def stream(post_id, last_id):
+    """
+    SSE chunks: the missed comments, then new ones as they are published,
+    with a comment line as heartbeat. Ends when the reader falls behind.
+    """
+    yield RETRY
+    async with broker().subscribe(post_id) as subscription:
+        # Subscribed first, so nothing committed meanwhile is lost
+        async for page in missed_events(post_id, last_id):
+            for event_id, data in page:
+                last_id = event_id
+                yield format_event(event_id, data)
+        while True:
+            events = await subscription.get(HEARTBEAT_SECONDS)
+            if events is None:
+                return
+            if not events:
+                yield b": ping\n\n"
+            for event_id, data in events:
+                if last_id is None or event_id > last_id:
+                    last_id = event_id
+                    yield format_event(event_id, data)
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from configapp import page_cache, stats
+from configapp.models import Post
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored excerpt, word count and reading time of every post"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        fields = list(Post.DERIVED_FIELDS)
+        chunk_size = options["chunk_size"]
+        last_pk = 0
+        checked = updated = 0
+        while True:
+            # Keyset chunks: only the content and the stored values are read
+            posts = list(
+                Post.objects.filter(pk__gt=last_pk).order_by("pk")
+                .only("pk", "content", *fields)[:chunk_size]
+            )
+            if not posts:
+                break
+            last_pk = posts[-1].pk
+            stale = []
+            for post in posts:
+                stored = [getattr(post, name) for name in fields]
+                post.fill_derived_fields()
+                if stored != [getattr(post, name) for name in fields]:
+                    stale.append(post)
+            # bulk_update leaves updated_at and the search index alone
+            Post.objects.bulk_update(stale, fields)
+            checked += len(posts)
+            updated += len(stale)
+            if options["verbosity"] > 1:
+                self.stdout.write(f"  {checked} ta post tekshirildi")
+
+        if updated:
+            stats.invalidate("recent_posts")
+            page_cache.bump("site", "posts")
+        self.stdout.write(self.style.SUCCESS(f"Yangilandi: {updated} / {checked} post"))
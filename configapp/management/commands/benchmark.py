@@ -0,0 +1,135 @@
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from configapp import benchmarks, viewcounts
+from configapp.benchmarks import endpoints, serializers, view_counting
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway SQLite database and measure latency, queries and "
+        "memory of the hot endpoints"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--posts", type=int, default=500)
+        parser.add_argument("--comments", type=int, default=5, help="Comments per post")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--warm", action="store_true", help="Keep caches between requests")
+        parser.add_argument("--db-file", help="Where to put the throwaway database (default: temp dir)")
+        parser.add_argument("--save", metavar="JSON", help="Write the results as a baseline")
+        parser.add_argument("--compare", metavar="JSON", help="Fail if results regress against a baseline")
+        parser.add_argument("--tolerance", type=float, default=0.25)
+        parser.add_argument(
+            "--serializers", action="store_true",
+            help="Time the read serializers against their .values() twins instead of the endpoints",
+        )
+        parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000],
+                            help="Row counts for --serializers")
+        parser.add_argument(
+            "--view-counting", action="store_true",
+            help="Post detail throughput without view counting, buffered and with an UPDATE per view",
+        )
+        parser.add_argument("--connections", type=int, default=20,
+                            help="Concurrent clients for --view-counting")
+        parser.add_argument("--requests", type=int, default=50, help="Requests per client for --view-counting")
+        parser.add_argument("--threads", type=int, default=8, help="WSGI worker threads for --view-counting")
+        parser.add_argument("--flush-seconds", type=float, default=1.0,
+                            help="View flush interval for --view-counting")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Benchmark faqat SQLite bilan ishlaydi")
+
+        # Views of the throwaway database must not be flushed anywhere else;
+        # --view-counting turns counting on in its own worker processes
+        settings.BLOG_VIEW_COUNTING = False
+        db_file = options["db_file"] or os.path.join(tempfile.mkdtemp(), "bench.sqlite3")
+        connection.settings_dict.setdefault("TEST", {})["NAME"] = db_file
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            sizes = benchmarks.seed(
+                users=options["users"],
+                posts=options["posts"],
+                comments_per_post=options["comments"],
+                seed=options["seed"],
+            )
+            self.stdout.write(
+                f"Ma'lumotlar: {sizes['users']} foydalanuvchi, {sizes['posts']} post, "
+                f"{sizes['comments']} izoh"
+            )
+            if options["view_counting"]:
+                results = view_counting.run(
+                    db_file,
+                    connections=options["connections"],
+                    requests=options["requests"],
+                    threads=options["threads"],
+                    flush_seconds=options["flush_seconds"],
+                )
+            elif options["serializers"]:
+                results = serializers.run(options["rows"], iterations=options["iterations"])
+            else:
+                results = endpoints.run(iterations=options["iterations"], warm=options["warm"])
+        finally:
+            viewcounts.counter.stop()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options["view_counting"]:
+            self.stdout.write(
+                f"{'mode':<9} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+                f"{'views':>7} {'written':>7}"
+            )
+            for run in results:
+                self.stdout.write(
+                    f"{run['mode']:<9} {run['requests']:>8} {run['errors']:>6} {run['requests_per_second']:>8} "
+                    f"{run['p50_ms']:>8} {run['p95_ms']:>8} {run['expected_views']:>7} {run['counted_views']:>7}"
+                )
+            if any(run["counted_views"] != run["expected_views"] for run in results):
+                raise CommandError("Ko'rishlar soni mos kelmadi")
+            self.stdout.write(self.style.SUCCESS("Har bir ko'rish bazaga yozildi"))
+            return
+
+        if options["serializers"]:
+            self.stdout.write(f"{'case':<16} {'rows':>6} {'serializer ms':>14} {'values ms':>10} {'x':>6}")
+            for name, row in results.items():
+                self.stdout.write(
+                    f"{name:<16} {row['rows']:>6} {row['serializer_ms']:>14} "
+                    f"{row['values_ms']:>10} {row['speedup']:>6}"
+                )
+            self.stdout.write(self.style.SUCCESS("Natijalar bir xil (baytma-bayt)"))
+            return
+
+        self.stdout.write(f"{'endpoint':<18} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8} {'peak KB':>9}")
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<18} {row['p50_ms']:>9} {row['p95_ms']:>9} {row['queries']:>8} {row['peak_kb']:>9}"
+            )
+
+        report = {
+            "dataset": {k: options[k] for k in ("users", "posts", "comments", "seed")},
+            "results": results,
+        }
+        if options["save"]:
+            with open(options["save"], "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Baseline saqlandi: {options['save']}"))
+
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                baseline = json.load(f)
+            if baseline.get("dataset") != report["dataset"]:
+                self.stdout.write(self.style.WARNING("Baseline boshqa ma'lumotlar hajmi bilan olingan"))
+            problems = endpoints.compare(results, baseline["results"], options["tolerance"])
+            if problems:
+                raise CommandError("Regressiya:\n" + "\n".join(problems))
+            self.stdout.write(self.style.SUCCESS("Regressiya yo'q"))
@@ -0,0 +1,40 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from configapp import export
+
+
+class Command(BaseCommand):
+    help = "Stream posts, comments or users to a file as NDJSON or CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(export.EXPORTS))
+        parser.add_argument("--format", dest="fmt", choices=sorted(export.FORMATS), default="ndjson")
+        parser.add_argument("--since", help="Only rows changed after this ISO timestamp")
+        parser.add_argument("--gzip", action="store_true")
+        parser.add_argument("--output", "-o", help="File to write (default: stdout)")
+        parser.add_argument("--chunk-size", type=int, default=export.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            since = export.parse_since(options["since"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        chunks = export.stream(
+            options["kind"], options["fmt"], since=since,
+            compress=options["gzip"], chunk_size=options["chunk_size"],
+        )
+        output = open(options["output"], "wb") if options["output"] else sys.stdout.buffer
+        written = 0
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if options["output"]:
+                output.close()
+            else:
+                output.flush()
+        if options["output"]:
+            self.stdout.write(self.style.SUCCESS(f"{options['output']}: {written} bayt yozildi"))
@@ -0,0 +1,50 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from configapp import importer
+
+
+class Command(BaseCommand):
+    help = "Import posts or comments from an export file (NDJSON, JSON or CSV, optionally .gz)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(importer.IMPORTERS))
+        parser.add_argument("path")
+        parser.add_argument("--format", dest="fmt", choices=["ndjson", "json", "csv"],
+                            help="Default: from the file extension")
+        parser.add_argument("--author", help="Username owning every item (default: the file's author column)")
+        parser.add_argument("--post", type=int, help="Post id for every comment (default: the file's post_id)")
+        parser.add_argument("--keep-ids", action="store_true", help="Reuse the ids from the file")
+        parser.add_argument("--keep-timestamps", action="store_true", help="Reuse created_at/updated_at")
+        parser.add_argument("--chunk-size", type=int, default=importer.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        author = None
+        if options["author"]:
+            author = User.objects.filter(username=options["author"]).first()
+            if author is None:
+                raise CommandError(f"Foydalanuvchi topilmadi: {options['author']}")
+        job = importer.IMPORTERS[options["kind"]](
+            author=author,
+            post_id=options["post"],
+            keep_ids=options["keep_ids"],
+            keep_timestamps=options["keep_timestamps"],
+            chunk_size=options["chunk_size"],
+        )
+
+        created = failed = 0
+        try:
+            for result in job.import_items(importer.file_items(options["path"], options["fmt"])):
+                if "errors" in result:
+                    failed += 1
+                    if failed <= 20:
+                        self.stderr.write(f"#{result['index']}: {result['errors']}")
+                else:
+                    created += 1
+                if options["verbosity"] > 1 and (created + failed) % job.chunk_size == 0:
+                    self.stdout.write(f"  {created + failed} ta qator")
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        style = self.style.SUCCESS if not failed else self.style.WARNING
+        self.stdout.write(style(f"Yaratildi: {created}, xato: {failed}"))
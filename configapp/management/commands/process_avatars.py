@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from configapp import avatars
+from configapp.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = "Strip metadata from avatars and generate their thumbnails"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Also re-check avatars that already have thumbnails",
+        )
+
+    def handle(self, *args, **options):
+        profiles = UserProfile.objects.exclude(avatar="").exclude(avatar__isnull=True)
+        if not options["all"]:
+            profiles = profiles.filter(avatar_hash="")
+        done = 0
+        for pk in profiles.values_list("pk", flat=True).iterator():
+            if avatars.process(pk):
+                done += 1
+        self.stdout.write(self.style.SUCCESS(f"Qayta ishlangan avatarlar: {done}"))
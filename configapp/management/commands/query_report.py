@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from configapp.middleware import REPORT_ORDERS, load_snapshots
+
+
+class Command(BaseCommand):
+    help = "Show the routes doing the most SQL, from the profiling middleware snapshots"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--order", choices=sorted(REPORT_ORDERS), default="queries")
+        parser.add_argument("--limit", type=int, default=15)
+        parser.add_argument("--dir", help="Snapshot directory (default: BLOG_QUERY_PROFILING_DIR)")
+
+    def handle(self, *args, **options):
+        directory = options["dir"] or getattr(settings, "BLOG_QUERY_PROFILING_DIR", None)
+        try:
+            stats = load_snapshots(directory)
+        except (TypeError, FileNotFoundError):
+            raise CommandError(
+                "Snapshotlar topilmadi. BLOG_QUERY_PROFILING va BLOG_QUERY_PROFILING_DIR ni yoqing."
+            )
+
+        rows = stats.report(order_by=options["order"], limit=options["limit"])
+        self.stdout.write(
+            f"{'route':<28} {'req':>6} {'avg q':>7} {'max q':>6} {'sql ms':>8} {'view ms':>8}"
+        )
+        for row in rows:
+            self.stdout.write(
+                f"{row['route'][:28]:<28} {row['requests']:>6} {row['avg_queries']:>7} "
+                f"{row['max_queries']:>6} {row['avg_sql_ms']:>8} {row['avg_view_ms']:>8}"
+            )
+            for duplicate in row["duplicates"]:
+                self.stdout.write(self.style.WARNING(
+                    f"    x{duplicate['count']}  {duplicate['sql'][:100]}"
+                ))
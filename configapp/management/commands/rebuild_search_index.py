@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from configapp import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index from posts, comments and users"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        if search.is_enabled(connection):
+            search.rebuild(connection)
+        elif not search.install(connection):
+            self.stdout.write(self.style.WARNING(
+                "FTS5 mavjud emas, qidiruv LIKE orqali ishlaydi"
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS("Qidiruv indeksi qayta qurildi"))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from configapp.counters import create_missing_profiles, recount_posts, recount_profiles
+
+
+class Command(BaseCommand):
+    help = "Recompute Post.comment_count and UserProfile post/comment counters"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--no-create-profiles",
+            action="store_true",
+            help="Do not create missing UserProfile rows before recounting",
+        )
+
+    def handle(self, *args, **options):
+        if not options["no_create_profiles"]:
+            created = create_missing_profiles()
+            self.stdout.write(f"Yaratilgan profillar: {len(created)}")
+
+        fixed_posts = recount_posts()
+        fixed_profiles = recount_profiles()
+        self.stdout.write(self.style.SUCCESS(
+            f"Tuzatildi: {fixed_posts} post, {fixed_profiles} profil"
+        ))
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from configapp import tasks
+
+
+class Command(BaseCommand):
+    help = "Run background task workers (avatars, contact mails) until interrupted"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", "-w", type=int, default=2, help="Worker processes")
+        parser.add_argument(
+            "--burst", action="store_true", help="Exit once no task is due instead of waiting",
+        )
+        parser.add_argument("--poll", type=float, default=tasks.POLL_SECONDS,
+                            help="Seconds between queue checks when idle")
+        parser.add_argument("--stats", action="store_true", help="Print per-task metrics and exit")
+        parser.add_argument("--purge", type=int, metavar="DAYS",
+                            help="Delete tasks finished more than DAYS ago and exit")
+
+    def handle(self, *args, **options):
+        if options["purge"] is not None:
+            deleted = tasks.purge(options["purge"])
+            self.stdout.write(self.style.SUCCESS(f"O'chirilgan vazifalar: {deleted}"))
+            return
+        if options["stats"]:
+            self.write_stats()
+            return
+
+        self.stdout.write(f"Ishchilar: {options['workers']} (to'xtatish: Ctrl+C)")
+        counts = tasks.run_workers(options["workers"], burst=options["burst"], poll=options["poll"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Bajarilgan vazifalar: {sum(count for count in counts if count is not None)}"
+        ))
+        if None in counts:
+            self.stderr.write(self.style.ERROR(f"To'xtab qolgan ishchilar: {counts.count(None)}"))
+
+    def write_stats(self):
+        self.stdout.write(
+            f"{'task':<40} {'pending':>7} {'running':>7} {'done':>6} {'failed':>6} "
+            f"{'avg ms':>9} {'max ms':>9} {'retries':>7}"
+        )
+        for row in tasks.metrics():
+            avg_ms = round(row["avg_ms"], 1) if row["avg_ms"] is not None else "-"
+            max_ms = round(row["max_ms"], 1) if row["max_ms"] is not None else "-"
+            self.stdout.write(
+                f"{row['name']:<40} {row['pending']:>7} {row['running']:>7} {row['done']:>6} "
+                f"{row['failed']:>6} {avg_ms:>9} {max_ms:>9} {row['retries'] or 0:>7}"
+            )
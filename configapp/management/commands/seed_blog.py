@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from configapp import seeding
+
+
+class Command(BaseCommand):
+    help = "Fill the database with a large, deterministic synthetic blog"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--posts", type=int, default=10000)
+        parser.add_argument("--comments", type=int, default=50000, help="Total comments (skewed across posts)")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--prefix", default="seed", help="Usernames are <prefix><n>")
+        parser.add_argument("--days", type=int, default=365, help="Period the posts are spread over")
+        parser.add_argument("--batch-size", type=int, default=seeding.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        verbosity = options["verbosity"]
+
+        def progress(name, done, total):
+            if verbosity > 1 or done == total:
+                self.stdout.write(f"  {name}: {done}/{total}")
+
+        try:
+            report = seeding.generate(
+                users=options["users"],
+                posts=options["posts"],
+                comments=options["comments"],
+                seed=options["seed"],
+                prefix=options["prefix"],
+                days=options["days"],
+                batch_size=options["batch_size"],
+                progress=progress,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"{'jadval':<10} {'qatorlar':>10} {'soniya':>9} {'qator/s':>10}")
+        for name, rows in report["rows"].items():
+            self.stdout.write(
+                f"{name:<10} {rows:>10} {report['seconds'][name]:>9} {report['rows_per_second'][name]:>10}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Tayyor: jami {sum(report['rows'].values())} qator, "
+            f"{report['total_rows_per_second']} qator/s (parol: {seeding.SEED_PASSWORD})"
+        ))
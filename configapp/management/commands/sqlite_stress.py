@@ -0,0 +1,51 @@
+import os
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from configapp import dbtuning
+from configapp.models import UserProfile, Post
+
+
+class Command(BaseCommand):
+    help = "Concurrent comment writes from several processes against a scratch SQLite database"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--writes", type=int, default=200, help="Writes per worker")
+        parser.add_argument(
+            "--compare",
+            action="store_true",
+            help="Also run with stock SQLite settings (rollback journal, no busy timeout)",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Faqat SQLite uchun")
+
+        db_file = os.path.join(tempfile.mkdtemp(), "stress.sqlite3")
+        connection.settings_dict.setdefault("TEST", {})["NAME"] = db_file
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            users = [User.objects.create_user(f"stress{i}") for i in range(8)]
+            UserProfile.objects.bulk_create([UserProfile(user=user) for user in users])
+            for user in users:
+                Post.objects.create(title=f"Stress {user.pk}", content="stress test", author=user)
+
+            runs = [dbtuning.stress(db_file, options["workers"], options["writes"], tuned=True)]
+            if options["compare"]:
+                runs.append(dbtuning.stress(db_file, options["workers"], options["writes"], tuned=False))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f"{'mode':<9} {'workers':>7} {'writes':>7} {'locked':>7} {'sec':>8} {'writes/s':>9}")
+        for run in runs:
+            self.stdout.write(
+                f"{run['mode']:<9} {run['workers']:>7} {run['writes']:>7} {run['locked_errors']:>7} "
+                f"{run['seconds']:>8} {run['writes_per_second']:>9}"
+            )
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from configapp.routers import PRIMARY, replicas, sync_replica
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database into the replica databases"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", action="append", dest="aliases", help="Replica alias (default: all)")
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Keep replaying the primary every N seconds (simulated replication lag)",
+        )
+
+    def handle(self, *args, **options):
+        aliases = options["aliases"] or replicas()
+        if not aliases:
+            raise CommandError("Replika sozlanmagan (BLOG_DATABASE_REPLICAS)")
+        for alias in aliases:
+            if alias == PRIMARY or alias not in connections:
+                raise CommandError(f"Noto'g'ri replika: {alias}")
+
+        while True:
+            for alias in aliases:
+                pages = sync_replica(alias)
+                connections[alias].close()
+                self.stdout.write(self.style.SUCCESS(f"{alias}: {pages} sahifa nusxalandi"))
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from configapp import ranking, viewcounts
+
+
+class Command(BaseCommand):
+    help = "Fold new posts, comments and views into the trending scores"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild", action="store_true",
+            help="Recompute every score (after changing the half-life or weights)",
+        )
+        parser.add_argument("--batch-size", type=int, default=ranking.BATCH_SIZE)
+        parser.add_argument("--top", type=int, default=0, help="Print the top N posts afterwards")
+        parser.add_argument(
+            "--purge-views", type=int, metavar="DAYS",
+            help="Delete view batches older than DAYS days first",
+        )
+
+    def handle(self, *args, **options):
+        if options["purge_views"] is not None:
+            deleted = viewcounts.purge(options["purge_views"])
+            self.stdout.write(f"O'chirilgan ko'rishlar yozuvlari: {deleted}")
+        if options["rebuild"]:
+            events = ranking.rebuild(options["batch_size"])
+        else:
+            events = ranking.update(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Hisobga olingan hodisalar: {events}"))
+        for post in ranking.trending_posts(options["top"]) if options["top"] else []:
+            self.stdout.write(f"{post.trending_score:>10.3f}  {post.pk:>6}  {post.title[:60]}")
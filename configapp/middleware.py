@@ -0,0 +1,281 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .routers import STICKY_COOKIE, replicas, tracking_writes, use_primary
+
+# Literals are stripped so the same statement with different values
+# (the usual N+1 pattern) shares one fingerprint
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))*\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    sql = _LITERALS.sub("?", sql)
+    sql = _IN_LISTS.sub("(...)", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+def _empty_row():
+    return {
+        "requests": 0,
+        "queries": 0,
+        "max_queries": 0,
+        "sql_ms": 0.0,
+        "view_ms": 0.0,
+        "max_view_ms": 0.0,
+        "duplicates": Counter(),
+    }
+
+
+class RouteStats:
+    """Per URL name totals, shared by every request of the process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = defaultdict(_empty_row)
+
+    def reset(self):
+        with self.lock:
+            self.routes = defaultdict(_empty_row)
+
+    def record(self, route, queries, sql_ms, view_ms, duplicates):
+        with self.lock:
+            row = self.routes[route]
+            row["requests"] += 1
+            row["queries"] += queries
+            row["max_queries"] = max(row["max_queries"], queries)
+            row["sql_ms"] += sql_ms
+            row["view_ms"] += view_ms
+            row["max_view_ms"] = max(row["max_view_ms"], view_ms)
+            row["duplicates"].update(duplicates)
+
+    def snapshot(self):
+        """Raw totals as plain JSON-able data"""
+        with self.lock:
+            return {
+                route: {**row, "duplicates": dict(row["duplicates"])}
+                for route, row in self.routes.items()
+            }
+
+    def merge(self, snapshot):
+        """Add totals from another process' ``snapshot()``"""
+        with self.lock:
+            for route, other in snapshot.items():
+                row = self.routes[route]
+                for field in ("requests", "queries", "sql_ms", "view_ms"):
+                    row[field] += other[field]
+                for field in ("max_queries", "max_view_ms"):
+                    row[field] = max(row[field], other[field])
+                row["duplicates"].update(other["duplicates"])
+
+    def report(self, order_by="queries", limit=20):
+        """Routes sorted by their average of ``order_by``, worst first"""
+        rows = []
+        for route, row in self.snapshot().items():
+            count = row["requests"]
+            duplicates = Counter(row["duplicates"])
+            rows.append({
+                "route": route,
+                "requests": count,
+                "avg_queries": round(row["queries"] / count, 2),
+                "max_queries": row["max_queries"],
+                "avg_sql_ms": round(row["sql_ms"] / count, 3),
+                "avg_view_ms": round(row["view_ms"] / count, 3),
+                "max_view_ms": round(row["max_view_ms"], 3),
+                "duplicates": [
+                    {"sql": sql, "count": n} for sql, n in duplicates.most_common(3)
+                ],
+            })
+        key = REPORT_ORDERS.get(order_by, "avg_queries")
+        rows.sort(key=lambda row: row[key], reverse=True)
+        return rows[:limit]
+
+
+REPORT_ORDERS = {
+    "queries": "avg_queries",
+    "sql": "avg_sql_ms",
+    "time": "avg_view_ms",
+    "requests": "requests",
+}
+
+
+def snapshot_path(directory, pid=None):
+    return os.path.join(directory, f"queries-{pid or os.getpid()}.json")
+
+
+def write_snapshot(directory, stats):
+    """Atomically dump this process' totals so the management command can read them"""
+    os.makedirs(directory, exist_ok=True)
+    path = snapshot_path(directory)
+    with tempfile.NamedTemporaryFile("w", dir=directory, delete=False, suffix=".tmp") as f:
+        json.dump(stats.snapshot(), f)
+    os.replace(f.name, path)
+
+
+def load_snapshots(directory):
+    """Merge every process' snapshot from ``directory``"""
+    stats = RouteStats()
+    for name in sorted(os.listdir(directory)):
+        if name.startswith("queries-") and name.endswith(".json"):
+            with open(os.path.join(directory, name)) as f:
+                stats.merge(json.load(f))
+    return stats
+
+
+route_stats = RouteStats()
+
+
+class QueryCollector:
+    """``connection.execute_wrapper`` callable counting and timing SQL"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+
+class QueryProfilingMiddleware:
+    """
+    Records query count, SQL time, repeated statements (N+1) and view time
+    for every request, adds them as a ``Server-Timing`` header and keeps
+    per URL name totals in ``route_stats``.
+
+    Enabled with ``BLOG_QUERY_PROFILING = True``. With
+    ``BLOG_QUERY_PROFILING_DIR`` set, totals are also written there every
+    ``BLOG_QUERY_PROFILING_FLUSH`` seconds for ``manage.py query_report``.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "BLOG_QUERY_PROFILING", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.threshold = getattr(settings, "BLOG_DUPLICATE_QUERY_THRESHOLD", 3)
+        self.snapshot_dir = getattr(settings, "BLOG_QUERY_PROFILING_DIR", None)
+        self.snapshot_every = getattr(settings, "BLOG_QUERY_PROFILING_FLUSH", 30)
+        self.last_snapshot = time.monotonic()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        collector = QueryCollector()
+        with self._collecting(collector):
+            started = time.perf_counter()
+            response = self.get_response(request)
+            view_ms = (time.perf_counter() - started) * 1000
+        return self._finish(request, response, collector, view_ms)
+
+    async def __acall__(self, request):
+        collector = QueryCollector()
+        with self._collecting(collector):
+            started = time.perf_counter()
+            response = await self.get_response(request)
+            view_ms = (time.perf_counter() - started) * 1000
+        return self._finish(request, response, collector, view_ms)
+
+    def _collecting(self, collector):
+        stack = ExitStack()
+        for conn in connections.all():
+            stack.enter_context(conn.execute_wrapper(collector))
+        return stack
+
+    def _finish(self, request, response, collector, view_ms):
+        sql_ms = collector.duration * 1000
+        duplicates = {
+            sql: count for sql, count in collector.fingerprints.items()
+            if count >= self.threshold
+        }
+        match = getattr(request, "resolver_match", None)
+        route = (match.view_name if match else None) or "<unresolved>"
+        route_stats.record(route, collector.count, sql_ms, view_ms, duplicates)
+        if self.snapshot_dir and time.monotonic() - self.last_snapshot >= self.snapshot_every:
+            self.last_snapshot = time.monotonic()
+            write_snapshot(self.snapshot_dir, route_stats)
+
+        timing = [
+            f'db;dur={sql_ms:.2f};desc="{collector.count} queries"',
+            f"view;dur={view_ms:.2f}",
+        ]
+        if duplicates:
+            timing.append(f'dup;desc="{sum(duplicates.values())} repeated"')
+        if response.has_header("Server-Timing"):
+            timing.insert(0, response["Server-Timing"])
+        response["Server-Timing"] = ", ".join(timing)
+        return response
+
+
+class PrimaryStickinessMiddleware:
+    """
+    Read-your-writes for replica routing: unsafe methods, and every request
+    within ``BLOG_REPLICA_STICKY_SECONDS`` after one that wrote to the
+    database (tracked with a cookie), read from the primary. Not used when
+    no replicas are configured.
+    """
+
+    WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.sticky_seconds = getattr(settings, "BLOG_REPLICA_STICKY_SECONDS", 10)
+
+    def _pinned(self, request):
+        return request.method in self.WRITE_METHODS or STICKY_COOKIE in request.COOKIES
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with tracking_writes() as writes:
+            if self._pinned(request):
+                with use_primary():
+                    response = self.get_response(request)
+            else:
+                response = self.get_response(request)
+        return self._finish(response, writes.wrote)
+
+    async def __acall__(self, request):
+        with tracking_writes() as writes:
+            if self._pinned(request):
+                with use_primary():
+                    response = await self.get_response(request)
+            else:
+                response = await self.get_response(request)
+        return self._finish(response, writes.wrote)
+
+    def _finish(self, response, write):
+        if write:
+            response.set_cookie(
+                STICKY_COOKIE, "1", max_age=self.sticky_seconds, httponly=True, samesite="Lax",
+            )
+        return response
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:15
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+
+def fill_excerpts(apps, schema_editor):
+    Post = apps.get_model('configapp', 'Post')
+    for post in Post.objects.only('id', 'content').iterator(chunk_size=500):
+        Post.objects.filter(pk=post.pk).update(excerpt=Truncator(post.content).words(20))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configapp', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-created_at', '-id'], name='post_feed_idx'),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:16
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(queryset, field, outer):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef(outer)})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('configapp', 'Post')
+    Comment = apps.get_model('configapp', 'Comment')
+    UserProfile = apps.get_model('configapp', 'UserProfile')
+    Post.objects.update(comment_count=count_of(Comment.objects.all(), 'post', 'pk'))
+    UserProfile.objects.update(
+        post_count=count_of(Post.objects.all(), 'author', 'user_id'),
+        comment_count=count_of(Comment.objects.all(), 'author', 'user_id'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configapp', '0002_post_excerpt_feed_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
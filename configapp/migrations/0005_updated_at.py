@@ -0,0 +1,44 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:20
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def drop_search_triggers(apps, schema_editor):
+    from configapp import search
+
+    search.drop_triggers(schema_editor.connection)
+
+
+def create_search_triggers(apps, schema_editor):
+    from configapp import search
+
+    search.create_triggers(schema_editor.connection)
+
+
+def start_from_created_at(apps, schema_editor):
+    for name in ('Post', 'Comment'):
+        apps.get_model('configapp', name).objects.update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configapp', '0004_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_search_triggers, create_search_triggers),
+        migrations.AddField(
+            model_name='comment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.RunPython(start_from_created_at, migrations.RunPython.noop),
+        migrations.RunPython(create_search_triggers, drop_search_triggers),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+def drop_search_triggers(apps, schema_editor):
+    from configapp import search
+
+    search.drop_triggers(schema_editor.connection)
+
+
+def create_search_triggers(apps, schema_editor):
+    from configapp import search
+
+    search.create_triggers(schema_editor.connection)
+
+
+def fill_word_count(apps, schema_editor):
+    Post = apps.get_model('configapp', 'Post')
+    last_pk = 0
+    while True:
+        # Keyset batches, so only 500 post bodies are in memory at a time
+        posts = list(Post.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'content')[:500])
+        if not posts:
+            break
+        last_pk = posts[-1].pk
+        for post in posts:
+            post.word_count = len(post.content.split())
+        Post.objects.bulk_update(posts, ['word_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configapp', '0006_userprofile_avatar_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_search_triggers, create_search_triggers),
+        migrations.AddField(
+            model_name='post',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_word_count, migrations.RunPython.noop),
+        migrations.RunPython(create_search_triggers, drop_search_triggers),
+    ]
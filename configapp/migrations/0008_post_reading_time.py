@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:20
+
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+
+def drop_search_triggers(apps, schema_editor):
+    from configapp import search
+
+    search.drop_triggers(schema_editor.connection)
+
+
+def create_search_triggers(apps, schema_editor):
+    from configapp import search
+
+    search.create_triggers(schema_editor.connection)
+
+
+def fill_reading_time(apps, schema_editor):
+    Post = apps.get_model('configapp', 'Post')
+    # ceil(word_count / 200) in integer arithmetic, at least one minute
+    Post.objects.filter(word_count__gt=0).update(
+        reading_time=Greatest((F('word_count') + 199) / 200, 1)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configapp', '0007_post_word_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_search_triggers, create_search_triggers),
+        migrations.AddField(
+            model_name='post',
+            name='reading_time',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Minutes'),
+        ),
+        migrations.RunPython(fill_reading_time, migrations.RunPython.noop),
+        migrations.RunPython(create_search_triggers, drop_search_triggers),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configapp', '0009_task'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingCursor',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_id', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PostScore',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='configapp.post')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-rank', '-post'], name='post_score_rank_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def drop_search_triggers(apps, schema_editor):
+    from configapp import search
+
+    search.drop_triggers(schema_editor.connection)
+
+
+def create_search_triggers(apps, schema_editor):
+    from configapp import search
+
+    search.create_triggers(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configapp', '0010_post_score'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_search_triggers, create_search_triggers),
+        migrations.AddField(
+            model_name='post',
+            name='view_count',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='PostViewBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_batches', to='configapp.post')),
+            ],
+        ),
+        migrations.RunPython(create_search_triggers, drop_search_triggers),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+def reindex(apps, schema_editor):
+    from configapp import search
+
+    # New user triggers, and the addresses already indexed are dropped
+    search.drop_triggers(schema_editor.connection)
+    search.create_triggers(schema_editor.connection)
+    search.rebuild(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configapp', '0011_post_view_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(reindex, migrations.RunPython.noop),
+    ]
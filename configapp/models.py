@@ -1,20 +1,71 @@
 from django.db import models
+from django.utils import timezone
+from django.utils.text import Truncator
 from django.contrib.auth.models import User,BaseUserManager, AbstractBaseUser, PermissionsMixin
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     bio = models.TextField(blank=True, null=True)
     avatar = models.ImageField(upload_to="avatars/", blank=True, null=True)
+    # Content hash of the avatar, set once its thumbnails exist
+    avatar_hash = models.CharField(max_length=40, blank=True, editable=False)
     website = models.URLField(blank=True, null=True)
+    post_count = models.PositiveIntegerField(default=0, editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.user.username
 
 
+EXCERPT_WORDS = 20
+READING_WORDS_PER_MINUTE = 200
+
+
+def make_excerpt(content):
+    return Truncator(content).words(EXCERPT_WORDS)
+
+
+def count_words(content):
+    return len(content.split())
+
+
+def reading_minutes(word_count):
+    """Whole minutes to read, rounded up, at least one for any text"""
+    return -(-word_count // READING_WORDS_PER_MINUTE) if word_count else 0
+
+
 class Post(models.Model):
     title = models.CharField(max_length=200)
     content = models.TextField()
+    excerpt = models.TextField(blank=True, editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_time = models.PositiveIntegerField(default=0, editable=False, help_text="Minutes")
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="posts")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    # Written in batches by viewcounts, a few seconds behind
+    view_count = models.PositiveBigIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="post_feed_idx"),
+        ]
+
+    # Stored copies of what listings would otherwise compute from content
+    DERIVED_FIELDS = ("excerpt", "word_count", "reading_time")
+
+    def fill_derived_fields(self):
+        """Set excerpt, word count and reading time from the content"""
+        self.excerpt = make_excerpt(self.content)
+        self.word_count = count_words(self.content)
+        self.reading_time = reading_minutes(self.word_count)
+
+    def save(self, *args, **kwargs):
+        self.fill_derived_fields()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "content" in update_fields:
+            kwargs["update_fields"] = {*update_fields, *self.DERIVED_FIELDS}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.title
@@ -24,11 +75,81 @@ class Comment(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"Comment by {self.author.username} on {self.post.title}"
 
 
+class PostScore(models.Model):
+    """Trending score of a post, kept up to date by ranking.update"""
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name="score")
+    # log2 of the time-decayed activity score, measured at ranking.EPOCH
+    rank = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-rank", "-post"], name="post_score_rank_idx"),
+        ]
+
+
+class PostViewBatch(models.Model):
+    """Views of a post written in one viewcounts flush"""
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="view_batches")
+    count = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+
+class RankingCursor(models.Model):
+    """Last event (primary key) of a ranking source already counted"""
+    name = models.CharField(max_length=50, primary_key=True)
+    last_id = models.BigIntegerField(default=0)
+
+
+class Task(models.Model):
+    """A queued background job, run by ``manage.py run_workers`` (see tasks.py)"""
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = [
+        (PENDING, "Kutilmoqda"),
+        (RUNNING, "Bajarilmoqda"),
+        (DONE, "Bajarildi"),
+        (FAILED, "Xato"),
+    ]
+
+    # Dotted path of a @task function and its keyword arguments
+    name = models.CharField(max_length=200)
+    kwargs = models.JSONField(default=dict, blank=True)
+    dedupe_key = models.CharField(max_length=200, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    # Run time of the last attempt
+    duration_ms = models.FloatField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="task_due_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dedupe_key"], condition=models.Q(status="pending"),
+                name="task_pending_dedupe",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+
 # class CustomUserManager(BaseUserManager):
 #     def create_user(self, phone, password=None, **extra_fields):
 #         if not phone:
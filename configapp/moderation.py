@@ -0,0 +1,129 @@
+"""
+Bulk moderation: deleting many comments or posts at once.
+
+Rows are deleted in chunks, each chunk in its own transaction, so a spam
+wave of thousands of comments neither loads every row nor holds the write
+lock for long. Each chunk is removed with ``QuerySet._raw_delete`` (one
+``DELETE ... WHERE id IN (...)``), skipping Django's per-row collector and
+signals. What those signals would have done is done once per chunk:
+
+* counters are adjusted by grouped deltas (one UPDATE per post/author),
+* trending scores of posts that lost comments are recomputed,
+* site stats and page cache versions are bumped once,
+* the search index is kept by its SQLite triggers, which fire anyway.
+
+The ``iter_delete_*`` generators yield ``(done, total)`` after every chunk;
+``delete_*`` run them to the end, optionally calling ``progress(done, total)``.
+"""
+import logging
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count
+
+from . import page_cache, ranking, stats
+from .counters import adjust_post_comments, adjust_profile
+from .models import Post, Comment, PostScore, PostViewBatch
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+
+
+def _raw_delete(model, ids):
+    queryset = model._base_manager.filter(pk__in=ids)
+    return queryset._raw_delete(queryset.db)
+
+
+# Rows pointing at posts that the fast path deletes itself
+POST_CHILDREN = (Comment, PostScore, PostViewBatch)
+
+
+def _posts_fast_deletable():
+    # Raw deletes skip on_delete handling, so nothing else may point at posts
+    return all(rel.related_model in POST_CHILDREN for rel in Post._meta.related_objects)
+
+
+def _iter_chunks(queryset, fields, delete_chunk, chunk_size):
+    total = queryset.count()
+    done = 0
+    queryset = queryset.order_by("pk").values_list("pk", *fields)
+    while True:
+        rows = list(queryset[:chunk_size])
+        if not rows:
+            break
+        with transaction.atomic():
+            done += delete_chunk(rows)
+        logger.info("Moderation: %s/%s deleted", done, total)
+        yield done, total
+
+
+def _consume(steps, progress):
+    done = 0
+    for done, total in steps:
+        if progress:
+            progress(done, total)
+    return done
+
+
+def _delete_comment_rows(rows):
+    ids = [pk for pk, _, _ in rows]
+    deleted = _raw_delete(Comment, ids)
+    posts = Counter(post_id for _, post_id, _ in rows)
+    for post_id, n in posts.items():
+        adjust_post_comments(post_id, -n)
+    ranking.recompute(list(posts))
+    for author_id, n in Counter(author_id for _, _, author_id in rows).items():
+        adjust_profile(author_id, comments=-n)
+    stats.bump("total_comments", -deleted)
+    stats.invalidate("recent_comments", "recent_posts")
+    page_cache.bump("site", *[page_cache.post_key(post_id) for post_id in posts])
+    return deleted
+
+
+def iter_delete_comments(queryset, chunk_size=CHUNK_SIZE):
+    return _iter_chunks(queryset, ("post_id", "author_id"), _delete_comment_rows, chunk_size)
+
+
+def delete_comments(queryset, chunk_size=CHUNK_SIZE, progress=None):
+    """Delete every comment in ``queryset``, return how many were deleted"""
+    return _consume(iter_delete_comments(queryset, chunk_size), progress)
+
+
+def _delete_post_rows(rows):
+    ids = [pk for pk, _ in rows]
+    if not _posts_fast_deletable():
+        return Post.objects.filter(pk__in=ids).delete()[1].get(Post._meta.label, 0)
+
+    comments = Comment.objects.filter(post_id__in=ids)
+    commenters = dict(
+        comments.order_by().values("author_id").annotate(n=Count("pk")).values_list("author_id", "n")
+    )
+    deleted_comments = comments._raw_delete(comments.db)
+    for model in (PostScore, PostViewBatch):
+        children = model.objects.filter(post_id__in=ids)
+        children._raw_delete(children.db)
+    deleted = _raw_delete(Post, ids)
+    for author_id, n in commenters.items():
+        adjust_profile(author_id, comments=-n)
+    authors = Counter(author_id for _, author_id in rows)
+    for author_id, n in authors.items():
+        adjust_profile(author_id, posts=-n)
+    stats.bump("total_posts", -deleted)
+    stats.bump("total_comments", -deleted_comments)
+    stats.invalidate("recent_posts", "recent_comments", "top_contributors")
+    page_cache.bump(
+        "site", "posts",
+        *[page_cache.post_key(pk) for pk in ids],
+        *[page_cache.author_key(author_id) for author_id in authors],
+    )
+    return deleted
+
+
+def iter_delete_posts(queryset, chunk_size=CHUNK_SIZE):
+    return _iter_chunks(queryset, ("author_id",), _delete_post_rows, chunk_size)
+
+
+def delete_posts(queryset, chunk_size=CHUNK_SIZE, progress=None):
+    """Delete every post in ``queryset`` with its comments, return how many posts went"""
+    return _consume(iter_delete_posts(queryset, chunk_size), progress)
@@ -0,0 +1,243 @@
+"""
+Response and fragment caching for anonymous readers.
+
+Cached entries are keyed on version tokens instead of relying on a TTL:
+``site`` (feed, blog home), ``posts`` (post rows and their authors, not
+comments; the post list API), ``post:<pk>`` (a post and its comments) and
+``author:<user_id>`` (author sidebar). Signal handlers drop the matching
+version token after commit, which makes every entry built on it
+unreachable at once.
+
+``cache_anonymous_page`` also wraps async views. Their cache reads go
+through ``acache``, which calls in-process backends directly instead of
+through Django's ``aget``/``aset`` (a thread hop per call).
+"""
+import hashlib
+import re
+import uuid
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+VERSION_PREFIX = "blog:ver:"
+PAGE_PREFIX = "blog:page:"
+PAGE_TIMEOUT = 60 * 60
+
+_CSRF_INPUT = re.compile(rb'(name="csrfmiddlewaretoken" value=")[^"]+(")')
+_CSRF_PLACEHOLDER = b"__CSRF_TOKEN__"
+_KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+def page_timeout():
+    return getattr(settings, "BLOG_PAGE_CACHE_TIMEOUT", PAGE_TIMEOUT)
+
+
+def get_versions(*names):
+    """Current version tokens, creating the missing ones"""
+    keys = {name: VERSION_PREFIX + name for name in names}
+    found = cache.get_many(list(keys.values()))
+    versions = {}
+    for name, key in keys.items():
+        version = found.get(key)
+        if version is None:
+            version = uuid.uuid4().hex[:12]
+            if not cache.add(key, version, timeout=None):
+                version = cache.get(key, version)
+        versions[name] = version
+    return versions
+
+
+def get_version(name):
+    return get_versions(name)[name]
+
+
+# Backends that never block on I/O
+NON_BLOCKING_CACHES = (LocMemCache, DummyCache)
+
+
+async def acache(method, *args, **kwargs):
+    """``cache.<method>(...)`` from async code, e.g. ``await acache("get", key)``"""
+    backend = caches[DEFAULT_CACHE_ALIAS]
+    if isinstance(backend, NON_BLOCKING_CACHES):
+        return getattr(backend, method)(*args, **kwargs)
+    return await getattr(backend, "a" + method)(*args, **kwargs)
+
+
+async def aget_versions(*names):
+    keys = {name: VERSION_PREFIX + name for name in names}
+    found = await acache("get_many", list(keys.values()))
+    versions = {}
+    for name, key in keys.items():
+        version = found.get(key)
+        if version is None:
+            version = uuid.uuid4().hex[:12]
+            if not await acache("add", key, version, timeout=None):
+                version = await acache("get", key, version)
+        versions[name] = version
+    return versions
+
+
+async def aget_version(name):
+    return (await aget_versions(name))[name]
+
+
+def bump(*names):
+    """Invalidate everything built on these versions once the transaction commits"""
+    keys = [VERSION_PREFIX + name for name in names]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def post_key(post_id):
+    return f"post:{post_id}"
+
+
+def author_key(user_id):
+    return f"author:{user_id}"
+
+
+def _cacheable(request):
+    if request.method not in ("GET", "HEAD") or request.user.is_authenticated:
+        return False
+    # Flash messages belong to one visitor only
+    return not len(messages.get_messages(request))
+
+
+async def _acacheable(request):
+    if request.method not in ("GET", "HEAD"):
+        return False
+    # Without a session or messages cookie the visitor is anonymous and has
+    # no flash messages; anything else needs the session, read in a thread
+    if not request.COOKIES.keys() & {settings.SESSION_COOKIE_NAME, CookieStorage.cookie_name}:
+        return True
+    return await sync_to_async(_cacheable)(request)
+
+
+def _entry(response, **extra):
+    content = _CSRF_INPUT.sub(rb"\1" + _CSRF_PLACEHOLDER + rb"\2", response.content)
+    headers = {name: response[name] for name in _KEPT_HEADERS if response.has_header(name)}
+    return {"content": content, "headers": headers, **extra}
+
+
+def _store(key, response, **extra):
+    cache.set(key, _entry(response, **extra), page_timeout())
+
+
+def _page_key(view, request, versions):
+    return PAGE_PREFIX + view.__name__ + ":" + hashlib.md5(
+        "|".join([request.get_full_path(), *versions.values()]).encode()
+    ).hexdigest()
+
+
+def _replay(request, entry):
+    headers = entry["headers"]
+    last_modified = parse_http_date_safe(headers["Last-Modified"]) if "Last-Modified" in headers else None
+    response = get_conditional_response(
+        request, etag=headers.get("ETag"), last_modified=last_modified,
+    )
+    if response is not None:
+        return response
+    content = entry["content"]
+    if _CSRF_PLACEHOLDER in content:
+        content = content.replace(_CSRF_PLACEHOLDER, get_token(request).encode())
+    response = HttpResponse(content)
+    for name, value in headers.items():
+        response[name] = value
+    response["X-Page-Cache"] = "hit"
+    return response
+
+
+def cache_anonymous_page(*version_names, author=None):
+    """
+    Cache the view's 200 responses for anonymous GETs.
+
+    ``version_names`` may contain ``{pk}``-style placeholders filled from the
+    view kwargs. ``author`` is a callable returning the author id for the
+    view kwargs; the author's version is checked on every hit, so sidebar
+    changes also invalidate the page. For async views it must be async too.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            return _async_page_cache(view, version_names, author)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _cacheable(request):
+                return view(request, *args, **kwargs)
+
+            names = [name.format(**kwargs) for name in version_names]
+            versions = get_versions(*names)
+            key = _page_key(view, request, versions)
+            entry = cache.get(key)
+            if entry is not None:
+                author_id = entry.get("author_id")
+                if author_id is None or entry.get("author_version") == get_version(
+                    author_key(author_id)
+                ):
+                    return _replay(request, entry)
+
+            # Read the author's version before rendering so a concurrent
+            # change is never stored under the new version
+            extra = {}
+            author_id = author(**kwargs) if author is not None else None
+            if author_id is not None:
+                extra = {
+                    "author_id": author_id,
+                    "author_version": get_version(author_key(author_id)),
+                }
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                if hasattr(response, "render") and not response.is_rendered:
+                    response.render()
+                _store(key, response, **extra)
+                response["X-Page-Cache"] = "miss"
+            return response
+        return wrapper
+    return decorator
+
+
+def _async_page_cache(view, version_names, author):
+    """``cache_anonymous_page`` for an async view: a hit needs no thread"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if not await _acacheable(request):
+            return await view(request, *args, **kwargs)
+
+        names = [name.format(**kwargs) for name in version_names]
+        versions = await aget_versions(*names)
+        key = _page_key(view, request, versions)
+        entry = await acache("get", key)
+        if entry is not None:
+            author_id = entry.get("author_id")
+            if author_id is None or entry.get("author_version") == await aget_version(
+                author_key(author_id)
+            ):
+                return _replay(request, entry)
+
+        extra = {}
+        author_id = await author(**kwargs) if author is not None else None
+        if author_id is not None:
+            extra = {
+                "author_id": author_id,
+                "author_version": await aget_version(author_key(author_id)),
+            }
+
+        response = await view(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            if hasattr(response, "render") and not response.is_rendered:
+                response.render()
+            await acache("set", key, _entry(response, **extra), page_timeout())
+            response["X-Page-Cache"] = "miss"
+        return response
+    return wrapper
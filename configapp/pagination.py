@@ -0,0 +1,135 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """Newest first cursor pagination, stable however many rows get added"""
+    ordering = ("-created_at", "-id")
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        self.page_size = getattr(settings, "BLOG_API_PAGE_SIZE", 20)
+        return super().get_page_size(request)
+
+    # CursorPagination.paginate_queryset, split around its single query so
+    # async views can run that query with the async ORM
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self._page_queryset(queryset, request, view)
+        return None if queryset is None else self._set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self._page_queryset(queryset, request, view)
+        return None if queryset is None else self._set_page([row async for row in queryset])
+
+    def _page_queryset(self, queryset, request, view):
+        """The sliced queryset holding this page plus one row"""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            offset, reverse, self.current_position = 0, False, None
+        else:
+            offset, reverse, self.current_position = self.cursor
+        self.reverse = reverse
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if self.current_position is not None:
+            order = self.ordering[0]
+            order_attr = order.lstrip("-")
+            # (cursor reversed) XOR (queryset reversed)
+            if self.cursor.reverse != order.startswith("-"):
+                queryset = queryset.filter(**{order_attr + "__lt": self.current_position})
+            else:
+                queryset = queryset.filter(**{order_attr + "__gt": self.current_position})
+
+        self.offset = offset
+        return queryset[offset:offset + self.page_size + 1]
+
+    def _set_page(self, results):
+        """Page, next/previous positions from the fetched rows"""
+        self.page = list(results[:self.page_size])
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        current_position = self.current_position
+        if self.reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = current_position is not None or self.offset > 0
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None or self.offset > 0
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+
+def estimated_count(queryset):
+    """
+    Cheap row count estimate of the queryset's table, or ``None`` when the
+    backend has no estimate. SQLite reads MAX(rowid) from the primary key
+    index (too high after deletes), PostgreSQL the planner statistics.
+    """
+    model = queryset.model
+    connection = connections[queryset.db]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(
+                f"SELECT MAX({connection.ops.quote_name(model._meta.pk.column)}) "
+                f"FROM {connection.ops.quote_name(table)}"
+            )
+        elif connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None and row[0] >= 0 else None
+
+
+def count_or_estimate(queryset):
+    """
+    ``(count, is_estimate)``: the table estimate for big unfiltered
+    querysets, an exact COUNT(*) for filtered ones and tables estimated
+    below ``BLOG_EXACT_COUNT_LIMIT`` rows.
+    """
+    if not queryset.query.where:
+        estimate = estimated_count(queryset)
+        if estimate is not None and estimate > getattr(settings, "BLOG_EXACT_COUNT_LIMIT", 10000):
+            return estimate, True
+    return queryset.count(), False
+
+
+class EstimatedCountPaginator(Paginator):
+    """Admin changelist paginator that skips COUNT(*) on big unfiltered tables"""
+
+    @cached_property
+    def count(self):
+        return count_or_estimate(self.object_list)[0]
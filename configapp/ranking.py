@@ -0,0 +1,211 @@
+"""
+Trending posts.
+
+Every activity event (a post being published, a comment, a batch of views)
+adds ``weight * count * 2 ** (-age / half_life)`` to its post's score.
+Instead of decaying every row over time, ``PostScore.rank`` stores the log2
+of the score measured against a fixed epoch: all current scores share the
+same decay factor, so ordering by ``rank`` is ordering by the current score,
+and a batch only touches the posts that had new activity. The top N is one
+scan of ``post_score_rank_idx``.
+
+``update`` folds new events into the scores, one ``SOURCES`` entry at a
+time, from where the previous batch stopped (``RankingCursor``, keyed by the
+source's primary key). New posts, comments and view flushes schedule it on
+the task queue at most once per ``BLOG_RANKING_INTERVAL`` seconds. Changing
+the half-life or the weights needs ``manage.py update_rankings --rebuild``.
+
+Scores only grow by adding events, so when comments are deleted
+``recompute`` scores their posts again from the events that are left
+(deleted posts take their ``PostScore`` with them). The cached home page is
+invalidated only when the top ``CACHED_TOP`` posts change.
+"""
+import math
+from dataclasses import dataclass
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import page_cache
+from .models import Post, Comment, PostScore, PostViewBatch, RankingCursor
+from .tasks import enqueue, task
+
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+HALF_LIFE_HOURS = 24
+INTERVAL_SECONDS = 60
+BATCH_SIZE = 5000
+# Trending posts shown by the page-cached home page
+CACHED_TOP = 3
+
+
+@dataclass(frozen=True)
+class Source:
+    name: str
+    model: type
+    post_field: str
+    time_field: str
+    weight: float
+    # Column holding how many events a row stands for, if not one
+    count_field: str = None
+
+    def rows(self, queryset):
+        """(pk, post_id, moment, count) rows of ``queryset``"""
+        fields = ["pk", self.post_field, self.time_field]
+        if self.count_field:
+            fields.append(self.count_field)
+        return [row if self.count_field else (*row, 1) for row in queryset.values_list(*fields)]
+
+    def events(self, after, limit):
+        """Rows past the cursor, oldest first"""
+        return self.rows(self.model.objects.filter(pk__gt=after).order_by("pk")[:limit])
+
+    def counted(self, post_ids, upto):
+        """Rows of ``post_ids`` already folded into the scores"""
+        return self.rows(self.model.objects.filter(pk__lte=upto, **{f"{self.post_field}__in": post_ids}))
+
+
+SOURCES = [
+    Source("posts", Post, "pk", "created_at", weight=2.0),
+    Source("comments", Comment, "post_id", "created_at", weight=1.0),
+    Source("views", PostViewBatch, "post_id", "created_at", weight=0.05, count_field="count"),
+]
+
+
+def half_life_seconds():
+    return getattr(settings, "BLOG_TRENDING_HALF_LIFE_HOURS", HALF_LIFE_HOURS) * 3600
+
+
+def _age(moment):
+    """Half-lives between the epoch and ``moment``"""
+    return (moment - EPOCH).total_seconds() / half_life_seconds()
+
+
+def _log_add(a, b):
+    """log2(2**a + 2**b) without overflowing"""
+    if a is None:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def current_score(rank, now=None):
+    """The decayed score a stored rank stands for at ``now``"""
+    return 2 ** (rank - _age(now or timezone.now()))
+
+
+def _fold(source, rows, ranks):
+    """Add the rank of each row's events to ``ranks`` ({post_id: rank})"""
+    weight = math.log2(source.weight)
+    for _, post_id, moment, count in rows:
+        ranks[post_id] = _log_add(ranks.get(post_id), weight + math.log2(count) + _age(moment))
+    return ranks
+
+
+def _apply(ranks):
+    """Add {post_id: rank of the new events} to the stored ranks"""
+    stored = PostScore.objects.in_bulk(list(ranks))
+    changed = []
+    for post_id, score in stored.items():
+        score.rank = _log_add(score.rank, ranks.pop(post_id))
+        changed.append(score)
+    PostScore.objects.bulk_update(changed, ["rank"])
+    # Posts deleted since their events were written are skipped
+    existing = Post.objects.filter(pk__in=list(ranks)).values_list("pk", flat=True)
+    PostScore.objects.bulk_create([PostScore(post_id=pk, rank=ranks[pk]) for pk in existing])
+
+
+@task
+def update(batch_size=BATCH_SIZE):
+    """Fold the events written since the last run into the scores; returns how many"""
+    total = 0
+    before = top(CACHED_TOP)
+    for source in SOURCES:
+        while True:
+            with transaction.atomic():
+                cursor, _ = RankingCursor.objects.select_for_update().get_or_create(name=source.name)
+                rows = source.events(cursor.last_id, batch_size)
+                if not rows:
+                    break
+                _apply(_fold(source, rows, {}))
+                cursor.last_id = rows[-1][0]
+                cursor.save(update_fields=["last_id"])
+            total += len(rows)
+            if len(rows) < batch_size:
+                break
+    if total:
+        _top_changed(before)
+    return total
+
+
+@task
+def recompute(post_ids):
+    """Score ``post_ids`` again from their remaining events, after deletes"""
+    before = top(CACHED_TOP)
+    with transaction.atomic():
+        cursors = dict(
+            RankingCursor.objects.select_for_update()
+            .filter(name__in=[source.name for source in SOURCES]).values_list("name", "last_id")
+        )
+        ranks = {}
+        for source in SOURCES:
+            # Events past the cursor are still to come from ``update``
+            _fold(source, source.counted(post_ids, cursors.get(source.name, 0)), ranks)
+        PostScore.objects.filter(post_id__in=post_ids).delete()
+        PostScore.objects.bulk_create([PostScore(post_id=pk, rank=rank) for pk, rank in ranks.items()])
+    _top_changed(before)
+
+
+def schedule_recompute(post_id):
+    """Run ``recompute`` for a post soon, once however many of its comments go"""
+    enqueue(
+        recompute, post_ids=[post_id], dedupe_key=f"ranking:recompute:{post_id}",
+        delay=getattr(settings, "BLOG_RANKING_INTERVAL", INTERVAL_SECONDS),
+    )
+
+
+def _top_changed(before):
+    # The blog home shows the trending posts, but not their scores
+    if [post_id for post_id, _ in top(CACHED_TOP)] != [post_id for post_id, _ in before]:
+        page_cache.bump("site")
+
+
+def schedule():
+    """Run ``update`` soon; any number of calls before it runs make one batch"""
+    enqueue(
+        update, dedupe_key="ranking:update",
+        delay=getattr(settings, "BLOG_RANKING_INTERVAL", INTERVAL_SECONDS),
+    )
+
+
+def rebuild(batch_size=BATCH_SIZE):
+    """Recompute every score from scratch"""
+    with transaction.atomic():
+        PostScore.objects.all().delete()
+        RankingCursor.objects.all().delete()
+    return update(batch_size)
+
+
+def top(limit, offset=0):
+    """[(post_id, rank)] best first"""
+    return list(
+        PostScore.objects.order_by("-rank", "-post_id")
+        .values_list("post_id", "rank")[offset:offset + limit]
+    )
+
+
+def trending_posts(limit):
+    """The top posts for listings, each with its current ``trending_score``"""
+    ranked = top(limit)
+    posts = Post.objects.select_related("author__userprofile").defer("content").in_bulk(
+        [post_id for post_id, _ in ranked]
+    )
+    now = timezone.now()
+    result = []
+    for post_id, rank in ranked:
+        post = posts.get(post_id)
+        if post is not None:
+            post.trending_score = current_score(rank, now)
+            result.append(post)
+    return result
@@ -0,0 +1,38 @@
+"""
+JSON rendering for the hot read endpoints.
+
+``FastJSONRenderer`` writes the same bytes as DRF's ``JSONRenderer`` with
+the default settings (compact, unicode, strict) but encodes with orjson
+when it is installed. Anything orjson would format differently
+(datetimes, lazy strings, decimals, indented output) goes through DRF's
+own encoder, so switching renderers never changes a response. The one
+exception is non-finite floats (orjson writes null where strict DRF
+raises); the read endpoints using it carry no floats.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # optional, the stock renderer is used without it
+    orjson = None
+
+_encoder = encoders.JSONEncoder()
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_encoder.default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except TypeError:
+            # Non-str keys, huge ints and the like: let the stdlib decide
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same escaping of the JavaScript line separators as JSONRenderer
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+        return ret
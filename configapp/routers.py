@@ -0,0 +1,111 @@
+"""
+Primary/replica database routing.
+
+Writes always go to ``default``; reads are spread over the aliases listed
+in ``BLOG_DATABASE_REPLICAS``. Reads stay on the primary when:
+
+* the code runs inside ``use_primary()`` (the stickiness middleware wraps
+  write requests and requests carrying the sticky cookie in it),
+* a transaction is open on the primary, so a view reads its own writes,
+* the model belongs to ``PRIMARY_APPS`` (sessions must never lag behind).
+
+Inside ``tracking_writes()`` the router records whether anything was
+written, whatever the HTTP method (some views delete on GET).
+
+Without replicas configured every method returns ``None`` and Django's
+default routing applies.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PRIMARY = DEFAULT_DB_ALIAS
+PRIMARY_APPS = {"sessions"}
+STICKY_COOKIE = "blog_primary"
+
+_use_primary = ContextVar("blog_use_primary", default=False)
+_writes = ContextVar("blog_writes", default=None)
+
+
+def replicas():
+    return [
+        alias for alias in getattr(settings, "BLOG_DATABASE_REPLICAS", ())
+        if alias in settings.DATABASES
+    ]
+
+
+@contextmanager
+def use_primary():
+    """Send every read in this block (and this thread/task) to the primary"""
+    token = _use_primary.set(True)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+@contextmanager
+def tracking_writes():
+    """Yields an object whose ``wrote`` is set once the block writes a row"""
+    # A mutable object, so writes made in sync_to_async threads (which run
+    # in a copy of this context) are seen too
+    tracker = SimpleNamespace(wrote=False)
+    token = _writes.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _writes.reset(token)
+
+
+def reading_from_primary():
+    return _use_primary.get() or connections[PRIMARY].in_atomic_block
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        pool = replicas()
+        if not pool:
+            return None
+        if reading_from_primary() or model._meta.app_label in PRIMARY_APPS:
+            return PRIMARY
+        return random.choice(pool)
+
+    def db_for_write(self, model, **hints):
+        tracker = _writes.get()
+        # Primary-only apps never need the reads that follow pinned
+        if tracker is not None and model._meta.app_label not in PRIMARY_APPS:
+            tracker.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {PRIMARY, *replicas()}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary, never migrated on their own
+        if db in replicas():
+            return False
+        return None
+
+
+def sync_replica(alias, source=PRIMARY):
+    """
+    Copy the primary SQLite database into a replica file with the online
+    backup API. Returns the number of pages copied.
+    """
+    src, dst = connections[source], connections[alias]
+    if src.vendor != "sqlite" or dst.vendor != "sqlite":
+        raise ValueError("sync_replica works with SQLite databases only")
+    if dst.in_atomic_block:
+        raise ValueError(f"{alias!r} has an open transaction")
+    src.ensure_connection()
+    dst.ensure_connection()
+    pages = []
+    src.connection.backup(dst.connection, progress=lambda status, remaining, total: pages.append(total))
+    return pages[-1] if pages else 0
@@ -0,0 +1,335 @@
+"""
+Full-text search over posts, comments and users.
+
+On SQLite the text lives in an FTS5 virtual table kept in sync by triggers,
+so every write path (views, DRF, admin, bulk_create, raw deletes) updates it
+without extra Python code. Other backends fall back to plain LIKE filters.
+
+Rows of every kind share the table; the rowid encodes both the kind and the
+primary key (``pk * 4 + kind``) so a single row can be updated directly.
+
+E-mail addresses are not indexed: ``/api/search/`` is public. Staff screens
+pass ``emails=True`` to ``filter_queryset`` to look them up directly.
+"""
+import re
+
+from django.db import OperationalError, connections, router, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+
+SEARCH_TABLE = "configapp_search"
+
+KIND_POST = 1
+KIND_COMMENT = 2
+KIND_USER = 3
+KINDS = {"post": KIND_POST, "comment": KIND_COMMENT, "user": KIND_USER}
+KIND_NAMES = {code: name for name, code in KINDS.items()}
+
+# Fields used when FTS5 is not available
+LIKE_FIELDS = {
+    "post": ["title", "content", "author__username"],
+    "comment": ["content", "author__username", "post__title"],
+    "user": ["username", "first_name", "last_name"],
+}
+
+# Matched instead of the index by staff searches containing "@"
+EMAIL_FIELDS = {"post": "author__email", "comment": "author__email", "user": "email"}
+
+# (alias, database name) -> whether the FTS table exists
+_enabled = {}
+
+_MARK_START = "\x02"
+_MARK_END = "\x03"
+
+TABLE_SQL = f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+    title, body, author, tokenize = 'unicode61 remove_diacritics 2'
+)"""
+
+TRIGGER_SQL = [
+    # Posts
+    f"""CREATE TRIGGER IF NOT EXISTS configapp_search_post_ai
+    AFTER INSERT ON configapp_post BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, title, body, author)
+        VALUES (NEW.id * 4 + {KIND_POST}, NEW.title, NEW.content,
+                (SELECT username FROM auth_user WHERE id = NEW.author_id));
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS configapp_search_post_au
+    AFTER UPDATE OF title, content, author_id ON configapp_post BEGIN
+        UPDATE {SEARCH_TABLE}
+        SET title = NEW.title, body = NEW.content,
+            author = (SELECT username FROM auth_user WHERE id = NEW.author_id)
+        WHERE rowid = NEW.id * 4 + {KIND_POST};
+        UPDATE {SEARCH_TABLE} SET title = NEW.title
+        WHERE NEW.title != OLD.title AND rowid IN (
+            SELECT id * 4 + {KIND_COMMENT} FROM configapp_comment WHERE post_id = NEW.id
+        );
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS configapp_search_post_ad
+    AFTER DELETE ON configapp_post BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = OLD.id * 4 + {KIND_POST};
+    END""",
+
+    # Comments
+    f"""CREATE TRIGGER IF NOT EXISTS configapp_search_comment_ai
+    AFTER INSERT ON configapp_comment BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, title, body, author)
+        VALUES (NEW.id * 4 + {KIND_COMMENT},
+                (SELECT title FROM configapp_post WHERE id = NEW.post_id),
+                NEW.content,
+                (SELECT username FROM auth_user WHERE id = NEW.author_id));
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS configapp_search_comment_au
+    AFTER UPDATE OF content, post_id, author_id ON configapp_comment BEGIN
+        UPDATE {SEARCH_TABLE}
+        SET title = (SELECT title FROM configapp_post WHERE id = NEW.post_id),
+            body = NEW.content,
+            author = (SELECT username FROM auth_user WHERE id = NEW.author_id)
+        WHERE rowid = NEW.id * 4 + {KIND_COMMENT};
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS configapp_search_comment_ad
+    AFTER DELETE ON configapp_comment BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = OLD.id * 4 + {KIND_COMMENT};
+    END""",
+
+    # Users
+    f"""CREATE TRIGGER IF NOT EXISTS configapp_search_user_ai
+    AFTER INSERT ON auth_user BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, title, body, author)
+        VALUES (NEW.id * 4 + {KIND_USER}, NEW.username,
+                NEW.first_name || ' ' || NEW.last_name, NEW.username);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS configapp_search_user_au
+    AFTER UPDATE OF username, first_name, last_name ON auth_user BEGIN
+        UPDATE {SEARCH_TABLE}
+        SET title = NEW.username,
+            body = NEW.first_name || ' ' || NEW.last_name,
+            author = NEW.username
+        WHERE rowid = NEW.id * 4 + {KIND_USER};
+        UPDATE {SEARCH_TABLE} SET author = NEW.username
+        WHERE NEW.username != OLD.username AND rowid IN (
+            SELECT id * 4 + {KIND_POST} FROM configapp_post WHERE author_id = NEW.id
+            UNION ALL
+            SELECT id * 4 + {KIND_COMMENT} FROM configapp_comment WHERE author_id = NEW.id
+        );
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS configapp_search_user_ad
+    AFTER DELETE ON auth_user BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = OLD.id * 4 + {KIND_USER};
+    END""",
+]
+
+POPULATE_SQL = [
+    f"DELETE FROM {SEARCH_TABLE}",
+    f"""INSERT INTO {SEARCH_TABLE}(rowid, title, body, author)
+        SELECT p.id * 4 + {KIND_POST}, p.title, p.content, u.username
+        FROM configapp_post p JOIN auth_user u ON u.id = p.author_id""",
+    f"""INSERT INTO {SEARCH_TABLE}(rowid, title, body, author)
+        SELECT c.id * 4 + {KIND_COMMENT}, p.title, c.content, u.username
+        FROM configapp_comment c
+        JOIN configapp_post p ON p.id = c.post_id
+        JOIN auth_user u ON u.id = c.author_id""",
+    f"""INSERT INTO {SEARCH_TABLE}(rowid, title, body, author)
+        SELECT id * 4 + {KIND_USER}, username, first_name || ' ' || last_name, username
+        FROM auth_user""",
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')",
+]
+
+DROP_TRIGGER_SQL = [
+    f"DROP TRIGGER IF EXISTS configapp_search_{kind}_{event}"
+    for kind in ("post", "comment", "user")
+    for event in ("ai", "au", "ad")
+]
+
+
+def fts5_available(connection):
+    if connection.vendor != "sqlite":
+        return False
+    try:
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute("CREATE VIRTUAL TABLE temp.configapp_fts5_probe USING fts5(x)")
+                cursor.execute("DROP TABLE temp.configapp_fts5_probe")
+    except OperationalError:
+        return False
+    return True
+
+
+def install(connection):
+    """Create the FTS5 table and triggers, then index the existing rows"""
+    _enabled.clear()
+    if not fts5_available(connection):
+        return False
+    with connection.cursor() as cursor:
+        for sql in [TABLE_SQL, *TRIGGER_SQL, *POPULATE_SQL]:
+            cursor.execute(sql)
+    return True
+
+
+def uninstall(connection):
+    _enabled.clear()
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for sql in DROP_TRIGGER_SQL:
+            cursor.execute(sql)
+        cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+def drop_triggers(connection):
+    """
+    SQLite rebuilds a table for most ALTERs, which trips over the triggers.
+    Migrations touching configapp_post, configapp_comment or auth_user run
+    this first and ``create_triggers`` afterwards.
+    """
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for sql in DROP_TRIGGER_SQL:
+            cursor.execute(sql)
+
+
+def create_triggers(connection):
+    if not is_enabled(connection):
+        return
+    with connection.cursor() as cursor:
+        for sql in TRIGGER_SQL:
+            cursor.execute(sql)
+
+
+def rebuild(connection):
+    """Re-index everything from the source tables"""
+    if not is_enabled(connection):
+        return False
+    with connection.cursor() as cursor:
+        for sql in POPULATE_SQL:
+            cursor.execute(sql)
+    return True
+
+
+def is_enabled(connection=None):
+    connection = connection or connections["default"]
+    if connection.vendor != "sqlite":
+        return False
+    key = (connection.alias, str(connection.settings_dict["NAME"]))
+    if key not in _enabled:
+        _enabled[key] = SEARCH_TABLE in connection.introspection.table_names()
+    return _enabled[key]
+
+
+def to_match_query(text):
+    """
+    Turn free text into a safe FTS5 query: every word must match as a prefix.
+    Returns "" when the text has no searchable words.
+    """
+    words = re.findall(r"\w+", text or "")
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def filter_queryset(queryset, text, kind, emails=False):
+    """
+    Restrict a Post/Comment/User queryset to rows matching ``text``.
+
+    Keeps the queryset lazy, so ordering and pagination still apply. With
+    ``emails`` (staff only) a term containing "@" matches the user's e-mail.
+    """
+    if emails and "@" in text:
+        return queryset.filter(**{f"{EMAIL_FIELDS[kind]}__icontains": text.strip()})
+    connection = connections[queryset.db]
+    if is_enabled(connection):
+        match = to_match_query(text)
+        if not match:
+            return queryset.none()
+        return queryset.filter(pk__in=RawSQL(
+            f"SELECT rowid / 4 FROM {SEARCH_TABLE} "
+            f"WHERE {SEARCH_TABLE} MATCH %s AND rowid %% 4 = %s",
+            [match, KINDS[kind]],
+        ))
+    condition = Q()
+    for field in LIKE_FIELDS[kind]:
+        condition |= Q(**{f"{field}__icontains": text})
+    return queryset.filter(condition)
+
+
+def _highlight(snippet):
+    return (
+        escape(snippet)
+        .replace(_MARK_START, "<mark>")
+        .replace(_MARK_END, "</mark>")
+    )
+
+
+def search(text, kinds=None, limit=20, offset=0):
+    """
+    Ranked search across all indexed kinds.
+
+    Returns dicts with ``type``, ``id``, ``rank`` and an HTML-escaped
+    ``snippet`` where the matched words are wrapped in ``<mark>``.
+    """
+    kinds = list(KINDS) if not kinds else kinds
+    from .models import Post
+
+    connection = connections[router.db_for_read(Post) or "default"]
+    if not is_enabled(connection):
+        return _like_search(text, kinds, limit, offset)
+
+    match = to_match_query(text)
+    if not match:
+        return []
+    codes = ", ".join(str(KINDS[kind]) for kind in kinds)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid, bm25({SEARCH_TABLE}, 5.0, 1.0, 2.0) AS score, "
+            f"snippet({SEARCH_TABLE}, -1, %s, %s, '…', 12) "
+            f"FROM {SEARCH_TABLE} "
+            f"WHERE {SEARCH_TABLE} MATCH %s AND rowid %% 4 IN ({codes}) "
+            f"ORDER BY score LIMIT %s OFFSET %s",
+            [_MARK_START, _MARK_END, match, limit, offset],
+        )
+        rows = cursor.fetchall()
+    return [
+        {
+            "type": KIND_NAMES[rowid % 4],
+            "id": rowid // 4,
+            "rank": -score,
+            "snippet": _highlight(snippet),
+        }
+        for rowid, score, snippet in rows
+    ]
+
+
+def _like_search(text, kinds, limit, offset):
+    from django.contrib.auth.models import User
+    from .models import Post, Comment
+
+    querysets = {
+        "post": Post.objects.values_list("pk", "content"),
+        "comment": Comment.objects.values_list("pk", "content"),
+        "user": User.objects.values_list("pk", "username"),
+    }
+    results = []
+    for kind in kinds:
+        qs = filter_queryset(querysets[kind], text, kind)
+        for pk, body in qs[:offset + limit]:
+            results.append({
+                "type": kind,
+                "id": pk,
+                "rank": 0.0,
+                "snippet": _like_snippet(body, text),
+            })
+    return results[offset:offset + limit]
+
+
+def _like_snippet(body, text, width=60):
+    position = body.lower().find(text.lower())
+    if position < 0:
+        return escape(body[:width * 2])
+    start = max(position - width, 0)
+    end = position + len(text)
+    return (
+        ("…" if start else "")
+        + escape(body[start:position])
+        + "<mark>" + escape(body[position:end]) + "</mark>"
+        + escape(body[end:end + width])
+        + ("…" if end + width < len(body) else "")
+    )
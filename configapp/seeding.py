@@ -0,0 +1,241 @@
+"""
+Synthetic blog data at production scale.
+
+Everything is derived from one ``random.Random(seed)``, so the same
+arguments always build the same dataset. Rows go in with ``bulk_create``
+in batches (``bulk_insert`` for posts and comments, which keeps their
+timestamps); every user shares one precomputed password hash. Activity is
+skewed the way real blogs are: a few authors write most posts, a few
+posts get most comments (Zipf weights), and timestamps spread over
+``days`` with newer posts having higher ids.
+
+Counters (Post.comment_count, UserProfile post/comment counts) and the
+derived post fields are computed up front instead of recounted afterwards.
+The search index fills itself through its insert triggers.
+"""
+import random
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from . import page_cache, stats
+from .models import UserProfile, Post, Comment
+
+WORDS = (
+    "django python blog post izoh foydalanuvchi sahifa tezlik kesh indeks "
+    "so'rov baza server shablon ma'lumot natija loyiha dastur kod test"
+).split()
+
+SEED_PASSWORD = "seed123"
+BATCH_SIZE = 2000
+
+
+def _text(rng, words):
+    return " ".join(rng.choices(WORDS, k=words))
+
+
+def zipf_weights(n, exponent=1.1):
+    """Weight of the k-th most active item falls off as 1 / k**exponent"""
+    return [1 / (rank ** exponent) for rank in range(1, n + 1)]
+
+
+def _skewed_picks(rng, n, k, exponent):
+    """``k`` indexes into ``range(n)`` drawn with Zipf weights, ranks shuffled"""
+    if not n or not k:
+        return []
+    ranks = list(range(n))
+    rng.shuffle(ranks)
+    return rng.choices(ranks, cum_weights=_cumulative(zipf_weights(n, exponent)), k=k)
+
+
+def _cumulative(weights):
+    total = 0
+    out = []
+    for weight in weights:
+        total += weight
+        out.append(total)
+    return out
+
+
+def bulk_insert(model, objs, batch_size=BATCH_SIZE):
+    """
+    ``bulk_create`` that keeps the created_at/updated_at values set on the
+    objects. The INSERT is raw, so auto_now/auto_now_add are not applied;
+    the field definitions (shared by every thread) are left alone.
+    """
+    opts = model._meta
+    using = router.db_for_write(model)
+    ops = connections[using].ops
+    groups = (
+        ([obj for obj in objs if obj.pk is not None], opts.concrete_fields),
+        ([obj for obj in objs if obj.pk is None], [f for f in opts.concrete_fields if f is not opts.pk]),
+    )
+    for group, fields in groups:
+        size = max(min(batch_size, ops.bulk_batch_size(fields, group)), 1)
+        for start in range(0, len(group), size):
+            batch = group[start:start + size]
+            rows = model._base_manager._insert(
+                batch, fields=fields, returning_fields=opts.db_returning_fields, raw=True, using=using,
+            )
+            for obj, row in zip(batch, rows):
+                for field, value in zip(opts.db_returning_fields, row):
+                    setattr(obj, field.attname, value)
+                obj._state.adding = False
+                obj._state.db = using
+    return objs
+
+
+class Seeder:
+    def __init__(self, users, posts, comments, seed=0, prefix="seed", days=365,
+                 batch_size=BATCH_SIZE, progress=None):
+        self.rng = random.Random(seed)
+        self.sizes = {"users": users, "posts": posts, "comments": comments}
+        self.prefix = prefix
+        self.days = days
+        self.batch_size = batch_size
+        self.progress = progress
+        self.timings = {}
+        self.end = timezone.now().replace(microsecond=0)
+        self.start = self.end - timedelta(days=days)
+
+    def _report(self, name, done):
+        if self.progress:
+            self.progress(name, done, self.sizes[name])
+
+    def _post_time(self, index):
+        """Posts are spread evenly over the period, oldest first"""
+        step = (self.end - self.start) / max(self.sizes["posts"], 1)
+        return self.start + step * index
+
+    def _timed(self, name, fill):
+        started = time.perf_counter()
+        fill()
+        self.timings[name] = time.perf_counter() - started
+
+    def plan(self):
+        """Pick post authors, and post + author of every comment"""
+        users, posts, comments = self.sizes["users"], self.sizes["posts"], self.sizes["comments"]
+        self.post_authors = _skewed_picks(self.rng, users, posts, 1.2)
+        # Sorted so comments are inserted post by post, like they arrive
+        self.comment_posts = sorted(_skewed_picks(self.rng, posts, comments, 1.1))
+        self.comment_authors = _skewed_picks(self.rng, users, comments, 1.0)
+        # One hash for everybody; hashing is slow on purpose
+        self.password = make_password(SEED_PASSWORD)
+
+    def insert_users(self):
+        self.user_ids = []
+        for start in range(0, self.sizes["users"], self.batch_size):
+            batch = [
+                User(
+                    username=f"{self.prefix}{i}",
+                    email=f"{self.prefix}{i}@example.com",
+                    password=self.password,
+                    date_joined=self.start + timedelta(minutes=i),
+                )
+                for i in range(start, min(start + self.batch_size, self.sizes["users"]))
+            ]
+            self.user_ids.extend(user.pk for user in User.objects.bulk_create(batch))
+            self._report("users", len(self.user_ids))
+
+    def insert_profiles(self):
+        posts = Counter(self.post_authors)
+        comments = Counter(self.comment_authors)
+        for start in range(0, len(self.user_ids), self.batch_size):
+            UserProfile.objects.bulk_create([
+                UserProfile(
+                    user_id=self.user_ids[i],
+                    bio=_text(self.rng, self.rng.randint(5, 30)),
+                    post_count=posts[i],
+                    comment_count=comments[i],
+                )
+                for i in range(start, min(start + self.batch_size, len(self.user_ids)))
+            ])
+
+    def insert_posts(self):
+        comment_counts = Counter(self.comment_posts)
+        self.post_ids = []
+        for start in range(0, self.sizes["posts"], self.batch_size):
+            batch = []
+            for i in range(start, min(start + self.batch_size, self.sizes["posts"])):
+                # Post lengths are skewed too: mostly short, some long reads
+                content = _text(self.rng, min(int(self.rng.paretovariate(1.5) * 60), 3000))
+                created_at = self._post_time(i)
+                post = Post(
+                    title=_text(self.rng, self.rng.randint(3, 8)).capitalize(),
+                    content=content,
+                    author_id=self.user_ids[self.post_authors[i]],
+                    created_at=created_at,
+                    updated_at=created_at,
+                    comment_count=comment_counts[i],
+                )
+                post.fill_derived_fields()
+                batch.append(post)
+            self.post_ids.extend(post.pk for post in bulk_insert(Post, batch))
+            self._report("posts", len(self.post_ids))
+
+    def insert_comments(self):
+        total = len(self.comment_posts)
+        for start in range(0, total, self.batch_size):
+            batch = []
+            for i in range(start, min(start + self.batch_size, total)):
+                post_index = self.comment_posts[i]
+                created_at = min(
+                    self._post_time(post_index) + timedelta(minutes=self.rng.expovariate(1 / 600)),
+                    self.end,
+                )
+                batch.append(Comment(
+                    post_id=self.post_ids[post_index],
+                    author_id=self.user_ids[self.comment_authors[i]],
+                    content=_text(self.rng, self.rng.randint(3, 40)),
+                    created_at=created_at,
+                    updated_at=created_at,
+                ))
+            bulk_insert(Comment, batch)
+            self._report("comments", min(start + self.batch_size, total))
+
+    def run(self):
+        self.plan()
+        with transaction.atomic():
+            self._timed("users", self.insert_users)
+            self._timed("profiles", self.insert_profiles)
+            self._timed("posts", self.insert_posts)
+            self._timed("comments", self.insert_comments)
+        stats.clear()
+        page_cache.bump("site", "posts")
+        return self.report()
+
+    def report(self):
+        rows = {
+            "users": self.sizes["users"],
+            "profiles": self.sizes["users"],
+            "posts": self.sizes["posts"],
+            "comments": self.sizes["comments"],
+        }
+        seconds = sum(self.timings.values())
+        return {
+            "rows": rows,
+            "seconds": {name: round(value, 3) for name, value in self.timings.items()},
+            "rows_per_second": {
+                name: round(rows[name] / self.timings[name]) if self.timings[name] else 0
+                for name in rows
+            },
+            "total_rows_per_second": round(sum(rows.values()) / seconds) if seconds else 0,
+        }
+
+
+def generate(users, posts, comments, seed=0, prefix="seed", days=365,
+             batch_size=BATCH_SIZE, progress=None):
+    """Insert a deterministic dataset, return row counts and insert rates"""
+    if min(users, posts, comments) < 0:
+        raise ValueError("Sizes must not be negative")
+    if posts and not users or comments and not posts:
+        raise ValueError("Posts need users and comments need posts")
+    if User.objects.filter(username=f"{prefix}0").exists():
+        raise ValueError(f"Users named {prefix}<n> already exist, pick another prefix")
+    return Seeder(users, posts, comments, seed=seed, prefix=prefix, days=days,
+                  batch_size=batch_size, progress=progress).run()
@@ -0,0 +1,171 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from . import avatars, live, page_cache, ranking, stats
+from .models import UserProfile, Post, Comment
+from .counters import adjust_post_comments, adjust_profile
+
+
+# Denormalized counters.
+# Deletes that cascade (user -> posts -> comments) send post_delete for every
+# row, so counters stay right no matter where the delete started.
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        adjust_profile(instance.author_id, posts=1)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    adjust_profile(instance.author_id, posts=-1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        adjust_post_comments(instance.post_id, 1)
+        adjust_profile(instance.author_id, comments=1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    adjust_post_comments(instance.post_id, -1)
+    adjust_profile(instance.author_id, comments=-1)
+
+
+# Site statistics cache
+@receiver(post_save, sender=Post)
+def post_saved_stats(sender, instance, created, **kwargs):
+    if created:
+        stats.bump("total_posts", 1)
+        stats.invalidate("recent_posts", "top_contributors")
+    else:
+        stats.invalidate("recent_posts")
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted_stats(sender, instance, **kwargs):
+    stats.bump("total_posts", -1)
+    stats.invalidate("recent_posts", "recent_comments", "top_contributors")
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved_stats(sender, instance, created, **kwargs):
+    if created:
+        stats.bump("total_comments", 1)
+    # Recent posts show their comment counts
+    stats.invalidate("recent_comments", "recent_posts")
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted_stats(sender, instance, **kwargs):
+    stats.bump("total_comments", -1)
+    stats.invalidate("recent_comments", "recent_posts")
+
+
+@receiver(post_save, sender=User)
+def user_saved_stats(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) == {"last_login"}:
+        return
+    if created:
+        stats.bump("total_users", 1)
+    # is_active may have flipped, and usernames show up everywhere
+    stats.invalidate(
+        "active_users", "recent_users", "recent_posts",
+        "recent_comments", "top_contributors",
+    )
+
+
+@receiver(post_delete, sender=User)
+def user_deleted_stats(sender, instance, **kwargs):
+    stats.bump("total_users", -1)
+    stats.invalidate("active_users", "recent_users", "top_contributors")
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def profile_changed_stats(sender, instance, **kwargs):
+    stats.invalidate("recent_users", "recent_posts", "top_contributors")
+
+
+# Anonymous page and fragment cache versions
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed_pages(sender, instance, **kwargs):
+    page_cache.bump(
+        "site", "posts", page_cache.post_key(instance.pk), page_cache.author_key(instance.author_id)
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed_pages(sender, instance, **kwargs):
+    page_cache.bump("site", page_cache.post_key(instance.post_id))
+
+
+def _user_changed_pages(user_id):
+    # Usernames and avatars also show up next to the user's comments
+    commented = Comment.objects.filter(author_id=user_id).values_list("post_id", flat=True).distinct()
+    page_cache.bump(
+        "site", "posts", page_cache.author_key(user_id),
+        *[page_cache.post_key(post_id) for post_id in commented],
+    )
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def profile_changed_pages(sender, instance, **kwargs):
+    _user_changed_pages(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def user_saved_pages(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) == {"last_login"}:
+        return
+    if created:
+        page_cache.bump("site")
+    else:
+        _user_changed_pages(instance.pk)
+
+
+# Live comment stream
+@receiver(post_save, sender=Comment)
+def comment_created_live(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        live.publish(instance.post_id, [instance.pk])
+
+
+# Trending scores
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+def activity_ranking(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        ranking.schedule()
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted_ranking(sender, instance, **kwargs):
+    ranking.schedule_recompute(instance.post_id)
+
+
+# Avatar thumbnails
+@receiver(pre_save, sender=UserProfile)
+def profile_avatar_changing(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and "avatar" not in update_fields:
+        return
+    old = None
+    if instance.pk:
+        old = UserProfile.objects.filter(pk=instance.pk).values_list("avatar", flat=True).first()
+    instance._avatar_changed = (old or "") != (instance.avatar.name or "")
+    if instance._avatar_changed:
+        instance.avatar_hash = ""
+
+
+@receiver(post_save, sender=UserProfile)
+def profile_avatar_changed(sender, instance, **kwargs):
+    if getattr(instance, "_avatar_changed", False) and instance.avatar:
+        instance._avatar_changed = False
+        avatars.schedule(instance.pk)
@@ -0,0 +1,133 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .models import Post, Comment
+
+STATS_PREFIX = "blog:stats:"
+STATS_TIMEOUT = 300
+RECENT_LIMIT = 5
+TOP_CONTRIBUTORS_LIMIT = 5
+
+TOTALS = {
+    "total_users": lambda: User.objects.count(),
+    "total_posts": lambda: Post.objects.count(),
+    "total_comments": lambda: Comment.objects.count(),
+    "active_users": lambda: User.objects.filter(is_active=True).count(),
+}
+
+
+def _key(name):
+    return STATS_PREFIX + name
+
+
+def _timeout():
+    return getattr(settings, "BLOG_STATS_TIMEOUT", STATS_TIMEOUT)
+
+
+def _record(outcome):
+    key = _key(outcome)
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def _cached(name, compute):
+    value = cache.get(_key(name))
+    if value is None:
+        _record("misses")
+        value = compute()
+        cache.set(_key(name), value, _timeout())
+    else:
+        _record("hits")
+    return value
+
+
+def get_totals(names=None):
+    """Return the site totals, counting only the ones missing from the cache"""
+    names = list(TOTALS) if names is None else names
+    found = cache.get_many([_key(name) for name in names])
+    totals = {}
+    missing = {}
+    for name in names:
+        value = found.get(_key(name))
+        if value is None:
+            value = missing[_key(name)] = TOTALS[name]()
+        totals[name] = value
+    if missing:
+        _record("misses")
+        cache.set_many(missing, _timeout())
+    else:
+        _record("hits")
+    return totals
+
+
+def get_recent_posts():
+    return _cached("recent_posts", lambda: list(
+        Post.objects.select_related("author", "author__userprofile")
+        .defer("content")
+        .order_by("-created_at", "-id")[:RECENT_LIMIT]
+    ))
+
+
+def get_recent_comments():
+    return _cached("recent_comments", lambda: list(
+        Comment.objects.select_related("author")
+        .order_by("-created_at", "-id")[:RECENT_LIMIT]
+    ))
+
+
+def get_recent_users():
+    return _cached("recent_users", lambda: list(
+        User.objects.select_related("userprofile")
+        .order_by("-date_joined")[:RECENT_LIMIT]
+    ))
+
+
+def get_top_contributors():
+    # Reads the denormalized UserProfile.post_count instead of a GROUP BY
+    return _cached("top_contributors", lambda: list(
+        User.objects.select_related("userprofile")
+        .filter(userprofile__post_count__gt=0)
+        .annotate(post_count=F("userprofile__post_count"))
+        .order_by("-post_count", "id")[:TOP_CONTRIBUTORS_LIMIT]
+    ))
+
+
+def cache_info():
+    """Hit/miss counters of the stats cache"""
+    hits = cache.get(_key("hits"), 0)
+    misses = cache.get(_key("misses"), 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 3) if total else 0.0,
+    }
+
+
+def invalidate(*names):
+    """Drop cached entries once the surrounding transaction commits"""
+    keys = [_key(name) for name in names]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def bump(name, delta):
+    """Adjust a cached total in place; a missing key is simply recounted later"""
+    def apply():
+        try:
+            cache.incr(_key(name), delta)
+        except ValueError:
+            pass
+    transaction.on_commit(apply)
+
+
+def clear():
+    cache.delete_many([_key(name) for name in [
+        *TOTALS, "recent_posts", "recent_comments", "recent_users",
+        "top_contributors", "hits", "misses",
+    ]])
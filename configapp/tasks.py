@@ -0,0 +1,262 @@
+"""
+Persistent background tasks.
+
+``enqueue(func, **kwargs)`` writes a ``Task`` row in the caller's
+transaction, so a task exists exactly when the data it works on was
+committed, and the view returns at once. ``manage.py run_workers`` runs
+worker processes that claim due tasks one at a time, run them and store
+how long they took.
+
+- A failing task is retried with exponential backoff (``BACKOFF_SECONDS``
+  doubled per attempt, capped at ``MAX_BACKOFF_SECONDS``) until
+  ``max_attempts``, then kept as failed with its last error.
+- ``dedupe_key``: while a task with the same key is still pending,
+  enqueueing another one is a no-op.
+- A task still running after ``BLOG_TASK_LEASE_SECONDS`` is taken to have
+  lost its worker and is claimed again, unless that was its last attempt:
+  then it is marked failed, so a task that kills its worker is not retried
+  forever.
+
+Only functions marked with ``@task`` run. With ``BLOG_TASKS_EAGER`` they
+run inline after commit instead of being stored (tests, no workers).
+"""
+import logging
+import multiprocessing
+import os
+import queue
+import random
+import signal
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connection, connections, transaction
+from django.db.models import Avg, Count, F, Max, Q, Sum
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+from .routers import use_primary
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 10
+MAX_BACKOFF_SECONDS = 3600
+LEASE_SECONDS = 600
+POLL_SECONDS = 1.0
+
+
+def task(func):
+    """Allow ``func`` to be run by the workers"""
+    func.background_task = True
+    return func
+
+
+def task_name(func):
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def enqueue(func, *, dedupe_key=None, delay=0, max_attempts=MAX_ATTEMPTS, **kwargs):
+    """Schedule ``func(**kwargs)``; ``kwargs`` must be JSON serializable"""
+    if not getattr(func, "background_task", False):
+        raise ValueError(f"{task_name(func)} is not a @task")
+    if getattr(settings, "BLOG_TASKS_EAGER", False):
+        transaction.on_commit(lambda: func(**kwargs))
+        return
+    # A pending duplicate makes this INSERT a no-op (partial unique index)
+    Task.objects.bulk_create([Task(
+        name=task_name(func),
+        kwargs=kwargs,
+        dedupe_key=dedupe_key,
+        max_attempts=max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )], ignore_conflicts=dedupe_key is not None)
+
+
+def backoff(attempts):
+    """Seconds before retry number ``attempts``, with up to 25% jitter"""
+    seconds = min(MAX_BACKOFF_SECONDS, BACKOFF_SECONDS * 2 ** (attempts - 1))
+    return seconds * random.uniform(1, 1.25)
+
+
+def lease_seconds():
+    return getattr(settings, "BLOG_TASK_LEASE_SECONDS", LEASE_SECONDS)
+
+
+def claim(worker):
+    """Mark the next due task as running for ``worker`` and return it"""
+    now = timezone.now()
+    expired = Q(status=Task.RUNNING, locked_at__lt=now - timedelta(seconds=lease_seconds()))
+    due = Task.objects.filter(
+        Q(status=Task.PENDING, run_after__lte=now) | (expired & Q(attempts__lt=F("max_attempts")))
+    ).order_by("run_after", "id")
+    # On SQLite the transaction starts with BEGIN IMMEDIATE, which already
+    # keeps two workers from picking the same row
+    with transaction.atomic():
+        Task.objects.filter(expired, attempts__gte=F("max_attempts")).update(
+            status=Task.FAILED, finished_at=now, locked_by="", locked_at=None,
+            last_error="Lease expired on the last attempt: the worker was lost",
+        )
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        task = due.first()
+        if task is None:
+            return None
+        Task.objects.filter(pk=task.pk).update(
+            status=Task.RUNNING, locked_by=worker, locked_at=now, attempts=F("attempts") + 1,
+        )
+    task.status, task.locked_by, task.locked_at = Task.RUNNING, worker, now
+    task.attempts += 1
+    return task
+
+
+def _finished(task, **fields):
+    Task.objects.filter(pk=task.pk).update(finished_at=timezone.now(), **fields)
+
+
+def run(task):
+    """Run a claimed task and record the outcome; True when it succeeded"""
+    started = time.perf_counter()
+    try:
+        func = import_string(task.name)
+        if not getattr(func, "background_task", False):
+            raise ValueError(f"{task.name} is not a @task")
+        # Replicas may not have the rows the task was enqueued for yet
+        with use_primary():
+            func(**task.kwargs)
+    except Exception:
+        duration_ms = (time.perf_counter() - started) * 1000
+        logger.exception("Task %s (%s) failed", task.pk, task.name)
+        error = traceback.format_exc()
+        if task.attempts >= task.max_attempts:
+            _finished(task, status=Task.FAILED, last_error=error, duration_ms=duration_ms)
+            return False
+        try:
+            with transaction.atomic():
+                Task.objects.filter(pk=task.pk).update(
+                    status=Task.PENDING, last_error=error, duration_ms=duration_ms,
+                    run_after=timezone.now() + timedelta(seconds=backoff(task.attempts)),
+                    locked_by="", locked_at=None,
+                )
+        except IntegrityError:
+            # A newer pending task with the same key will do the work
+            _finished(task, status=Task.FAILED, last_error=error, duration_ms=duration_ms)
+        return False
+    _finished(
+        task, status=Task.DONE, last_error="",
+        duration_ms=(time.perf_counter() - started) * 1000,
+    )
+    return True
+
+
+def work(worker, stop, burst=False, poll=POLL_SECONDS):
+    """Claim and run tasks until ``stop`` is set (or the queue is empty with ``burst``)"""
+    done = 0
+    while not stop.is_set():
+        try:
+            task = claim(worker)
+        except DatabaseError:
+            # E.g. "database is locked" past the busy timeout: try again later
+            logger.exception("Worker %s could not claim a task", worker)
+            connections.close_all()
+            stop.wait(poll)
+            continue
+        if task is None:
+            if burst:
+                break
+            stop.wait(poll)
+            continue
+        run(task)
+        done += 1
+    return done
+
+
+def _worker(number, stop, burst, poll, results):
+    connections.close_all()
+    worker = f"{socket.gethostname()}:{os.getpid()}:{number}"
+    done = None
+    try:
+        done = work(worker, stop, burst, poll)
+    except Exception:
+        logger.exception("Worker %s stopped", worker)
+    finally:
+        # None: the worker crashed
+        results.put(done)
+        connections.close_all()
+
+
+def _collect(processes, results, poll):
+    """One count per worker, None for a worker that crashed or was killed"""
+    counts = []
+    while len(counts) < len(processes):
+        try:
+            counts.append(results.get(timeout=poll))
+        except queue.Empty:
+            if any(process.is_alive() for process in processes):
+                continue
+            # Everyone has exited: what they sent is in the pipe already
+            try:
+                while True:
+                    counts.append(results.get(timeout=0.1))
+            except queue.Empty:
+                pass
+            counts.extend([None] * (len(processes) - len(counts)))
+    return counts
+
+
+def run_workers(count=2, burst=False, poll=POLL_SECONDS):
+    """
+    Run ``count`` worker processes until SIGINT/SIGTERM (or until the queue
+    is empty with ``burst``). A task in progress is finished first.
+    Returns the number of tasks each worker ran, None for workers that died.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+    stop = context.Event()
+    results = context.Queue()
+    previous = {
+        number: signal.signal(number, lambda *args: stop.set())
+        for number in (signal.SIGINT, signal.SIGTERM)
+    }
+    connections.close_all()
+    processes = [
+        context.Process(target=_worker, args=(n, stop, burst, poll, results))
+        for n in range(count)
+    ]
+    try:
+        for process in processes:
+            process.start()
+        counts = _collect(processes, results, poll)
+        for process in processes:
+            process.join()
+    finally:
+        for number, handler in previous.items():
+            signal.signal(number, handler)
+    return counts
+
+
+def metrics():
+    """Per task name: counts by status, run time of successful runs and retries"""
+    return list(
+        Task.objects.values("name").annotate(
+            pending=Count("pk", filter=Q(status=Task.PENDING)),
+            running=Count("pk", filter=Q(status=Task.RUNNING)),
+            done=Count("pk", filter=Q(status=Task.DONE)),
+            failed=Count("pk", filter=Q(status=Task.FAILED)),
+            avg_ms=Avg("duration_ms", filter=Q(status=Task.DONE)),
+            max_ms=Max("duration_ms", filter=Q(status=Task.DONE)),
+            retries=Sum(F("attempts") - 1, filter=Q(attempts__gt=1)),
+        ).order_by("name")
+    )
+
+
+def purge(days):
+    """Delete tasks that finished (done or failed) more than ``days`` ago"""
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = Task.objects.filter(
+        status__in=[Task.DONE, Task.FAILED], finished_at__lt=cutoff
+    ).delete()
+    return deleted
@@ -0,0 +1,37 @@
+from django import template
+from django.utils.html import format_html
+
+from configapp.avatars import pick_size, thumbnail_url
+
+register = template.Library()
+
+
+@register.filter
+def avatar_url(profile, size=40):
+    """``{{ profile|avatar_url:80 }}`` - JPEG thumbnail covering ``size`` px"""
+    return thumbnail_url(profile, int(size))
+
+
+@register.simple_tag
+def avatar(profile, size, alt="", css_class="", style=""):
+    """
+    ``<picture>`` with WebP and JPEG thumbnails for ``size`` px, or the
+    original image while the thumbnails are still being generated.
+    """
+    size = int(size)
+    if not profile.avatar_hash:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" style="{}" width="{}" height="{}">',
+            profile.avatar.url, alt, css_class, style, size, size,
+        )
+    # 2x thumbnails for high density screens when we have them
+    dense = pick_size(size * 2)
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{} 1x, {} 2x">'
+        '<img src="{}" srcset="{} 2x" alt="{}" class="{}" style="{}" width="{}" height="{}" loading="lazy">'
+        '</picture>',
+        thumbnail_url(profile, size, "webp"), thumbnail_url(profile, dense, "webp"),
+        thumbnail_url(profile, size), thumbnail_url(profile, dense),
+        alt, css_class, style, size, size,
+    )
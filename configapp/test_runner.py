@@ -0,0 +1,27 @@
+"""Test runner for ``manage.py test`` (``TEST_RUNNER``)"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from . import viewcounts
+
+
+class BlogTestRunner(DiscoverRunner):
+    """
+    Runs with view counting off; tests that count views turn it on with
+    ``override_settings`` and flush by hand. Whatever is still buffered is
+    written before the test databases go, not at exit into a database that
+    no longer exists.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.view_counting = override_settings(BLOG_VIEW_COUNTING=False)
+        self.view_counting.enable()
+
+    def teardown_databases(self, old_config, **kwargs):
+        viewcounts.counter.stop()
+        super().teardown_databases(old_config, **kwargs)
+
+    def teardown_test_environment(self, **kwargs):
+        self.view_counting.disable()
+        super().teardown_test_environment(**kwargs)
@@ -1,3 +1,1164 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import hashlib
+import importlib
+import json
+import multiprocessing
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from functools import partial
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+
+from django.apps import apps as django_apps
+from django.contrib import admin
+from django.contrib.auth.models import AnonymousUser, User
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from . import avatars, contact, export, live, moderation, ranking, renderers, search, seeding, stats, tasks, views, viewcounts
+from .benchmarks import endpoints
+from .admin import CommentAdmin
+from .importer import CommentImporter, PostImporter
+from .middleware import PrimaryStickinessMiddleware, QueryProfilingMiddleware, load_snapshots, route_stats
+from .routers import STICKY_COOKIE
+from .models import UserProfile, Post, Comment, PostScore, PostViewBatch, Task
+from .renderers import FastJSONRenderer
+from .serializers import (
+    UserProfileSerializer, PostSerializer, CommentSerializer,
+    UserProfileValuesSerializer, PostValuesSerializer, CommentValuesSerializer,
+)
+
+
+@override_settings(BLOG_QUERY_PROFILING=False)
+class AdminListQueryCountTests(TestCase):
+    """admin-panel/ lists cost a fixed number of queries on every page"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user("admin", password="pw", is_staff=True)
+        UserProfile.objects.create(user=cls.admin)
+        for i in range(40):
+            user = User.objects.create_user(f"user{i}")
+            UserProfile.objects.create(user=user)
+            post = Post.objects.create(title=f"Post {i}", content=f"matn {i} " * 30, author=user)
+            for j in range(2):
+                Comment.objects.create(post=post, author=user, content=f"izoh {j}")
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def walk(self, url, queries, context_name):
+        """Follow the 'older' links to the last page, counting queries on each"""
+        seen = []
+        next_url = url
+        while next_url:
+            with self.assertNumQueries(queries):
+                response = self.client.get(next_url)
+            self.assertEqual(response.status_code, 200)
+            page = response.context[context_name]
+            seen.extend(obj.pk for obj in page)
+            sep = "&" if "?" in url else "?"
+            next_url = f"{url}{sep}after={page.next_cursor}" if page.has_next else None
+        return seen
+
+    def test_users(self):
+        seen = self.walk("/admin-panel/users/", 5, "users")
+        self.assertEqual(len(seen), User.objects.count())
+        self.assertEqual(len(set(seen)), len(seen))
+
+    def test_posts(self):
+        seen = self.walk("/admin-panel/posts/", 5, "posts")
+        self.assertEqual(seen, list(Post.objects.order_by("-created_at", "-id").values_list("pk", flat=True)))
+
+    def test_comments(self):
+        seen = self.walk("/admin-panel/comments/", 5, "comments")
+        self.assertEqual(len(seen), Comment.objects.count())
+
+    def test_filtered_posts(self):
+        # Filtered lists skip the table estimate and count exactly
+        seen = self.walk("/admin-panel/posts/?author=user1", 4, "posts")
+        self.assertEqual(len(seen), Post.objects.filter(author__username__icontains="user1").count())
+
+    def test_previous_page(self):
+        first = self.client.get("/admin-panel/posts/").context["posts"]
+        second = self.client.get(f"/admin-panel/posts/?after={first.next_cursor}").context["posts"]
+        back = self.client.get(f"/admin-panel/posts/?before={second.previous_cursor}").context["posts"]
+        self.assertEqual([p.pk for p in back], [p.pk for p in first])
+
+    @override_settings(BLOG_EXACT_COUNT_LIMIT=10)
+    def test_estimated_total(self):
+        response = self.client.get("/admin-panel/comments/")
+        self.assertTrue(response.context["total_is_estimate"])
+        self.assertEqual(response.context["total"], Comment.objects.order_by("-pk").first().pk)
+
+
+@override_settings(BLOG_QUERY_PROFILING=False, BLOG_API_PAGE_SIZE=10)
+class ApiListQueryCountTests(TestCase):
+    """The list APIs cost the same few queries on every cursor page"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        for i in range(25):
+            cls.post = Post.objects.create(title=f"Post {i}", content=f"matn {i} " * 30, author=cls.author)
+            Comment.objects.create(post=cls.post, author=cls.author, content=f"izoh {i}")
+        for i in range(24):
+            Comment.objects.create(post=cls.post, author=cls.author, content=f"yana {i}")
+
+    def walk(self, url, queries):
+        """Follow the 'next' links to the last page, counting queries on each"""
+        seen = []
+        while url:
+            with self.assertNumQueries(queries):
+                response = self.client.get(url, headers={"Accept": "application/json"})
+            self.assertEqual(response.status_code, 200)
+            seen.extend(item["id"] for item in response.json()["results"])
+            url = response.json()["next"]
+        return seen
+
+    def test_posts(self):
+        seen = self.walk("/api/posts/", 1)
+        self.assertEqual(seen, list(Post.objects.order_by("-created_at", "-id").values_list("pk", flat=True)))
+
+    def test_comments(self):
+        seen = self.walk(f"/api/posts/{self.post.pk}/comments/", 2)
+        self.assertEqual(len(seen), self.post.comments.count())
+        self.assertEqual(len(set(seen)), len(seen))
+
+    def test_omitted_content_is_not_read(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/posts/?omit=content&page_size=5")
+        self.assertNotIn("content", response.json()["results"][0])
+        (sql,) = [query["sql"] for query in queries.captured_queries]
+        self.assertNotIn('"configapp_post"."content"', sql)
+        self.assertIn('"configapp_post"."excerpt"', sql)
+
+
+@override_settings(BLOG_QUERY_PROFILING=False)
+class PageCacheTests(TestCase):
+    """Anonymous pages are served from the cache until their content changes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        UserProfile.objects.create(user=cls.author)
+        cls.post = Post.objects.create(title="Birinchi", content="matn " * 30, author=cls.author)
+        Comment.objects.create(post=cls.post, author=cls.author, content="izoh")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_hits_run_no_queries(self):
+        for url in ("/", "/blog/", "/posts/", f"/posts/{self.post.pk}/"):
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                second = self.client.get(url)
+            self.assertEqual((second.status_code, second.get("ETag")), (200, first.get("ETag")))
+
+    def test_changes_invalidate(self):
+        url = f"/posts/{self.post.pk}/"
+        self.client.get("/posts/")
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.title = "Yangilangan"
+            self.post.save()
+        self.assertContains(self.client.get("/posts/"), "Yangilangan")
+        self.assertContains(self.client.get(url), "Yangilangan")
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=self.post, author=self.author, content="yangi izoh")
+        self.assertContains(self.client.get(url), "yangi izoh")
+
+    def test_signed_in_users_are_not_cached(self):
+        self.client.force_login(self.author)
+        self.client.get("/posts/")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/posts/")
+        self.assertTrue(queries.captured_queries)
+
+
+@override_settings(BLOG_QUERY_PROFILING=False)
+class BenchmarkTests(TestCase):
+    """The endpoint benchmark measures what the endpoints really cost"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        for i in range(5):
+            Post.objects.create(title=f"Post {i}", content="matn", author=cls.author)
+
+    def test_measure(self):
+        url = "/api/posts/"
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        result = endpoints.measure(self.client, url, iterations=3)
+        self.assertEqual(result["url"], url)
+        self.assertEqual(result["queries"], len(queries.captured_queries))
+        self.assertLessEqual(result["p50_ms"], result["p95_ms"])
+        self.assertGreater(result["peak_kb"], 0)
+
+    def test_compare(self):
+        baseline = {
+            "feed": {"queries": 2, "p95_ms": 10.0, "peak_kb": 100.0},
+            "gone": {"queries": 1, "p95_ms": 1.0, "peak_kb": 1.0},
+        }
+        self.assertEqual(endpoints.compare({"feed": {"queries": 2, "p95_ms": 12.0, "peak_kb": 120.0}}, baseline), [])
+        problems = endpoints.compare(
+            {"feed": {"queries": 3, "p95_ms": 13.0, "peak_kb": 100.0}, "new": {"queries": 9}}, baseline,
+        )
+        self.assertEqual(problems, ["feed: queries 2 -> 3", "feed: p95 10.0ms -> 13.0ms"])
+
+
+@override_settings(BLOG_QUERY_PROFILING=False)
+class DeferredContentTests(TestCase):
+    """Post listings show the stored excerpt and never read the bodies"""
+
+    POST_CONTENT = '"configapp_post"."content"'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user("admin", password="pw", is_staff=True)
+        cls.author = User.objects.create_user("author")
+        UserProfile.objects.create(user=cls.author)
+        for i in range(6):
+            cls.post = Post.objects.create(title=f"Post {i}", content=f"boshi{i} " + "matn " * 300, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def assertBodiesNotRead(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q["sql"] for q in queries.captured_queries if self.POST_CONTENT in q["sql"]])
+        return response
+
+    def test_recent_posts(self):
+        posts = stats.get_recent_posts()
+        self.assertTrue(posts)
+        self.assertTrue(all("content" in post.get_deferred_fields() for post in posts))
+        self.assertContains(self.assertBodiesNotRead("/blog/"), "boshi5")
+
+    def test_profile(self):
+        self.client.force_login(self.author)
+        self.assertContains(self.assertBodiesNotRead("/profile/"), "boshi5")
+
+    def test_admin_user_detail(self):
+        self.client.force_login(self.admin)
+        self.assertContains(self.assertBodiesNotRead(f"/admin-panel/users/{self.author.pk}/"), "boshi5")
+
+    def test_post_detail_sidebar(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(f"/posts/{self.post.pk}/")
+        # Only the post itself is read with its body
+        self.assertEqual(len([q for q in queries.captured_queries if self.POST_CONTENT in q["sql"]]), 1)
+
+
+class PostDerivedFieldsTests(TestCase):
+    """Excerpt, word count and reading time follow the content"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+
+    def test_kept_on_save(self):
+        post = Post.objects.create(title="Uzun", content="so'z " * 450, author=self.author)
+        self.assertEqual((post.word_count, post.reading_time), (450, 3))
+        post.content = "qisqa matn"
+        post.save(update_fields=["content"])
+        post = Post.objects.get(pk=post.pk)
+        self.assertEqual((post.excerpt, post.word_count, post.reading_time), ("qisqa matn", 2, 1))
+        post.content = ""
+        post.save()
+        self.assertEqual(Post.objects.filter(pk=post.pk, word_count=0, reading_time=0).count(), 1)
+
+    def test_migration_backfill(self):
+        migration = importlib.import_module("configapp.migrations.0007_post_word_count")
+        posts = [
+            Post.objects.create(title=f"Post {i}", content="bir ikki " * i, author=self.author)
+            for i in range(1, 4)
+        ]
+        Post.objects.update(word_count=0)
+        migration.fill_word_count(django_apps, None)
+        self.assertEqual(
+            list(Post.objects.order_by("pk").values_list("word_count", flat=True)),
+            [2 * i for i in range(1, len(posts) + 1)],
+        )
+
+
+@override_settings(BLOG_VIEW_COUNTING=True, BLOG_QUERY_PROFILING=False)
+class ViewCountTests(TestCase):
+    """Post views are buffered in the process and written in batches"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        cls.post = Post.objects.create(title="Post", content="matn " * 10, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        # Flushes are called by the tests, not by the background thread
+        self.counter = viewcounts.ViewCounter()
+        for patcher in (mock.patch.object(viewcounts, "counter", self.counter),
+                        mock.patch.object(self.counter, "start")):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_views_are_buffered_then_written(self):
+        updated_at = self.post.updated_at
+        for url in (f"/posts/{self.post.pk}/", f"/posts/{self.post.pk}/", f"/api/posts/{self.post.pk}/"):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.get("/posts/0/")
+        self.assertEqual(self.counter.pending, {self.post.pk: 3})
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 0)
+
+        self.assertEqual(self.counter.flush(), 3)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 3)
+        self.assertEqual(self.post.updated_at, updated_at)
+        self.assertEqual(list(PostViewBatch.objects.values_list("post_id", "count")), [(self.post.pk, 3)])
+        self.assertEqual(self.counter.pending, {})
+        self.assertEqual(self.client.get(f"/api/posts/{self.post.pk}/").json()["view_count"], 3)
+
+    def test_flush_changes_api_etags(self):
+        urls = ["/api/posts/", f"/api/posts/{self.post.pk}/"]
+        etags = [self.client.get(url)["ETag"] for url in urls]
+        self.counter.add(self.post.pk, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.counter.flush()
+        for url, etag in zip(urls, etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], etag)
+
+    def test_failed_flush_keeps_counts(self):
+        self.counter.add(self.post.pk, 4)
+        with mock.patch.object(viewcounts, "write_counts", side_effect=DatabaseError("locked")):
+            with self.assertLogs("configapp.viewcounts", "ERROR"):
+                self.assertEqual(self.counter.flush(), 0)
+        self.assertEqual(self.counter.pending, {self.post.pk: 4})
+        self.assertEqual(self.counter.flush(), 4)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 4)
+
+    def test_deleted_posts_are_skipped(self):
+        self.assertEqual(viewcounts.write_counts({self.post.pk: 2, 0: 5}), 2)
+        self.assertEqual(PostViewBatch.objects.count(), 1)
+
+    @override_settings(BLOG_VIEW_COUNTING=False)
+    def test_off(self):
+        self.client.get(f"/posts/{self.post.pk}/")
+        self.assertEqual(self.counter.pending, {})
+
+
+class SeedingTests(TestCase):
+    """Seeded and imported rows keep their timestamps without touching the model fields"""
+
+    def test_generate_keeps_timestamps(self):
+        seeding.generate(users=5, posts=20, comments=40, seed=1, days=30)
+        self.assertEqual(Post.objects.count(), 20)
+        self.assertEqual(Comment.objects.count(), 40)
+        oldest = Post.objects.order_by("created_at").first()
+        self.assertLess(oldest.created_at, timezone.now() - timedelta(days=29))
+        self.assertEqual(oldest.updated_at, oldest.created_at)
+        self.assertTrue(Post._meta.get_field("updated_at").auto_now)
+        self.assertTrue(Comment._meta.get_field("created_at").auto_now_add)
+        # Ordinary saves are still stamped
+        post = Post.objects.create(title="t", content="matn", author=User.objects.first())
+        self.assertGreater(post.created_at, timezone.now() - timedelta(minutes=1))
+
+    def test_import_keeps_timestamps(self):
+        author = User.objects.create_user("author")
+        moment = "2020-05-01T10:00:00Z"
+        results = list(PostImporter(keep_timestamps=True).import_items([
+            {"title": "Eski", "content": "matn", "author": "author", "created_at": moment, "updated_at": moment},
+        ]))
+        post = Post.objects.get(pk=results[0]["id"])
+        self.assertEqual(post.author, author)
+        self.assertEqual(post.created_at.year, 2020)
+        self.assertEqual(post.updated_at, post.created_at)
+
+
+class CounterTests(TestCase):
+    """Post/profile counters follow the signals; repair_counters fixes drift"""
+
+    def setUp(self):
+        self.author = User.objects.create_user("author")
+        UserProfile.objects.create(user=self.author)
+        self.reader = User.objects.create_user("reader")
+
+    def counts(self, user):
+        profile = UserProfile.objects.get(user=user)
+        return profile.post_count, profile.comment_count
+
+    def test_signals(self):
+        post = Post.objects.create(title="t", content="matn", author=self.author)
+        first = Comment.objects.create(post=post, author=self.reader, content="a")
+        Comment.objects.create(post=post, author=self.author, content="b")
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 2)
+        self.assertEqual(self.counts(self.author), (1, 1))
+        # The reader had no profile: it is created from real counts
+        self.assertEqual(self.counts(self.reader), (0, 1))
+
+        first.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(self.counts(self.reader), (0, 0))
+        post.delete()
+        self.assertEqual(self.counts(self.author), (0, 0))
+
+    def test_deleting_user_without_profile(self):
+        post = Post.objects.create(title="t", content="matn", author=self.reader)
+        Comment.objects.create(post=post, author=self.reader, content="a")
+        UserProfile.objects.filter(user=self.reader).delete()
+        self.reader.delete()
+        self.assertFalse(UserProfile.objects.filter(user_id=self.reader.pk).exists())
+        connection.check_constraints()
+
+    def test_repair_counters(self):
+        post = Post.objects.create(title="t", content="matn", author=self.author)
+        Comment.objects.create(post=post, author=self.author, content="a")
+        Post.objects.update(comment_count=7)
+        UserProfile.objects.update(post_count=3, comment_count=0)
+        lonely = User.objects.create_user("lonely")
+        out = StringIO()
+        call_command("repair_counters", stdout=out)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(self.counts(self.author), (1, 1))
+        self.assertEqual(self.counts(lonely), (0, 0))
+        self.assertIn("1 post", out.getvalue())
+
+
+class ModerationTests(TestCase):
+    """Bulk deletes run every chunk and keep the counters right"""
+
+    def setUp(self):
+        self.admin = User.objects.create_user("admin", password="pw", is_staff=True)
+        self.author = User.objects.create_user("author")
+        self.spammer = User.objects.create_user("spammer")
+        for user in (self.author, self.spammer):
+            UserProfile.objects.create(user=user)
+        self.post = Post.objects.create(title="t", content="matn", author=self.author)
+        Comment.objects.create(post=self.post, author=self.author, content="yaxshi")
+        for i in range(5):
+            Comment.objects.create(post=self.post, author=self.spammer, content=f"spam {i}")
+
+    def counts(self, user):
+        profile = UserProfile.objects.get(user=user)
+        return profile.post_count, profile.comment_count
+
+    def test_delete_comments_in_chunks(self):
+        steps = []
+        deleted = moderation.delete_comments(
+            Comment.objects.filter(author=self.spammer), chunk_size=2,
+            progress=lambda done, total: steps.append((done, total)),
+        )
+        self.assertEqual(deleted, 5)
+        self.assertEqual(steps, [(2, 5), (4, 5), (5, 5)])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        self.assertEqual(self.counts(self.spammer), (0, 0))
+        self.assertEqual(self.counts(self.author), (1, 1))
+
+    def test_delete_posts_with_comments(self):
+        PostScore.objects.create(post=self.post, rank=1.0)
+        PostViewBatch.objects.create(post=self.post, count=3)
+        self.assertEqual(moderation.delete_posts(Post.objects.filter(author=self.author)), 1)
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(PostScore.objects.exists())
+        self.assertEqual(self.counts(self.author), (0, 0))
+        self.assertEqual(self.counts(self.spammer), (0, 0))
+        connection.check_constraints()
+
+    def test_admin_delete_by_authors_runs_every_chunk(self):
+        for i in range(7):
+            Comment.objects.create(post=self.post, author=self.spammer, content=f"yana {i}")
+        comment_admin = CommentAdmin(Comment, admin.site)
+        comment_admin.bulk_delete = partial(moderation.delete_comments, chunk_size=5)
+        selected = Comment.objects.filter(author=self.spammer)[:1]
+        with mock.patch.object(comment_admin, "message_user"):
+            comment_admin.delete_by_authors(None, Comment.objects.filter(pk__in=[c.pk for c in selected]))
+        self.assertFalse(Comment.objects.filter(author=self.spammer).exists())
+        self.assertEqual(Comment.objects.count(), 1)
+
+    def test_stream_reports_after_deleting(self):
+        self.client.force_login(self.admin)
+        response = self.client.post("/admin-panel/comments/bulk-delete/", {"author": "spammer", "stream": "1"})
+        # Nothing is left to run once the response exists
+        self.assertFalse(Comment.objects.filter(author=self.spammer).exists())
+        self.assertFalse(response.streaming)
+        lines = [json.loads(line) for line in response.content.decode().splitlines()]
+        self.assertEqual(lines[-1], {"deleted": 5, "total": 5})
+
+    def test_form_post_redirects(self):
+        self.client.force_login(self.admin)
+        response = self.client.post("/admin-panel/posts/bulk-delete/", {"author": "author"})
+        self.assertRedirects(response, "/admin-panel/posts/", fetch_redirect_response=False)
+        self.assertFalse(Post.objects.exists())
+
+
+class BulkImportTests(TestCase):
+    """The bulk API caps items per request and ignores ?fields=/?omit="""
+
+    def setUp(self):
+        self.author = User.objects.create_user("author")
+        self.client.force_login(self.author)
+
+    @override_settings(BLOG_IMPORT_MAX_ITEMS=2)
+    def test_too_many_items(self):
+        items = [{"title": f"t{i}", "content": "matn"} for i in range(3)]
+        response = self.client.post("/api/posts/bulk/", items, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        lines = "".join(json.dumps(item) + "\n" for item in items)
+        response = self.client.post("/api/posts/bulk/", lines, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Post.objects.exists())
+
+        response = self.client.post("/api/posts/bulk/", items[:2], content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_comment_posts_are_read_once(self):
+        posts = [Post.objects.create(title=f"t{i}", content="matn", author=self.author) for i in range(2)]
+
+        def run(n):
+            items = [{"post_id": posts[i % 2].pk, "content": f"izoh {i}"} for i in range(n)]
+            with CaptureQueriesContext(connection) as queries:
+                results = list(CommentImporter(author=self.author).import_items(items))
+            self.assertTrue(all("id" in result for result in results))
+            return len(queries)
+
+        self.assertEqual(run(3), run(20))
+
+    def test_unknown_post(self):
+        items = [{"post_id": 0, "content": "a"}, {"post_id": "x", "content": "b"}]
+        results = list(CommentImporter(author=self.author).import_items(items))
+        self.assertEqual([list(result["errors"]) for result in results], [["post"], ["post"]])
+
+    def test_sparse_fields_do_not_drop_input(self):
+        response = self.client.post(
+            "/api/posts/bulk/?omit=content", [{"title": "t", "content": "to'liq matn"}],
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Post.objects.get().content, "to'liq matn")
+
+
+class RankingTests(TestCase):
+    """Deleted comments leave the scores; the home page follows the top posts"""
+
+    def setUp(self):
+        self.author = User.objects.create_user("author")
+        self.first = Post.objects.create(title="a", content="matn", author=self.author)
+        self.second = Post.objects.create(title="b", content="matn", author=self.author)
+        for i in range(4):
+            Comment.objects.create(post=self.first, author=self.author, content=f"izoh {i}")
+        ranking.update()
+
+    def ranks(self):
+        return dict(PostScore.objects.values_list("post_id", "rank"))
+
+    def assertRebuilt(self):
+        ranks = self.ranks()
+        ranking.rebuild()
+        rebuilt = self.ranks()
+        self.assertEqual(ranks.keys(), rebuilt.keys())
+        for post_id, rank in rebuilt.items():
+            self.assertAlmostEqual(ranks[post_id], rank)
+
+    def test_moderation_recomputes(self):
+        before = self.ranks()[self.first.pk]
+        moderation.delete_comments(Comment.objects.filter(post=self.first))
+        self.assertLess(self.ranks()[self.first.pk], before)
+        self.assertRebuilt()
+
+    def test_deleted_comment_schedules_recompute(self):
+        self.first.comments.first().delete()
+        task = Task.objects.get(dedupe_key=f"ranking:recompute:{self.first.pk}")
+        ranking.recompute(**task.kwargs)
+        self.assertRebuilt()
+
+    def test_unfolded_events_are_not_counted_twice(self):
+        Comment.objects.create(post=self.second, author=self.author, content="yangi")
+        ranking.recompute([self.second.pk])
+        ranking.update()
+        self.assertRebuilt()
+
+    def test_site_bumped_only_when_top_changes(self):
+        with mock.patch.object(ranking.page_cache, "bump") as bump:
+            PostViewBatch.objects.create(post=self.first, count=5)
+            self.assertEqual(ranking.update(), 1)
+            bump.assert_not_called()
+
+            for i in range(6):
+                Comment.objects.create(post=self.second, author=self.author, content=f"izoh {i}")
+            bump.reset_mock()
+            ranking.update()
+            bump.assert_called_once_with("site")
+
+
+@override_settings(BLOG_TASKS_EAGER=False)
+class TaskQueueTests(TestCase):
+    """Claiming, retries, dedupe and lease reclaim of the database task queue"""
+
+    def enqueue(self, **kwargs):
+        tasks.enqueue(contact.send_message, name="Ali", email="ali@example.com", message="salom", **kwargs)
+
+    def test_claim_and_run(self):
+        self.enqueue()
+        task = tasks.claim("w1")
+        self.assertEqual((task.status, task.attempts, task.locked_by), (Task.RUNNING, 1, "w1"))
+        # A running task is not handed out twice
+        self.assertIsNone(tasks.claim("w2"))
+        self.assertTrue(tasks.run(task))
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.DONE)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].reply_to, ["ali@example.com"])
+
+    def test_retry_with_backoff(self):
+        self.enqueue(max_attempts=2)
+        failing = mock.patch.object(contact.EmailMessage, "send", side_effect=OSError("SMTP yo'q"))
+        with failing, self.assertLogs("configapp.tasks", "ERROR"):
+            started = timezone.now()
+            self.assertFalse(tasks.run(tasks.claim("w1")))
+            task = Task.objects.get()
+            self.assertEqual(task.status, Task.PENDING)
+            self.assertIn("SMTP yo'q", task.last_error)
+            delay = (task.run_after - started).total_seconds()
+            self.assertTrue(tasks.BACKOFF_SECONDS <= delay <= tasks.BACKOFF_SECONDS * 1.25 + 1, delay)
+            self.assertIsNone(tasks.claim("w1"))
+
+            Task.objects.update(run_after=started)
+            self.assertFalse(tasks.run(tasks.claim("w1")))
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.FAILED, 2))
+        self.assertLessEqual(tasks.backoff(50), tasks.MAX_BACKOFF_SECONDS * 1.25)
+
+    def test_dedupe_while_pending(self):
+        self.enqueue(dedupe_key="contact")
+        self.enqueue(dedupe_key="contact")
+        self.assertEqual(Task.objects.count(), 1)
+        # Once it runs, the next one is queued again
+        tasks.claim("w1")
+        self.enqueue(dedupe_key="contact")
+        self.assertEqual(Task.objects.filter(status=Task.PENDING).count(), 1)
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_lease_reclaim(self):
+        self.enqueue()
+        task = tasks.claim("w1")
+        Task.objects.update(locked_at=timezone.now() - timedelta(seconds=tasks.lease_seconds() + 1))
+        reclaimed = tasks.claim("w2")
+        self.assertEqual(reclaimed.pk, task.pk)
+        self.assertEqual((reclaimed.locked_by, reclaimed.attempts), ("w2", 2))
+
+    def test_lost_last_attempt_fails(self):
+        self.enqueue(max_attempts=1)
+        tasks.claim("w1")
+        Task.objects.update(locked_at=timezone.now() - timedelta(seconds=tasks.lease_seconds() + 1))
+        self.assertIsNone(tasks.claim("w2"))
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.attempts), (Task.FAILED, 1))
+        self.assertIn("Lease expired", task.last_error)
+
+    def test_crashed_worker_reports(self):
+        results = queue.Queue()
+        with mock.patch.object(tasks, "work", side_effect=DatabaseError("disk I/O error")), \
+                mock.patch.object(tasks, "connections"), self.assertLogs("configapp.tasks", "ERROR"):
+            tasks._worker(0, threading.Event(), True, 0, results)
+        self.assertIsNone(results.get_nowait())
+
+    def test_killed_worker_does_not_block(self):
+        context = multiprocessing.get_context("fork")
+        process = context.Process(target=time.sleep, args=(60,))
+        process.start()
+        process.kill()
+        process.join()
+        self.assertEqual(tasks._collect([process], context.Queue(), 0.05), [None])
+
+    def test_contact_form_is_validated(self):
+        for name, email in [("Ali\nBcc: x@example.com", "ali@example.com"), ("Ali", "ali@"), ("Ali", "a\n@b.uz")]:
+            self.client.post("/", {"name": name, "email": email, "message": "salom"})
+        self.assertFalse(Task.objects.exists())
+        self.client.post("/", {"name": "Ali", "email": "ali@example.com", "message": "salom"})
+        self.assertEqual(Task.objects.get().kwargs["name"], "Ali")
+
+
+class AsyncReadTests(TestCase):
+    """The async read views answer exactly like the DRF views they stand in for"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        for i in range(3):
+            post = Post.objects.create(title=f"Post {i}", content=f"matn {i}", author=cls.author)
+        cls.post = post
+        for i in range(3):
+            Comment.objects.create(post=post, author=cls.author, content=f"izoh {i}")
+
+    def get(self, factory, view, url, headers, **kwargs):
+        request = factory.get(url, headers={"Accept": "application/json", **headers})
+        request.user = AnonymousUser()
+        request.auser = mock.AsyncMock(return_value=request.user)
+        if iscoroutinefunction(view):
+            return async_to_sync(view)(request, **kwargs)
+        response = view(request, **kwargs)
+        if hasattr(response, "render"):
+            response.render()
+        return response
+
+    def answers(self, sync_view, async_view, url, headers, **kwargs):
+        """What each view sends: status, body and headers"""
+        answers = []
+        for factory, view in ((RequestFactory(), sync_view), (AsyncRequestFactory(), async_view)):
+            response = self.get(factory, view, url, headers, **kwargs)
+            answers.append((
+                response.status_code, response.content,
+                *[response.get(name) for name in ("ETag", "Last-Modified", "Vary", "Allow", "Content-Type")],
+            ))
+        return answers
+
+    def assertSame(self, sync_view, async_view, url, **kwargs):
+        drf, fast = self.answers(sync_view, async_view, url, {}, **kwargs)
+        self.assertEqual(drf[0], 200)
+        self.assertIsNotNone(drf[2])
+        self.assertEqual(drf, fast)
+        # Revalidating with the ETag gets the same 304 from both
+        drf, fast = self.answers(sync_view, async_view, url, {"If-None-Match": drf[2]}, **kwargs)
+        self.assertEqual(drf[0], 304)
+        self.assertEqual(drf, fast)
+
+    def test_post_list(self):
+        self.assertSame(views.PostListView.as_view(), views.api_post_list_async, "/api/posts/?page_size=2")
+
+    def test_post_detail(self):
+        self.assertSame(
+            views.PostDetailView.as_view(), views.api_post_detail_async,
+            f"/api/posts/{self.post.pk}/", pk=self.post.pk,
+        )
+
+    def test_comment_list(self):
+        self.assertSame(
+            views.CommentListView.as_view(), views.api_comment_list_async,
+            f"/api/posts/{self.post.pk}/comments/", pk=self.post.pk,
+        )
+
+    def test_missing_post(self):
+        sync = self.get(RequestFactory(), views.PostDetailView.as_view(), "/api/posts/0/", {}, pk=0)
+        async_ = self.get(AsyncRequestFactory(), views.api_post_detail_async, "/api/posts/0/", {}, pk=0)
+        self.assertEqual((sync.status_code, sync.content), (async_.status_code, async_.content))
+
+
+class LiveTests(TestCase):
+    """Live comments reach every reader, and reconnecting readers catch up"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        cls.post = Post.objects.create(title="Jonli", content="matn", author=cls.author)
+        cls.other = Post.objects.create(title="Boshqa", content="matn", author=cls.author)
+        cls.comments = [
+            Comment.objects.create(post=cls.post, author=cls.author, content=f"izoh {i}") for i in range(5)
+        ]
+
+    def ids(self, events):
+        return [event_id for event_id, data in events]
+
+    async def test_local_broker_fans_out(self):
+        broker = live.LocalBroker()
+        comment = self.comments[-1]
+        async with broker.subscribe(self.post.pk) as first, broker.subscribe(self.post.pk) as second:
+            async with broker.subscribe(self.other.pk) as elsewhere:
+                await sync_to_async(broker.publish)(self.post.pk, [comment.pk])
+                events = await first.get(1)
+                self.assertEqual(self.ids(events), [comment.pk])
+                self.assertEqual(json.loads(events[0][1])["content"], comment.content)
+                # Serialized once and shared by every reader of the post
+                self.assertIs(await second.get(1), events)
+                self.assertEqual(await elsewhere.get(0.01), [])
+        self.assertEqual(broker.listening(self.post.pk), [])
+
+    def test_replay_from_last_event_id(self):
+        url = f"/posts/{self.post.pk}/comments/stream/"
+        after = self.comments[1].pk
+        for headers, query in (({"Last-Event-ID": str(after)}, ""), ({}, f"?last_event_id={after}")):
+            response = self.client.get(url + query, headers=headers)
+            self.assertEqual(response["Content-Type"], "text/event-stream")
+            body = response.content.decode()
+            self.assertTrue(body.startswith(f"retry: {live.RETRY_MS}\n\n"))
+            self.assertEqual(
+                [int(line[4:]) for line in body.splitlines() if line.startswith("id: ")],
+                [comment.pk for comment in self.comments[2:]],
+            )
+        # Nothing to replay for a first connection
+        self.assertEqual(self.client.get(url).content, live.RETRY)
+
+    async def test_missed_events_pages(self):
+        pages = []
+        with mock.patch.object(live, "BACKLOG_LIMIT", 2):
+            async for page in live.missed_events(self.post.pk, 0):
+                pages.append(self.ids(page))
+        self.assertEqual(pages, [[c.pk for c in self.comments[i:i + 2]] for i in (0, 2, 4)])
+
+    async def test_full_queue_ends_the_stream(self):
+        broker = live.LocalBroker()
+        with mock.patch.object(live, "QUEUE_SIZE", 2):
+            async with broker.subscribe(self.post.pk) as subscription:
+                for i in range(3):
+                    subscription.put([(i, b"{}")])
+                self.assertEqual(broker.listening(self.post.pk), [])
+                self.assertEqual(await subscription.get(1), [(1, b"{}")])
+                self.assertIsNone(await subscription.get(1))
+
+    @override_settings(BLOG_LIVE_POLL_SECONDS=0.01)
+    async def test_polling_broker_reads_the_database(self):
+        broker = live.PollingBroker()
+        try:
+            async with broker.subscribe(self.post.pk) as subscription:
+                # Written without publish, as another process would
+                comment = await Comment.objects.acreate(post=self.post, author=self.author, content="yangi")
+                events = await subscription.get(1)
+                while events == []:
+                    events = await subscription.get(1)
+                self.assertEqual(self.ids(events), [comment.pk])
+        finally:
+            tasks = [task for task, started in broker.pollers.values()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class ExportTests(TestCase):
+    """Exports stream, under WSGI and ASGI alike"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user("admin", is_staff=True)
+        for i in range(5):
+            Post.objects.create(title=f"Post {i}", content=f"matn {i}", author=cls.admin)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.async_client.force_login(self.admin)
+
+    def test_ndjson(self):
+        response = self.client.get("/admin-panel/export/posts/")
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([row["title"] for row in rows], [f"Post {i}" for i in range(5)])
+
+    def test_csv_gzip_since(self):
+        since = Post.objects.order_by("updated_at")[2].updated_at.isoformat()
+        response = self.client.get("/admin-panel/export/posts/", {"format": "csv", "gzip": "1", "since": since})
+        text = gzip.decompress(b"".join(response.streaming_content)).decode()
+        lines = text.splitlines()
+        self.assertTrue(lines[0].startswith("id,title,"))
+        self.assertEqual(len(lines), 3)
+
+    def test_asgi_response_is_async(self):
+        async def read(response):
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        with mock.patch.object(export, "FLUSH_BYTES", 1):
+            response = async_to_sync(self.async_client.get)("/admin-panel/export/posts/")
+            self.assertTrue(response.is_async)
+            body = async_to_sync(read)(response)
+        self.assertEqual(len(body.splitlines()), 5)
+
+
+class ValuesSerializerTests(TestCase):
+    """The .values() read path renders the same bytes as the ModelSerializers"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("yozuvchi", email="y@example.com")
+        UserProfile.objects.create(user=cls.author, bio="Salom \u2028 dunyo", avatar="avatars/a.jpg")
+        UserProfile.objects.create(user=User.objects.create_user("bo'sh"))
+        post = Post.objects.create(title="Sarlavha \u2028", content="matn " * 40, author=cls.author)
+        Comment.objects.create(post=post, author=cls.author, content="Izoh ✓")
+
+    def assertSameOutput(self, queryset, serializer_class, values_class, query=""):
+        context = {"request": Request(RequestFactory().get(f"/api/{query}"))}
+        expected = JSONRenderer().render(serializer_class(queryset, many=True, context=context).data)
+        reader = values_class(context=context)
+        self.assertEqual(FastJSONRenderer().render(reader.many(reader.values(queryset))), expected)
+        # Without orjson the renderer falls back to DRF's encoder
+        with mock.patch.object(renderers, "orjson", None):
+            self.assertEqual(FastJSONRenderer().render(reader.many(reader.values(queryset))), expected)
+
+    def test_posts(self):
+        posts = Post.objects.select_related("author").order_by("pk")
+        self.assertSameOutput(posts, PostSerializer, PostValuesSerializer)
+        self.assertSameOutput(posts, PostSerializer, PostValuesSerializer, "?fields=id,author&omit=author")
+
+    def test_comments(self):
+        self.assertSameOutput(Comment.objects.order_by("pk"), CommentSerializer, CommentValuesSerializer)
+
+    def test_profiles(self):
+        self.assertSameOutput(
+            UserProfile.objects.order_by("pk"), UserProfileSerializer, UserProfileValuesSerializer,
+        )
+
+
+@override_settings(BLOG_QUERY_PROFILING=True, BLOG_DUPLICATE_QUERY_THRESHOLD=3, BLOG_QUERY_PROFILING_DIR=None)
+class QueryProfilingTests(TestCase):
+    """Every request reports its SQL in Server-Timing and in the route totals"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        cls.posts = [Post.objects.create(title=f"Post {i}", content="matn", author=cls.author) for i in range(3)]
+
+    def setUp(self):
+        route_stats.reset()
+        self.addCleanup(route_stats.reset)
+
+    def run_middleware(self, view, headers=None):
+        def get_response(request):
+            view()
+            return HttpResponse(headers=headers)
+
+        return QueryProfilingMiddleware(get_response)(RequestFactory().get("/"))
+
+    def test_server_timing(self):
+        response = self.run_middleware(lambda: (Post.objects.count(), User.objects.count()))
+        timing = response["Server-Timing"]
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="2 queries", view;dur=[\d.]+$')
+        # A header set by the view is kept in front
+        response = self.run_middleware(lambda: None, headers={"Server-Timing": "cache;desc=hit"})
+        self.assertTrue(response["Server-Timing"].startswith('cache;desc=hit, db;dur='))
+
+    def test_route_totals(self):
+        self.client.get("/posts/")
+        self.client.get("/posts/")
+        row = route_stats.snapshot()["post_list"]
+        self.assertEqual(row["requests"], 2)
+        self.assertGreater(row["queries"], 0)
+
+    def test_duplicate_queries(self):
+        response = self.run_middleware(lambda: [Post.objects.filter(pk=p.pk).first() for p in self.posts])
+        self.assertIn('dup;desc="3 repeated"', response["Server-Timing"])
+        (sql, count), = route_stats.snapshot()["<unresolved>"]["duplicates"].items()
+        self.assertEqual(count, 3)
+        self.assertNotRegex(sql, r"\d")
+        # Below the threshold nothing is flagged
+        response = self.run_middleware(lambda: [Post.objects.filter(pk=p.pk).first() for p in self.posts[:2]])
+        self.assertNotIn("dup;", response["Server-Timing"])
+
+    def test_snapshots(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with override_settings(BLOG_QUERY_PROFILING_DIR=directory, BLOG_QUERY_PROFILING_FLUSH=0):
+            self.run_middleware(Post.objects.count)
+        self.assertEqual(load_snapshots(directory).snapshot()["<unresolved>"]["queries"], 1)
+        out = StringIO()
+        call_command("query_report", dir=directory, stdout=out)
+        self.assertIn("<unresolved>", out.getvalue())
+        # Not written again before BLOG_QUERY_PROFILING_FLUSH has passed
+        with override_settings(BLOG_QUERY_PROFILING_DIR=directory, BLOG_QUERY_PROFILING_FLUSH=60):
+            middleware = QueryProfilingMiddleware(lambda request: HttpResponse())
+            middleware(RequestFactory().get("/"))
+        self.assertEqual(load_snapshots(directory).snapshot()["<unresolved>"]["requests"], 1)
+
+
+class PrimaryStickinessTests(TestCase):
+    """Reads stick to the primary after any request that wrote, whatever its method"""
+
+    def setUp(self):
+        patcher = mock.patch("configapp.middleware.replicas", return_value=["replica"])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.author = User.objects.create_user("author")
+
+    def run_middleware(self, method, view):
+        def get_response(request):
+            view()
+            return HttpResponse()
+
+        return PrimaryStickinessMiddleware(get_response)(getattr(RequestFactory(), method)("/"))
+
+    def test_delete_on_get_sets_cookie(self):
+        post = Post.objects.create(title="t", content="matn", author=self.author)
+        response = self.run_middleware("get", post.delete)
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+    def test_reads_and_failed_posts_do_not(self):
+        for method in ("get", "post"):
+            response = self.run_middleware(method, lambda: list(Post.objects.all()))
+            self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+
+@override_settings(BLOG_QUERY_PROFILING=False)
+class ConditionalGetTests(TestCase):
+    """ETags come from the page cache versions and follow what each page shows"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        cls.profile = UserProfile.objects.create(user=cls.author, bio="eski")
+        cls.post = Post.objects.create(title="t", content="matn", author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def etag(self, url):
+        return self.client.get(url)["ETag"]
+
+    def change(self, action):
+        with self.captureOnCommitCallbacks(execute=True):
+            action()
+
+    def test_list_revalidation_reads_no_tables(self):
+        etag = self.etag("/api/posts/")
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/posts/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_comments_change_the_feed_but_not_the_post_list(self):
+        api, feed = self.etag("/api/posts/"), self.etag("/posts/")
+        self.change(lambda: Comment.objects.create(post=self.post, author=self.author, content="a"))
+        self.assertEqual(self.etag("/api/posts/"), api)
+        self.assertNotEqual(self.etag("/posts/"), feed)
+
+    def test_deleted_post_changes_the_post_list(self):
+        other = Post.objects.create(title="u", content="matn", author=self.author)
+        etag = self.etag("/api/posts/")
+        self.change(other.delete)
+        self.assertNotEqual(self.etag("/api/posts/"), etag)
+
+    def test_profile_change_changes_the_post_page(self):
+        url = f"/posts/{self.post.pk}/"
+        etag = self.etag(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.profile.bio = "yangi"
+        self.change(self.profile.save)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "yangi")
+
+
+@override_settings(BLOG_QUERY_PROFILING=False)
+class SearchTests(TestCase):
+    """The FTS index follows writes through its triggers; e-mails stay out of it"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("yozuvchi", email="maxfiy@example.com", first_name="Ali")
+        cls.post = Post.objects.create(title="Qovun sayli", content="Toshkentda qovun", author=cls.author)
+
+    def ids(self, text, kind):
+        return [hit["id"] for hit in search.search(text, kinds=[kind])]
+
+    def test_triggers(self):
+        self.assertTrue(search.is_enabled())
+        self.assertEqual(self.ids("qovun", "post"), [self.post.pk])
+        comment = Comment.objects.create(post=self.post, author=self.author, content="Juda shirin")
+        self.assertEqual(self.ids("shirin", "comment"), [comment.pk])
+
+        self.post.title = "Uzum sayli"
+        self.post.save()
+        self.assertEqual(self.ids("uzum", "post"), [self.post.pk])
+        self.assertEqual(self.ids("uzum", "comment"), [comment.pk])
+
+        Comment.objects.filter(pk=comment.pk)._raw_delete("default")
+        self.assertEqual(self.ids("shirin", "comment"), [])
+        self.post.delete()
+        self.assertEqual(self.ids("toshkentda", "post"), [])
+
+    def test_api_does_not_expose_emails(self):
+        response = self.client.get("/api/search/", {"q": "maxfiy"})
+        self.assertEqual(response.json()["results"], [])
+        response = self.client.get("/api/search/", {"q": "yozuvchi", "type": "user"})
+        hits = response.json()["results"]
+        self.assertEqual([hit["id"] for hit in hits], [self.author.pk])
+        self.assertNotIn("example.com", str(hits))
+
+    def test_staff_search_by_email(self):
+        posts = search.filter_queryset(Post.objects.all(), "maxfiy@example", "post", emails=True)
+        self.assertEqual(list(posts), [self.post])
+        self.assertFalse(search.filter_queryset(Post.objects.all(), "maxfiy@example", "post").exists())
+        admin = User.objects.create_superuser("root", "root@example.com", "pw")
+        self.client.force_login(admin)
+        response = self.client.get("/admin/configapp/post/", {"q": "maxfiy@example.com"})
+        self.assertEqual(list(response.context["cl"].result_list), [self.post])
+
+
+class AvatarTests(TestCase):
+    """Processing an avatar twice leaves it alone; odd formats become PNG"""
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        override = override_settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.profile = UserProfile.objects.create(user=User.objects.create_user("rassom"))
+
+    def upload(self, name, fmt):
+        buffer = BytesIO()
+        Image.new("RGB", (120, 90), (200, 40, 40)).save(buffer, fmt)
+        self.profile.avatar.save(name, ContentFile(buffer.getvalue()))
+        return avatars.process(self.profile.pk)
+
+    def stored(self):
+        self.profile.refresh_from_db()
+        with self.profile.avatar.open("rb") as f:
+            return f.read()
+
+    def test_processing_again_changes_nothing(self):
+        digest = self.upload("rasm.jpg", "JPEG")
+        data = self.stored()
+        self.assertEqual(self.profile.avatar_hash, digest)
+        self.assertEqual(hashlib.sha256(data).hexdigest()[:40], digest)
+        self.assertTrue(default_storage.exists(avatars.thumbnail_name(digest, 40, "webp")))
+
+        with mock.patch.object(avatars, "_encode") as encode:
+            self.assertEqual(avatars.process(self.profile.pk), digest)
+        encode.assert_not_called()
+        self.assertEqual(self.stored(), data)
+
+    def test_upload_during_processing_wins(self):
+        buffer = BytesIO()
+        Image.new("RGB", (120, 90), (0, 90, 200)).save(buffer, "JPEG")
+        self.profile.avatar.save("birinchi.jpg", ContentFile(buffer.getvalue()))
+        encode = avatars._encode
+
+        def upload_meanwhile(image, fmt):
+            if not UserProfile.objects.filter(avatar__contains="ikkinchi").exists():
+                UserProfile.objects.filter(pk=self.profile.pk).update(avatar="avatars/ikkinchi.jpg")
+            return encode(image, fmt)
+
+        with mock.patch.object(avatars, "_encode", side_effect=upload_meanwhile):
+            self.assertIsNone(avatars.process(self.profile.pk))
+        self.profile.refresh_from_db()
+        self.assertEqual((self.profile.avatar.name, self.profile.avatar_hash), ("avatars/ikkinchi.jpg", ""))
+        # Only the first upload stays, the discarded result is removed
+        self.assertEqual(default_storage.listdir("avatars")[1], ["birinchi.jpg"])
+
+    def test_other_formats_are_renamed(self):
+        self.upload("rasm.gif", "GIF")
+        self.profile.refresh_from_db()
+        self.assertTrue(self.profile.avatar.name.endswith(".png"))
+        self.assertEqual(Image.open(BytesIO(self.stored())).format, "PNG")
+        self.assertFalse(default_storage.exists("avatars/rasm.gif"))
@@ -1,5 +1,15 @@
+from django.conf import settings
 from django.urls import path
 from .views import *
+from .viewcounts import counted
+
+# Under ASGI the hot read endpoints get their async views
+ASYNC_READS = getattr(settings, "BLOG_ASYNC_READS", False)
+
+
+def read_view(sync_view, async_view):
+    return async_view if ASYNC_READS else sync_view
+
 
 urlpatterns = [
     # Portfolio Home page
@@ -18,21 +28,28 @@ urlpatterns = [
     
     # Posts URLs (Template-based views)
     path("posts/", post_list, name="post_list"),
-    path("posts/<int:pk>/", post_detail, name="post_detail"),
+    path("posts/<int:pk>/", counted(read_view(post_detail, post_detail_async)), name="post_detail"),
+    path("posts/<int:pk>/comments/stream/", post_comment_stream, name="post_comment_stream"),
     path("posts/create/", post_create, name="post_create"),
     path("posts/<int:pk>/edit/", post_edit, name="post_edit"),
     path("posts/<int:pk>/delete/", post_delete, name="post_delete"),
     
     # API URLs for Posts (if needed)
-    path("api/posts/", PostListView.as_view(), name="api_post_list"),
-    path("api/posts/<int:pk>/", PostDetailView.as_view(), name="api_post_detail"),
+    path("api/posts/", read_view(PostListView.as_view(), api_post_list_async), name="api_post_list"),
+    path("api/posts/<int:pk>/", counted(read_view(PostDetailView.as_view(), api_post_detail_async)), name="api_post_detail"),
+    path("api/posts/trending/", TrendingPostListView.as_view(), name="api_post_trending"),
     path("api/posts/create/", PostCreateView.as_view(), name="api_post_create"),
+    path("api/posts/bulk/", PostBulkCreateView.as_view(), name="api_post_bulk"),
     path("api/posts/<int:pk>/edit/", PostUpdateView.as_view(), name="api_post_edit"),
     path("api/posts/<int:pk>/delete/", PostDeleteView.as_view(), name="api_post_delete"),
     
     # Comments URLs (API)
-    path("api/posts/<int:pk>/comments/", CommentListView.as_view(), name="api_comment_list"),
+    path("api/posts/<int:pk>/comments/", read_view(CommentListView.as_view(), api_comment_list_async), name="api_comment_list"),
     path("api/posts/<int:pk>/comments/add/", CommentCreateView.as_view(), name="api_comment_create"),
+    path("api/posts/<int:pk>/comments/bulk/", CommentBulkCreateView.as_view(), name="api_comment_bulk"),
+    
+    # Search API
+    path("api/search/", search_api, name="api_search"),
     
     # Install demo data
     path("install/", install, name="install"),
@@ -43,8 +60,12 @@ urlpatterns = [
     path("admin-panel/users/<int:user_id>/", admin_user_detail, name="admin_user_detail"),
     path("admin-panel/posts/", admin_posts, name="admin_posts"),
     path("admin-panel/posts/<int:post_id>/delete/", admin_delete_post, name="admin_delete_post"),
+    path("admin-panel/posts/bulk-delete/", admin_bulk_posts, name="admin_bulk_posts"),
     path("admin-panel/comments/", admin_comments, name="admin_comments"),
     path("admin-panel/comments/<int:comment_id>/delete/", admin_delete_comment, name="admin_delete_comment"),
+    path("admin-panel/comments/bulk-delete/", admin_bulk_comments, name="admin_bulk_comments"),
+    path("admin-panel/queries/", admin_query_report, name="admin_query_report"),
+    path("admin-panel/export/<str:kind>/", admin_export, name="admin_export"),
 ]
 # urlpatterns = [
 #     # Postlar
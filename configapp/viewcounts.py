@@ -0,0 +1,181 @@
+"""
+Post view counting.
+
+Counting a view is a dict increment in process memory, never a write on
+the request path. A background thread per process flushes the pending
+counts every ``BLOG_VIEW_FLUSH_SECONDS``, or as soon as
+``BLOG_VIEW_FLUSH_THRESHOLD`` views are pending, in one transaction: a
+single UPDATE adding to ``Post.view_count`` (``updated_at`` is left alone)
+and one ``PostViewBatch`` row per post, which the trending ranking reads
+as events. Only the API shows view counts: a flush bumps the "posts" page
+cache version behind the ``/api/posts/`` ETag, and the ETag of a single
+post includes its count. The template pages do not show it and stay
+cached.
+
+Pending counts are flushed when the process exits normally (worker
+restarts, reloads). A crash loses at most one interval or threshold worth
+of views per process; a failed flush keeps its counts for the next one.
+Code that swaps the database out from under the process (benchmarks,
+tests) calls ``counter.stop()`` first, or keeps ``BLOG_VIEW_COUNTING`` off.
+
+Views are counted by wrapping a URL's view in ``counted``, outside the
+page cache, so cache hits and 304s count too.
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import Counter
+from datetime import timedelta
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from . import page_cache, ranking
+from .models import Post, PostViewBatch
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SECONDS = 10
+FLUSH_THRESHOLD = 1000
+# Posts per UPDATE statement
+CHUNK_SIZE = 500
+COUNTED_STATUSES = {200, 304}
+
+
+def write_counts(counts):
+    """Add {post_id: views} to the posts in one transaction; returns views written"""
+    with transaction.atomic():
+        # Posts deleted since they were viewed are skipped
+        existing = Post.objects.filter(pk__in=list(counts)).values_list("pk", flat=True)
+        counts = {pk: counts[pk] for pk in existing}
+        ids = sorted(counts)
+        for start in range(0, len(ids), CHUNK_SIZE):
+            by_count = {}
+            for pk in ids[start:start + CHUNK_SIZE]:
+                by_count.setdefault(counts[pk], []).append(pk)
+            added = Case(*[When(pk__in=pks, then=Value(n)) for n, pks in by_count.items()], default=Value(0))
+            Post.objects.filter(pk__in=ids[start:start + CHUNK_SIZE]).update(view_count=F("view_count") + added)
+        PostViewBatch.objects.bulk_create(
+            [PostViewBatch(post_id=pk, count=counts[pk]) for pk in ids], batch_size=CHUNK_SIZE,
+        )
+        if ids:
+            ranking.schedule()
+            page_cache.bump("posts")
+    return sum(counts.values())
+
+
+class ViewCounter:
+    """Per-process buffer of views not written yet"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.pending = Counter()
+        self.size = 0
+        self.thread = None
+        self.stopping = None
+
+    def add(self, post_id, n=1):
+        with self.lock:
+            self.pending[post_id] += n
+            self.size += n
+            full = self.size >= getattr(settings, "BLOG_VIEW_FLUSH_THRESHOLD", FLUSH_THRESHOLD)
+            if self.thread is None:
+                self.start()
+        if full:
+            self.wake.set()
+
+    def start(self):
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.run, args=(self.stopping,), name="view-counter", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the flusher thread and write what is pending; returns views written"""
+        with self.lock:
+            thread, stopping, self.thread = self.thread, self.stopping, None
+        if thread is not None:
+            stopping.set()
+            self.wake.set()
+            thread.join()
+        return self.flush()
+
+    def run(self, stopping):
+        interval = getattr(settings, "BLOG_VIEW_FLUSH_SECONDS", FLUSH_SECONDS)
+        while not stopping.is_set():
+            self.wake.wait(interval)
+            self.wake.clear()
+            try:
+                self.flush()
+            finally:
+                connections.close_all()
+
+    def take(self):
+        with self.lock:
+            pending, self.pending, self.size = self.pending, Counter(), 0
+        return pending
+
+    def flush(self):
+        """Write the pending counts now; returns how many views were written"""
+        pending = self.take()
+        if not pending:
+            return 0
+        try:
+            return write_counts(pending)
+        except Exception:
+            logger.exception("Could not write %s post views, keeping them", sum(pending.values()))
+            with self.lock:
+                self.pending.update(pending)
+                self.size += sum(pending.values())
+            return 0
+
+    def reset(self):
+        """After fork: the parent's views and flusher are not this process'"""
+        self.__init__()
+
+
+counter = ViewCounter()
+atexit.register(counter.stop)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=counter.reset)
+
+
+def enabled():
+    return getattr(settings, "BLOG_VIEW_COUNTING", False)
+
+
+def count_view(request, response, pk):
+    if request.method == "GET" and response.status_code in COUNTED_STATUSES and enabled():
+        counter.add(int(pk))
+
+
+def counted(view):
+    """Count successful GETs of ``view`` (which takes ``pk``) as views of that post"""
+    if iscoroutinefunction(view):
+        async def wrapper(request, *args, pk, **kwargs):
+            response = await view(request, *args, pk=pk, **kwargs)
+            count_view(request, response, pk)
+            return response
+    else:
+        def wrapper(request, *args, pk, **kwargs):
+            response = view(request, *args, pk=pk, **kwargs)
+            count_view(request, response, pk)
+            return response
+
+    return wraps(view)(wrapper)
+
+
+def purge(days):
+    """
+    Delete view batches older than ``days``. ``view_count`` keeps them; a
+    ranking rebuild no longer sees them, which is harmless once they are
+    several half-lives old.
+    """
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = PostViewBatch.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
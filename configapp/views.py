@@ -1,20 +1,52 @@
+import json
+from functools import wraps
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
 from rest_framework import generics, permissions
 from django.contrib.auth.models import User
 from .models import UserProfile, Post, Comment
 from .serializers import UserProfileSerializer, PostSerializer, CommentSerializer
+from .serializers import UserProfileValuesSerializer, PostValuesSerializer, CommentValuesSerializer
+from .renderers import FastJSONRenderer
+from .pagination import CreatedAtCursorPagination
+from .feed import get_feed_page
+from . import stats
+from . import admin_lists
+from . import export
+from . import importer as importer_module
+from . import moderation
+from . import tasks
+from . import search as search_index
+from . import conditional
+from . import contact
+from . import live
+from . import page_cache
+from . import ranking
+from .page_cache import cache_anonymous_page
+from .middleware import route_stats
+from rest_framework import exceptions
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.request import Request
 from rest_framework.response import Response
-from django.shortcuts import render, get_object_or_404, redirect
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.views import APIView
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib import messages
 from django.contrib.auth.decorators import user_passes_test
-from django.core.paginator import Paginator
-from django.db import models
+from django.core.handlers.asgi import ASGIRequest
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition, require_POST
 
 # Portfolio Home page
+@cache_anonymous_page()
 def portfolio_home(request):
     """Portfolio homepage similar to nematov.uz"""
     if request.method == 'POST':
@@ -22,36 +54,31 @@ def portfolio_home(request):
         email = request.POST.get('email', '').strip()
         message = request.POST.get('message', '').strip()
         
-        if name and email and message:
-            # Here you can add email sending functionality
-            # For now, just show a success message
-            messages.success(request, f"Rahmat {name}! Xabaringiz yuborildi. Tez orada sizga javob beraman.")
-        else:
+        if not (name and email and message):
             messages.error(request, "Iltimos, barcha maydonlarni to'ldiring!")
+        elif not contact.valid_sender(name, email):
+            # Checked here: the worker would only fail and retry on it
+            messages.error(request, "Iltimos, ismingiz va email manzilingizni to'g'ri kiriting!")
+        else:
+            # Mailed by a worker, the visitor does not wait for SMTP
+            tasks.enqueue(contact.send_message, name=name, email=email, message=message)
+            messages.success(request, f"Rahmat {name}! Xabaringiz yuborildi. Tez orada sizga javob beraman.")
     
     return render(request, 'portfolio/index.html')
 
 # Blog Home page - Welcome page
+@cache_anonymous_page("site")
 def index(request):
-    # Get some statistics for the homepage
-    total_posts = Post.objects.count()
-    total_users = User.objects.count()
-    total_comments = Comment.objects.count()
-    
-    # Get recent posts for featured section
-    recent_posts = Post.objects.order_by('-created_at')[:3]
-    
-    # Get top contributors (users with most posts)
-    top_contributors = User.objects.annotate(
-        post_count=models.Count('posts')
-    ).filter(post_count__gt=0).order_by('-post_count')[:5]
+    # Statistics come from the cached stats service
+    totals = stats.get_totals(["total_posts", "total_users", "total_comments"])
     
+    # Featured: the trending posts, the newest ones until scores exist
+    trending = ranking.trending_posts(ranking.CACHED_TOP)
     context = {
-        'total_posts': total_posts,
-        'total_users': total_users,
-        'total_comments': total_comments,
-        'recent_posts': recent_posts,
-        'top_contributors': top_contributors,
+        **totals,
+        'recent_posts': trending or stats.get_recent_posts()[:3],
+        'trending': bool(trending),
+        'top_contributors': stats.get_top_contributors(),
     }
     return render(request, 'home/index.html', context)
 
@@ -63,53 +90,20 @@ def admin_required(user):
 @user_passes_test(admin_required)
 def admin_dashboard(request):
     """Admin dashboard with statistics"""
-    total_users = User.objects.count()
-    total_posts = Post.objects.count()
-    total_comments = Comment.objects.count()
-    active_users = User.objects.filter(is_active=True).count()
-    
-    recent_users = User.objects.order_by('-date_joined')[:5]
-    recent_posts = Post.objects.order_by('-created_at')[:5]
-    recent_comments = Comment.objects.order_by('-created_at')[:5]
-    
     context = {
-        'total_users': total_users,
-        'total_posts': total_posts,
-        'total_comments': total_comments,
-        'active_users': active_users,
-        'recent_users': recent_users,
-        'recent_posts': recent_posts,
-        'recent_comments': recent_comments,
+        **stats.get_totals(),
+        'recent_users': stats.get_recent_users(),
+        'recent_posts': stats.get_recent_posts(),
+        'recent_comments': stats.get_recent_comments(),
+        'trending_posts': ranking.trending_posts(5),
+        'stats_cache': stats.cache_info(),
     }
     return render(request, 'admin_frontend/dashboard.html', context)
 
 @user_passes_test(admin_required)
 def admin_users(request):
     """Manage users"""
-    users_list = User.objects.all().order_by('-date_joined')
-    
-    # Search functionality
-    search = request.GET.get('search', '')
-    if search:
-        users_list = users_list.filter(
-            username__icontains=search
-        ) | users_list.filter(
-            email__icontains=search
-        ) | users_list.filter(
-            first_name__icontains=search
-        ) | users_list.filter(
-            last_name__icontains=search
-        )
-    
-    # Pagination
-    paginator = Paginator(users_list, 10)
-    page_number = request.GET.get('page')
-    users = paginator.get_page(page_number)
-    
-    return render(request, 'admin_frontend/users.html', {
-        'users': users,
-        'search': search
-    })
+    return admin_lists.UserList().render(request)
 
 @user_passes_test(admin_required)
 def admin_user_detail(request, user_id):
@@ -134,7 +128,7 @@ def admin_user_detail(request, user_id):
         messages.success(request, f'{user.username} ma\'lumotlari yangilandi!')
         return redirect('admin_user_detail', user_id=user.id)
     
-    user_posts = user.posts.all()[:5]
+    user_posts = user.posts.defer('content').order_by('-created_at', '-id')[:5]
     user_comments = user.comment_set.all()[:5]
     
     return render(request, 'admin_frontend/user_detail.html', {
@@ -147,65 +141,43 @@ def admin_user_detail(request, user_id):
 @user_passes_test(admin_required)
 def admin_posts(request):
     """Manage posts"""
-    posts_list = Post.objects.all().order_by('-created_at')
-    
-    # Search functionality
-    search = request.GET.get('search', '')
-    if search:
-        posts_list = posts_list.filter(
-            title__icontains=search
-        ) | posts_list.filter(
-            content__icontains=search
-        ) | posts_list.filter(
-            author__username__icontains=search
-        )
-    
-    # Filter by author
-    author_filter = request.GET.get('author', '')
-    if author_filter:
-        posts_list = posts_list.filter(author__username__icontains=author_filter)
-    
-    # Pagination
-    paginator = Paginator(posts_list, 15)
-    page_number = request.GET.get('page')
-    posts = paginator.get_page(page_number)
-    
-    return render(request, 'admin_frontend/posts.html', {
-        'posts': posts,
-        'search': search,
-        'author_filter': author_filter
-    })
+    return admin_lists.PostList().render(request)
 
 @user_passes_test(admin_required)
 def admin_comments(request):
     """Manage comments"""
-    comments_list = Comment.objects.all().order_by('-created_at')
-    
-    # Search functionality
-    search = request.GET.get('search', '')
-    if search:
-        comments_list = comments_list.filter(
-            content__icontains=search
-        ) | comments_list.filter(
-            author__username__icontains=search
-        ) | comments_list.filter(
-            post__title__icontains=search
-        )
-    
-    # Filter by post
-    post_filter = request.GET.get('post', '')
-    if post_filter:
-        comments_list = comments_list.filter(post__title__icontains=post_filter)
-    
-    # Pagination
-    paginator = Paginator(comments_list, 20)
-    page_number = request.GET.get('page')
-    comments = paginator.get_page(page_number)
-    
-    return render(request, 'admin_frontend/comments.html', {
-        'comments': comments,
-        'search': search,
-        'post_filter': post_filter
+    return admin_lists.CommentList().render(request)
+
+@user_passes_test(admin_required)
+def admin_export(request, kind):
+    """Stream posts/comments/users as NDJSON or CSV (?format=, ?since=, ?gzip=1)"""
+    fmt = request.GET.get('format', 'ndjson')
+    compress = request.GET.get('gzip') in ('1', 'true')
+    try:
+        since = export.parse_since(request.GET.get('since'))
+        chunks = export.stream(kind, fmt, since=since, compress=compress)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if isinstance(request, ASGIRequest):
+        chunks = export.astream(chunks)
+    response = StreamingHttpResponse(
+        chunks, content_type='application/gzip' if compress else export.FORMATS[fmt],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{export.filename(kind, fmt, compress)}"'
+    return response
+
+@user_passes_test(admin_required)
+def admin_query_report(request):
+    """Routes doing the most SQL in this process (needs BLOG_QUERY_PROFILING)"""
+    try:
+        limit = int(request.GET.get('limit', 20))
+    except ValueError:
+        limit = 20
+    if request.method == 'POST' and request.POST.get('reset'):
+        route_stats.reset()
+    return JsonResponse({
+        'enabled': getattr(settings, 'BLOG_QUERY_PROFILING', False),
+        'routes': route_stats.report(order_by=request.GET.get('order', 'queries'), limit=limit),
     })
 
 @user_passes_test(admin_required)
@@ -223,11 +195,90 @@ def admin_delete_post(request, post_id):
     post.delete()
     messages.success(request, 'Post o\'chirildi!')
     return redirect('admin_posts')
+
+def _moderation_targets(request, queryset, kind):
+    """Rows picked by a bulk action: ticked ids, one author or a search"""
+    action = request.POST.get('action') or ('author' if request.POST.get('author') else '')
+    if action == 'selected':
+        ids = [pk for pk in request.POST.getlist('ids') if pk.isdigit()]
+        return queryset.filter(pk__in=ids)
+    if action == 'author':
+        username = request.POST.get('author', '').strip()
+        return queryset.filter(author__username=username) if username else queryset.none()
+    if action == 'search':
+        text = request.POST.get('search', '').strip()
+        return search_index.filter_queryset(queryset, text, kind, emails=True) if text else queryset.none()
+    return queryset.none()
+
+def _bulk_delete(request, steps, redirect_to, label):
+    """
+    Run a moderation generator to the end; stream=1 answers with one NDJSON
+    line per chunk. Every chunk is deleted before the response is returned,
+    inside the request's middleware, so a dropped client cannot stop it halfway.
+    """
+    progress = [{'deleted': done, 'total': total} for done, total in steps]
+    if request.POST.get('stream'):
+        lines = ''.join(json.dumps(step) + '\n' for step in progress)
+        return HttpResponse(lines, content_type='application/x-ndjson')
+    deleted = progress[-1]['deleted'] if progress else 0
+    messages.success(request, f'{deleted} ta {label} o\'chirildi!')
+    return redirect(redirect_to)
+
+@user_passes_test(admin_required)
+@require_POST
+def admin_bulk_comments(request):
+    """Delete many comments at once"""
+    targets = _moderation_targets(request, Comment.objects.all(), 'comment')
+    return _bulk_delete(request, moderation.iter_delete_comments(targets), 'admin_comments', 'izoh')
+
+@user_passes_test(admin_required)
+@require_POST
+def admin_bulk_posts(request):
+    """Delete many posts (with their comments) at once"""
+    targets = _moderation_targets(request, Post.objects.all(), 'post')
+    return _bulk_delete(request, moderation.iter_delete_posts(targets), 'admin_posts', 'post')
+
+
+class ValuesReadMixin:
+    """
+    GET list/detail through a ValuesSerializer: the queryset is turned into
+    ``.values()`` rows and rendered without per-row serializer objects.
+    Object-level permissions are not checked on this path.
+    """
+    values_serializer_class = None
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def get_values_serializer(self):
+        return self.values_serializer_class(context=self.get_serializer_context())
+
+    def list(self, request, *args, **kwargs):
+        reader = self.get_values_serializer()
+        # The cursor is read off the rows, so its columns are always fetched
+        ordering = [name.lstrip("-") for name in getattr(self.paginator, "ordering", ())]
+        queryset = reader.values(self.filter_queryset(self.get_queryset()), *ordering)
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(reader.many(queryset))
+        return self.get_paginated_response(reader.many(page))
+
+    def retrieve(self, request, *args, **kwargs):
+        reader = self.get_values_serializer()
+        queryset = reader.values(self.filter_queryset(self.get_queryset()))
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lookup_url_kwarg in self.kwargs:
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return Response(reader.to_representation(get_object_or_404(queryset)))
+
+
 # Profile
-class ProfileView(generics.RetrieveAPIView):
+class ProfileView(ValuesReadMixin, generics.RetrieveAPIView):
     serializer_class = UserProfileSerializer
+    values_serializer_class = UserProfileValuesSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_queryset(self):
+        return UserProfile.objects.filter(user=self.request.user)
+
     def get_object(self):
         return UserProfile.objects.get(user=self.request.user)
 
@@ -241,14 +292,20 @@ class ProfileEditView(generics.UpdateAPIView):
 
 
 # Posts
-class PostListView(generics.ListAPIView):
-    queryset = Post.objects.all().order_by("-created_at")
+@method_decorator(condition(conditional.post_list_etag), name="get")
+class PostListView(ValuesReadMixin, generics.ListAPIView):
+    # Only the requested columns are read, so ?omit=content skips the bodies
+    queryset = Post.objects.all()
     serializer_class = PostSerializer
+    values_serializer_class = PostValuesSerializer
+    pagination_class = CreatedAtCursorPagination
 
 
-class PostDetailView(generics.RetrieveAPIView):
+@method_decorator(condition(conditional.post_etag), name="get")
+class PostDetailView(ValuesReadMixin, generics.RetrieveAPIView):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
+    values_serializer_class = PostValuesSerializer
 
 
 class PostCreateView(generics.CreateAPIView):
@@ -282,8 +339,11 @@ class PostDeleteView(generics.DestroyAPIView):
 
 
 # Comments
-class CommentListView(generics.ListAPIView):
+@method_decorator(condition(conditional.comments_etag, conditional.comments_last_modified), name="get")
+class CommentListView(ValuesReadMixin, generics.ListAPIView):
     serializer_class = CommentSerializer
+    values_serializer_class = CommentValuesSerializer
+    pagination_class = CreatedAtCursorPagination
 
     def get_queryset(self):
         return Comment.objects.filter(post_id=self.kwargs["pk"])
@@ -298,10 +358,169 @@ class CommentCreateView(generics.CreateAPIView):
         serializer.save(author=self.request.user, post_id=post_id)
 
 
+class TrendingPostListView(APIView):
+    """Top posts by trending score (``?page_size=``, up to 100), best first"""
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def get(self, request):
+        ranked = ranking.top(CreatedAtCursorPagination().get_page_size(request))
+        reader = PostValuesSerializer(context={"request": request})
+        rows = {
+            row["id"]: row
+            for row in reader.values(Post.objects.filter(pk__in=[pk for pk, _ in ranked]), "id")
+        }
+        now = timezone.now()
+        return Response({"results": [
+            {**reader.to_representation(rows[pk]), "score": round(ranking.current_score(rank, now), 4)}
+            for pk, rank in ranked if pk in rows
+        ]})
+
+
+# Async read path (ASGI with BLOG_ASYNC_READS): the same JSON as the DRF
+# views above, read with the async ORM on the event loop
+_API_RENDERERS = [FastJSONRenderer(), BrowsableAPIRenderer()]
+
+
+def _api_json(data, status=200):
+    return HttpResponse(
+        FastJSONRenderer().render(data), status=status, content_type="application/json"
+    )
+
+
+def _negotiates_json(request):
+    try:
+        renderer, _ = DefaultContentNegotiation().select_renderer(Request(request), _API_RENDERERS)
+    except exceptions.NotAcceptable:
+        return False
+    return isinstance(renderer, FastJSONRenderer)
+
+
+def async_api_view(sync_view):
+    """
+    Answer anonymous or session-authenticated JSON GETs with the decorated
+    async view; the browsable API, other methods and header authentication
+    go to ``sync_view`` in a worker thread.
+    """
+    fallback = sync_to_async(sync_view)
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if (
+                request.method not in ("GET", "HEAD")
+                or "HTTP_AUTHORIZATION" in request.META
+                or not _negotiates_json(request)
+            ):
+                return await fallback(request, *args, **kwargs)
+            # DRF authenticates every request; this also loads the session
+            await request.auser()
+            try:
+                response = await view(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                response = _api_json({"detail": exc.detail}, exc.status_code)
+            except Http404 as exc:
+                response = _api_json({"detail": str(exc)}, 404)
+            # The headers APIView.finalize_response adds, 304s included
+            response["Allow"] = "GET, HEAD, OPTIONS"
+            patch_vary_headers(response, ["Accept"])
+            return response
+        return wrapper
+    return decorator
+
+
+async def _avalues_page(request, values_serializer_class, queryset):
+    drf_request = Request(request)
+    reader = values_serializer_class(context={"request": drf_request})
+    paginator = CreatedAtCursorPagination()
+    ordering = [name.lstrip("-") for name in paginator.ordering]
+    page = await paginator.apaginate_queryset(reader.values(queryset, *ordering), drf_request)
+    return paginator.get_paginated_response(reader.many(page)).data
+
+
+@async_api_view(PostListView.as_view())
+@conditional.acondition(conditional.apost_list_etag)
+async def api_post_list_async(request):
+    return _api_json(await _avalues_page(request, PostValuesSerializer, Post.objects.all()))
+
+
+@async_api_view(PostDetailView.as_view())
+@conditional.acondition(conditional.apost_etag)
+async def api_post_detail_async(request, pk):
+    reader = PostValuesSerializer(context={"request": Request(request)})
+    return _api_json(reader.to_representation(
+        await aget_object_or_404(reader.values(Post.objects.filter(pk=pk)))
+    ))
+
+
+@async_api_view(CommentListView.as_view())
+@conditional.acondition(conditional.acomments_etag, conditional.acomments_last_modified)
+async def api_comment_list_async(request, pk):
+    return _api_json(await _avalues_page(
+        request, CommentValuesSerializer, Comment.objects.filter(post_id=pk)
+    ))
+
+
+# Bulk import
+def _bulk_import(request, importer):
+    try:
+        limit = getattr(settings, "BLOG_IMPORT_MAX_ITEMS", importer_module.MAX_ITEMS)
+        items = importer_module.request_items(request, limit=limit)
+        summary = importer_module.summarize(importer.import_items(items))
+    except ValueError as e:
+        return Response({"detail": str(e)}, status=400)
+    if not summary["failed"]:
+        status = 201
+    elif summary["created"]:
+        status = 207
+    else:
+        status = 400
+    return Response(summary, status=status)
+
+
+class PostBulkCreateView(APIView):
+    """POST a JSON array or an NDJSON stream of posts"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        # No request in the serializer context: ?fields=/?omit= trim
+        # responses and must not drop fields from the items being written
+        importer = importer_module.PostImporter(author=request.user)
+        return _bulk_import(request, importer)
+
+
+class CommentBulkCreateView(APIView):
+    """POST a JSON array or an NDJSON stream of comments for one post"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, pk):
+        post = get_object_or_404(Post, pk=pk)
+        importer = importer_module.CommentImporter(author=request.user, post_id=post.pk)
+        return _bulk_import(request, importer)
+
+
+# Search
+@api_view(["GET"])
+def search_api(request):
+    """Full-text search over posts, comments and users"""
+    query = request.GET.get("q", "").strip()
+    kinds = [kind for kind in request.GET.getlist("type") if kind in search_index.KINDS]
+    try:
+        limit = min(max(int(request.GET.get("limit", 20)), 1), 100)
+        offset = max(int(request.GET.get("offset", 0)), 0)
+    except ValueError:
+        return Response({"error": "limit va offset butun son bo'lishi kerak"}, status=400)
+    if not query:
+        return Response({"query": query, "results": []})
+    return Response({
+        "query": query,
+        "results": search_index.search(query, kinds=kinds, limit=limit, offset=offset),
+    })
+
+
 # Install
 @api_view(["GET"])
 def install(request):
-    """Create demo data for the blog"""
+    """Create demo data for the blog (large synthetic datasets: `manage.py seed_blog`)"""
     # Check if demo data already exists
     if User.objects.filter(username="demo").exists():
         return Response({"message": "Demo ma'lumotlar allaqachon mavjud!"})
@@ -402,10 +621,6 @@ Omad tilaymiz!"""
             "comments": Comment.objects.filter(author=demo_user).count()
         }
     })
-def post_list(request):
-    posts = Post.objects.all().order_by("-created_at")
-    return render(request, "posts/list.html", {"posts": posts})
-
 def register_view(request):
     if request.method == "POST":
         form = UserCreationForm(request.POST)
@@ -438,7 +653,8 @@ def logout_view(request):
 @login_required
 def profile_view(request):
     profile, created = UserProfile.objects.get_or_create(user=request.user)
-    return render(request, "profile/view.html", {"profile": profile})
+    posts = request.user.posts.defer("content").order_by("-created_at", "-id")[:6]
+    return render(request, "profile/view.html", {"profile": profile, "posts": posts})
 
 @login_required
 def profile_edit(request):
@@ -454,12 +670,22 @@ def profile_edit(request):
     return render(request, "profile/edit.html", {"profile": profile})
 
 # === Posts ===
+@cache_anonymous_page("site")
+@condition(conditional.feed_etag)
 def post_list(request):
-    posts = Post.objects.all().order_by("-created_at")
+    posts = get_feed_page(
+        after=request.GET.get("after"),
+        before=request.GET.get("before"),
+    )
     return render(request, "posts/list.html", {"posts": posts})
 
+def _post_author_id(pk):
+    return Post.objects.filter(pk=pk).values_list("author_id", flat=True).first()
+
+@cache_anonymous_page("post:{pk}", author=_post_author_id)
+@condition(conditional.post_page_etag)
 def post_detail(request, pk):
-    post = get_object_or_404(Post, pk=pk)
+    post = get_object_or_404(Post.objects.select_related("author__userprofile"), pk=pk)
     if request.method == "POST" and request.user.is_authenticated:
         content = request.POST.get("content", "").strip()
         if content:
@@ -468,7 +694,45 @@ def post_detail(request, pk):
             )
             messages.success(request, "Izoh muvaffaqiyatli qo'shildi!")
         return redirect("post_detail", pk=pk)
-    return render(request, "posts/detail.html", {"post": post})
+    versions = page_cache.get_versions(
+        page_cache.post_key(post.pk), page_cache.author_key(post.author_id)
+    )
+    return render(request, "posts/detail.html", {
+        "post": post,
+        # Lazy like the comments: only read when the sidebar is not cached
+        "author_posts": post.author.posts.defer("content").order_by("-created_at", "-id")[:5],
+        # Only evaluated when the comments fragment is not cached
+        "comments": post.comments.select_related("author__userprofile").order_by("created_at", "id"),
+        "post_version": versions[page_cache.post_key(post.pk)],
+        "author_version": versions[page_cache.author_key(post.author_id)],
+        "fragment_timeout": page_cache.page_timeout(),
+    })
+
+# post_detail without its (sync) page cache, for the async version below
+_post_detail_page = sync_to_async(post_detail.__wrapped__)
+
+async def _apost_author_id(pk):
+    return await Post.objects.filter(pk=pk).values_list("author_id", flat=True).afirst()
+
+@cache_anonymous_page("post:{pk}", author=_apost_author_id)
+async def post_detail_async(request, pk):
+    """post_detail for ASGI: cache hits stay on the event loop, the rest renders in a thread"""
+    return await _post_detail_page(request, pk=pk)
+
+async def post_comment_stream(request, pk):
+    """New comments of a post as Server-Sent Events, resuming from Last-Event-ID"""
+    if not await Post.objects.filter(pk=pk).aexists():
+        raise Http404("Post topilmadi")
+    last_id = live.parse_last_event_id(request)
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(live.stream(pk, last_id), content_type="text/event-stream")
+        response["X-Accel-Buffering"] = "no"
+    else:
+        # A WSGI worker cannot be held by every reader: send what was missed
+        # and let the browser reconnect after the retry delay
+        response = HttpResponse(await live.replay(pk, last_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    return response
 
 @login_required
 def post_create(request):